@@ -9,6 +9,18 @@ from . import apps, sentinel1
 app = typer.Typer()
 
 
+def parse_seed_step(seed_step: str | None) -> tuple[int, int] | str | None:
+    if seed_step is None or seed_step == "auto":
+        return seed_step
+    return (int(seed_step), int(seed_step))
+
+
+def parse_polarisations(polarisations: str | None) -> list[str]:
+    if polarisations is None:
+        return []
+    return [p.strip().upper() for p in polarisations.split(",") if p.strip()]
+
+
 @app.command()
 def info(
     product_urlpath: str,
@@ -30,12 +42,19 @@ def gtc(
     enable_dask_distributed: bool = False,
     client_kwargs_json: str = '{"processes": false}',
     chunks: int = 1024,
-    seed_step: int | None = None,
+    seed_step: str | None = None,
+    active_set: bool = False,
+    kernel: bool = False,
+    geometry_step: int | None = None,
+    geometry_tolerance: float = 0.1,
+    geometry_cache_dir: str | None = None,
+    polarisations: str | None = None,
+    memory_limit: str | None = None,
 ) -> None:
     """Generate a geometrically terrain corrected (GTC) image from Sentinel-1 product."""
     client_kwargs = json.loads(client_kwargs_json)
     real_chunks = chunks if chunks > 0 else None
-    real_seed_step = (seed_step, seed_step) if seed_step is not None else None
+    real_seed_step = parse_seed_step(seed_step)
     logging.basicConfig(level=logging.INFO)
     product = sentinel1.Sentinel1SarProduct(
         product_urlpath,
@@ -49,6 +68,13 @@ def gtc(
         client_kwargs=client_kwargs,
         chunks=real_chunks,
         seed_step=real_seed_step,
+        active_set=active_set,
+        kernel=kernel,
+        geometry_step=geometry_step,
+        geometry_tolerance=geometry_tolerance,
+        geometry_cache_dir=geometry_cache_dir,
+        polarisations=parse_polarisations(polarisations),
+        memory_limit=memory_limit,
     )
 
 
@@ -62,12 +88,18 @@ def stc(
     client_kwargs_json: str = '{"processes": false}',
     chunks: int = 1024,
     grouping_area_factor: Tuple[float, float] = (3.0, 3.0),
-    seed_step: int | None = None,
+    seed_step: str | None = None,
+    active_set: bool = False,
+    kernel: bool = False,
+    geometry_step: int | None = None,
+    geometry_tolerance: float = 0.1,
+    geometry_cache_dir: str | None = None,
+    memory_limit: str | None = None,
 ) -> None:
     """Generate a simulated terrain corrected image from a Sentinel-1 product."""
     client_kwargs = json.loads(client_kwargs_json)
     real_chunks = chunks if chunks > 0 else None
-    real_seed_step = (seed_step, seed_step) if seed_step is not None else None
+    real_seed_step = parse_seed_step(seed_step)
     logging.basicConfig(level=logging.INFO)
     product = sentinel1.Sentinel1SarProduct(
         product_urlpath,
@@ -83,6 +115,12 @@ def stc(
         client_kwargs=client_kwargs,
         chunks=real_chunks,
         seed_step=real_seed_step,
+        active_set=active_set,
+        kernel=kernel,
+        geometry_step=geometry_step,
+        geometry_tolerance=geometry_tolerance,
+        geometry_cache_dir=geometry_cache_dir,
+        memory_limit=memory_limit,
     )
 
 
@@ -96,12 +134,20 @@ def rtc(
     client_kwargs_json: str = '{"processes": false}',
     chunks: int = 1024,
     grouping_area_factor: Tuple[float, float] = (3.0, 3.0),
-    seed_step: int | None = None,
+    seed_step: str | None = None,
+    active_set: bool = False,
+    kernel: bool = False,
+    geometry_step: int | None = None,
+    geometry_tolerance: float = 0.1,
+    geometry_cache_dir: str | None = None,
+    gamma_projection_urlpath: str | None = None,
+    polarisations: str | None = None,
+    memory_limit: str | None = None,
 ) -> None:
     """Generate a radiometrically terrain corrected (RTC) image from Sentinel-1 product."""
     client_kwargs = json.loads(client_kwargs_json)
     real_chunks = chunks if chunks > 0 else None
-    real_seed_step = (seed_step, seed_step) if seed_step is not None else None
+    real_seed_step = parse_seed_step(seed_step)
     logging.basicConfig(level=logging.INFO)
     product = sentinel1.Sentinel1SarProduct(
         product_urlpath,
@@ -117,6 +163,14 @@ def rtc(
         client_kwargs=client_kwargs,
         chunks=real_chunks,
         seed_step=real_seed_step,
+        active_set=active_set,
+        kernel=kernel,
+        geometry_step=geometry_step,
+        geometry_tolerance=geometry_tolerance,
+        geometry_cache_dir=geometry_cache_dir,
+        gamma_projection_urlpath=gamma_projection_urlpath,
+        polarisations=parse_polarisations(polarisations),
+        memory_limit=memory_limit,
     )
 
 
@@ -1,18 +1,56 @@
 import logging
-from typing import Any, Container
-from unittest import mock
+import threading
+from typing import Any, Callable, Container, Sequence
 
 import dask
 import numpy as np
+import numpy.typing as npt
 import rioxarray
 import xarray as xr
+from rasterio import transform as rio_transform
+from rasterio import warp
 
-from . import chunking, datamodel, geocoding, radiometry, scene
+from . import (
+    cache,
+    chunking,
+    datamodel,
+    footprint,
+    geocoding,
+    radiometry,
+    resampling,
+    scene,
+)
 
 logger = logging.getLogger(__name__)
 
 
 SPEED_OF_LIGHT = 299_792_458.0  # m / s
+ONE_SECOND = np.timedelta64(10**9, "ns")
+
+# peak memory of the processing steps of a DEM chunk in bytes per pixel, measured with
+# tracemalloc on the test products, and memory of the results held between the steps
+STEP_BYTES_PER_PIXEL = {
+    "dem_ecef": 130,
+    "acquisition": 250,
+    "acquisition_gamma_area": 310,
+    "gamma_bilinear": 250,
+    "gamma_nearest": 80,
+    "geocode_GRD": 500,
+    "geocode_SLC": 2300,
+}
+RESULT_BYTES_PER_PIXEL = {
+    "dem_ecef": 24,
+    "acquisition": 16,
+    "acquisition_gamma_area": 24,
+    "simulated": 8,
+    "geocoded": 8,
+}
+# memory of the whole DEM held across the chunks by the radiometry, the SAR-grid
+# accumulator and the projection matrix assume at least one DEM pixel per SAR cell
+GLOBAL_BYTES_PER_PIXEL = {
+    "accumulator": 24 + 32,
+    "projection": 24 + 64,
+}
 
 
 def make_simulate_acquisition_template(
@@ -45,7 +83,10 @@ def simulate_acquisition(
         dem_ecef, orbit_interpolator, azimuth_time, **kwargs
     )
 
-    slant_range = (acquisition.dem_distance**2).sum(dim="axis") ** 0.5
+    if "slant_range" in acquisition.data_vars:
+        slant_range = acquisition.data_vars["slant_range"]
+    else:
+        slant_range = (acquisition.dem_distance**2).sum(dim="axis") ** 0.5
     slant_range_time = 2.0 / SPEED_OF_LIGHT * slant_range
 
     acquisition["slant_range_time"] = slant_range_time
@@ -68,31 +109,236 @@ def simulate_acquisition(
     return acquisition
 
 
-def geocode_grd_chunk(
+def upsample_bilinear(
+    values: npt.NDArray[np.float64],
+    nodes_y: npt.NDArray[np.int_],
+    nodes_x: npt.NDArray[np.int_],
+) -> npt.NDArray[np.float64]:
+    """Bilinearly upsample ``values`` given on the ``nodes_y`` x ``nodes_x`` pixels."""
+    weights = []
+    for nodes in (nodes_y, nodes_x):
+        pixels = np.arange(nodes[-1] + 1)
+        index = np.clip(
+            np.searchsorted(nodes, pixels, side="right") - 1, 0, nodes.size - 2
+        )
+        weight = (pixels - nodes[index]) / (nodes[index + 1] - nodes[index])
+        weights.append((index, weight))
+    (iy, wy), (ix, wx) = weights
+    wy = wy[:, None]
+    upsampled: npt.NDArray[np.float64] = (1 - wy) * (
+        (1 - wx) * values[iy][:, ix] + wx * values[iy][:, ix + 1]
+    ) + wy * ((1 - wx) * values[iy + 1][:, ix] + wx * values[iy + 1][:, ix + 1])
+    return upsampled
+
+
+def acquisition_from_orbit_time(
+    dem_ecef: xr.DataArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    orbit_time: xr.DataArray,
+    include_variables: Container[str] = (),
+    dim: str = "axis",
+) -> xr.Dataset:
+    """Compute the image coordinates of the DEM given the zero-Doppler orbit time."""
+    position = orbit_interpolator.position_from_orbit_time(orbit_time)
+    dem_distance = dem_ecef - position
+    slant_range = (dem_distance**2).sum(dim=dim) ** 0.5
+    acquisition = xr.Dataset(
+        data_vars={
+            "azimuth_time": orbit_interpolator.to_calendar_time(orbit_time),
+            "slant_range_time": 2.0 / SPEED_OF_LIGHT * slant_range,
+        }
+    )
+    if "gamma_area" in include_variables:
+        acquisition["gamma_area"] = radiometry.compute_gamma_area(
+            dem_ecef, dem_distance / slant_range
+        )
+    return acquisition
+
+
+def simulate_acquisition_sparse(
+    dem_ecef: xr.DataArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    include_variables: Container[str] = (),
+    step: int = 8,
+    tolerance: float = 0.1,
+    azimuth_time_interval_s: float = 1.0,
+    slant_range_time_interval_s: float = 1.0,
+    dim: str = "axis",
+    **kwargs: Any,
+) -> xr.Dataset:
+    """Compute the image coordinates of the DEM solving exactly only on a sparse grid.
+
+    The orbit time is solved every ``step`` DEM pixels and bilinearly upsampled, the slant
+    range follows from the satellite position at that time and its error is of second
+    order. The result is checked against the exact solution at the centre of every cell of
+    the sparse grid and the cells where the error exceeds ``tolerance`` SAR pixels, in
+    azimuth or in slant range, are solved exactly using the upsampled time as initial guess.
+    """
+    dem_ecef = dem_ecef.transpose(dim, "y", "x")
+    nodes = {
+        d: np.unique(
+            np.r_[np.arange(0, dem_ecef.sizes[d], step), dem_ecef.sizes[d] - 1]
+        )
+        for d in ("y", "x")
+    }
+    if min(n.size for n in nodes.values()) < 3:
+        # no room for a sparse grid
+        return simulate_acquisition(
+            dem_ecef, orbit_interpolator, include_variables, dim=dim, **kwargs
+        )
+
+    def solve(dem: xr.DataArray, **solve_kwargs: Any) -> xr.Dataset:
+        acquisition = simulate_acquisition(
+            dem,
+            orbit_interpolator,
+            include_variables={"azimuth_time", "slant_range_time"},
+            dim=dim,
+            **(kwargs | solve_kwargs),
+        )
+        orbit_time = orbit_interpolator.to_orbit_time(acquisition.azimuth_time)
+        return acquisition.assign(orbit_time=orbit_time)
+
+    node_orbit_time = solve(dem_ecef.isel(nodes)).orbit_time.transpose("y", "x")
+    orbit_time = upsample_bilinear(node_orbit_time.values, nodes["y"], nodes["x"])
+
+    centres = {d: (n[:-1] + n[1:]) // 2 for d, n in nodes.items()}
+    exact = solve(dem_ecef.isel(centres)).transpose("y", "x")
+    approximate = acquisition_from_orbit_time(
+        dem_ecef.isel(centres),
+        orbit_interpolator,
+        exact.orbit_time.copy(data=orbit_time[np.ix_(centres["y"], centres["x"])]),
+        dim=dim,
+    ).transpose("y", "x")
+    azimuth_error = abs(approximate.azimuth_time - exact.azimuth_time) / ONE_SECOND
+    azimuth_error = azimuth_error / azimuth_time_interval_s
+    range_error = abs(approximate.slant_range_time - exact.slant_range_time)
+    range_error = range_error / slant_range_time_interval_s
+    # NaN errors, e.g. failed geocoding, are conservatively refined
+    failed = ~((azimuth_error <= tolerance) & (range_error <= tolerance)).values
+
+    if np.any(failed):
+        # expand the failed cells to their pixels, nodes included
+        refine = np.zeros(orbit_time.shape, dtype=bool)
+        for i, j in zip(*np.nonzero(failed)):
+            refine[
+                nodes["y"][i] : nodes["y"][i + 1] + 1,
+                nodes["x"][j] : nodes["x"][j + 1] + 1,
+            ] = True
+        logger.info(
+            f"sparse geometry refined {failed.sum()} of {failed.size} cells, "
+            f"{refine.mean():.1%} of the pixels"
+        )
+        dem_refine = xr.DataArray(
+            dem_ecef.values[:, refine],
+            coords={dim: dem_ecef.coords[dim]} if dim in dem_ecef.coords else {},
+            dims=(dim, "point"),
+        )
+        guess = xr.DataArray(orbit_time[refine], dims="point")
+        refined = solve(dem_refine, azimuth_time=guess, seed_step=None)
+        orbit_time[refine] = refined.orbit_time.values
+
+    orbit_time_full = dem_ecef.isel({dim: 0}, drop=True).copy(data=orbit_time)
+    return acquisition_from_orbit_time(
+        dem_ecef,
+        orbit_interpolator,
+        orbit_time_full.rename("orbit_time"),
+        include_variables,
+        dim=dim,
+    )
+
+
+def stack_polarisations(
+    geocoded: Sequence[xr.DataArray], polarisations: Sequence[str]
+) -> xr.DataArray:
+    stacked = xr.concat(geocoded, dim="polarisation", coords="minimal")
+    return stacked.assign_coords(polarisation=[p.upper() for p in polarisations])
+
+
+def geocode_window(
     acquisition: xr.Dataset,
-    product: datamodel.GroundRangeSarProduct,
+    product: datamodel.SarProduct,
     dask_config: dict[str, Any] = {},
+    polarisations: Sequence[str] = (),
     **kwargs: Any,
 ) -> xr.DataArray:
-    beta_nought = product.beta_nought()
+    """Geocode a chunk reading only the window of the SAR image that it needs.
+
+    The range coordinate, i.e. the ground range of GRD products, and the window are
+    computed once for all ``polarisations``.
+    """
+    products = [product.with_polarisation(p) for p in polarisations] or [product]
+    range_dim = "ground_range" if product.product_type == "GRD" else "slant_range_time"
 
+    window = None
+    range_ = acquisition.slant_range_time
     if acquisition.slant_range_time.size > 0:
-        ground_range = product.slant_range_time_to_ground_range(
-            acquisition.azimuth_time,
-            acquisition.slant_range_time,
+        if range_dim == "ground_range":
+            assert isinstance(product, datamodel.GroundRangeSarProduct)
+            range_ = product.ground_range_lookup(
+                acquisition.azimuth_time, acquisition.slant_range_time
+            )
+        window = resampling.sar_window(
+            product.image_coords(),
+            {"azimuth_time": acquisition.azimuth_time.values, range_dim: range_.values},
         )
+    if window is None:
+        # outside of the SAR image, or template auto-detection of map_blocks
+        window = {"azimuth_time": slice(0, 0), range_dim: slice(0, 0)}
 
-        geocoded = beta_nought.interp(
-            azimuth_time=acquisition.azimuth_time, ground_range=ground_range, **kwargs
-        ).drop_vars(["azimuth_time", "ground_range"])
-
+    geocoded = []
+    for polarisation_product in products:
         with dask.config.set({"scheduler": "threads"} | dask_config):
-            geocoded = geocoded.compute()
-    else:
-        # This ensures map_blocks auto-detect the template
-        geocoded = acquisition.slant_range_time
+            beta_nought = polarisation_product.beta_nought_window(window)
+        geocoded_beta_nought = polarisation_product.interp_sar(
+            beta_nought,
+            azimuth_time=acquisition.azimuth_time,
+            **{range_dim: range_},
+            **kwargs,
+        )
+        geocoded.append(geocoded_beta_nought.rename("gtc"))
 
-    return geocoded.rename("gtc").assign_attrs(beta_nought.attrs)
+    if polarisations:
+        return stack_polarisations(geocoded, polarisations)
+    return geocoded[0]
+
+
+def geocode_chunk(
+    acquisition: xr.Dataset,
+    product: datamodel.SarProduct,
+    dask_config: dict[str, Any] = {},
+    polarisations: Sequence[str] = (),
+    **kwargs: Any,
+) -> xr.DataArray:
+    """Geocode a chunk, burst by burst if the product has bursts.
+
+    Every pixel is geocoded from the burst that owns its azimuth time, reading only the
+    window of that burst, so the bursts that the chunk doesn't intersect are never read.
+    """
+    bursts = product.bursts()
+    if not bursts:
+        return geocode_window(
+            acquisition, product, dask_config, polarisations, **kwargs
+        )
+
+    geocoded = None
+    for burst_product, (start, stop) in bursts:
+        owned = (acquisition.azimuth_time >= start) & (acquisition.azimuth_time < stop)
+        # the first burst also gives the output of the pixels outside of all bursts
+        if geocoded is not None and not owned.any():
+            continue
+        burst_geocoded = geocode_window(
+            acquisition.where(owned),
+            burst_product,
+            dask_config,
+            polarisations,
+            **kwargs,
+        )
+        if geocoded is None:
+            geocoded = burst_geocoded
+        else:
+            geocoded = burst_geocoded.where(owned, geocoded)
+    assert geocoded is not None
+    return geocoded
 
 
 def map_simulate_acquisition(
@@ -100,15 +346,25 @@ def map_simulate_acquisition(
     orbit_interpolator: datamodel.OrbitInterpolator,
     template_raster: xr.DataArray | None = None,
     correct_radiometry: str | None = None,
+    geometry_step: int | None = None,
     **kwargs: Any,
 ) -> xr.Dataset:
+    """Simulate the acquisition block by block, on a sparse grid if ``geometry_step`` is set.
+
+    With ``geometry_step`` the keyword arguments of `simulate_acquisition_sparse`, e.g. the
+    ``tolerance``, are accepted.
+    """
     if template_raster is None:
         template_raster = dem_ecef.isel(axis=0).drop_vars(["axis", "spatial_ref"]) * 0.0
     acquisition_template = make_simulate_acquisition_template(
         template_raster, correct_radiometry
     )
+    simulate: Callable[..., xr.Dataset] = simulate_acquisition
+    if geometry_step is not None:
+        simulate = simulate_acquisition_sparse
+        kwargs = kwargs | {"step": geometry_step}
     acquisition = xr.map_blocks(
-        simulate_acquisition,
+        simulate,
         dem_ecef.drop_vars("spatial_ref"),
         kwargs={
             "orbit_interpolator": orbit_interpolator,
@@ -120,6 +376,175 @@ def map_simulate_acquisition(
     return acquisition
 
 
+def fit_bilinear(
+    values: npt.NDArray[np.float64],
+    u: npt.NDArray[np.float64],
+    v: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """Fit ``values`` on the (v, u) grid with ``c0 + c1 * u + c2 * v + c3 * u * v``."""
+    uu, vv = np.meshgrid(u, v)
+    design = np.stack([np.ones_like(uu), uu, vv, uu * vv], axis=-1).reshape(-1, 4)
+    values = values.ravel()
+    valid = np.isfinite(values)
+    if not np.any(valid):
+        raise ValueError("no valid control point")
+    coefficients, *_ = np.linalg.lstsq(design[valid], values[valid], rcond=None)
+    return coefficients
+
+
+def correct_cached_acquisition(
+    cached: xr.Dataset,
+    dem_ecef: xr.DataArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    control_points: int = 5,
+    max_residual: float = 0.5,
+    satellite_speed: float = 7_500.0,
+    **kwargs: Any,
+) -> xr.Dataset | None:
+    """Adapt a cached acquisition geometry to the orbit of a repeat-pass acquisition.
+
+    The difference between the exact and the cached azimuth and slant range times is
+    computed on a grid of ``control_points`` x ``control_points`` DEM pixels and it is
+    applied to all pixels as a bilinear function of the pixel position.
+
+    The bilinear function ignores the part of the difference that depends on the DEM
+    height, which grows with the distance between the two orbits. If the residual of the
+    fit at the control points exceeds ``max_residual`` metres, with the azimuth times
+    converted at ``satellite_speed``, the cache is rejected and None is returned.
+    """
+    index = {
+        dim: np.linspace(0, dem_ecef.sizes[dim] - 1, control_points).round().astype(int)
+        for dim in ("y", "x")
+    }
+    exact_control = simulate_acquisition(
+        dem_ecef.isel(index).compute(),
+        orbit_interpolator,
+        include_variables={"azimuth_time", "slant_range_time"},
+        **kwargs,
+    ).transpose("y", "x")
+    cached_control = cached.isel(index).compute().transpose("y", "x")
+
+    uv = {
+        dim: xr.DataArray(
+            np.arange(cached.sizes[dim]) / max(cached.sizes[dim] - 1, 1),
+            coords={dim: cached.coords[dim]},
+        )
+        for dim in ("y", "x")
+    }
+    if cached.chunks:
+        uv = {dim: uv[dim].chunk({dim: cached.chunksizes[dim]}) for dim in uv}
+
+    u_control = uv["x"].values[index["x"]]
+    v_control = uv["y"].values[index["y"]]
+    uu, vv = np.meshgrid(u_control, v_control)
+    scales: dict[str, Any] = {"azimuth_time": ONE_SECOND, "slant_range_time": 1.0}
+    to_metres = {
+        "azimuth_time": satellite_speed,
+        "slant_range_time": SPEED_OF_LIGHT / 2,
+    }
+    corrected = cached.copy()
+    for name, scale in scales.items():
+        delta = (exact_control[name] - cached_control[name]) / scale
+        c0, c1, c2, c3 = fit_bilinear(delta.values, u_control, v_control)
+        logger.info(f"{name} correction of the geometry cache: {c0, c1, c2, c3}")
+        fitted = c0 + c1 * uu + c2 * vv + c3 * uu * vv
+        residual = np.nanmax(abs(delta.values - fitted)) * to_metres[name]
+        if residual > max_residual:
+            logger.warning(
+                f"reject the geometry cache, {name} residual of {residual:.3f} m"
+            )
+            return None
+        correction = c0 + c1 * uv["x"] + c2 * uv["y"] + c3 * uv["x"] * uv["y"]
+        corrected[name] = cached[name] + (correction * scale).transpose(
+            *cached[name].dims
+        )
+
+    return corrected
+
+
+def simulate_beta_nought_from_projection(
+    acquisition: xr.Dataset,
+    template_raster: xr.DataArray,
+    gamma_projection_urlpath: str,
+    key: str,
+    method: str = "bilinear",
+    grid_parameters: dict[str, Any] = {},
+) -> tuple[xr.DataArray, xr.Dataset]:
+    """Simulate the beta nought with the gamma projection matrix saved at the urlpath.
+
+    If the matrix does not exist, or it was saved with another ``key``, it is built from
+    the whole acquisition and saved. The acquisition is returned persisted in that case,
+    so that the geocoding doesn't compute the geometry again.
+    """
+    projection = cache.open_gamma_projection(gamma_projection_urlpath, key)
+    if projection is None:
+        acquisition = acquisition.persist()
+        projection = radiometry.gamma_projection_matrix(
+            acquisition.compute(), method=method, **grid_parameters
+        )
+        cache.save_gamma_projection(projection, gamma_projection_urlpath, key)
+
+    simulated_beta_nought = radiometry.apply_gamma_projection(
+        projection, template_raster
+    )
+    if template_raster.chunks:
+        simulated_beta_nought = simulated_beta_nought.chunk(template_raster.chunksizes)
+    return simulated_beta_nought, acquisition
+
+
+def estimate_radiometry_bound(
+    dem_ecef: xr.DataArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    grid_parameters: dict[str, Any],
+    step: int = 8,
+) -> int:
+    """Estimate the overlap of the radiometry chunks from the geometry of a subsampled DEM."""
+    dem_ecef_coarse = dem_ecef.isel(
+        y=slice(step // 2, None, step), x=slice(step // 2, None, step)
+    ).compute()
+    coarse_acquisition = simulate_acquisition(
+        dem_ecef_coarse,
+        orbit_interpolator,
+        include_variables={"azimuth_time", "slant_range_time"},
+    )
+    return radiometry.estimate_overlap_bound(
+        coarse_acquisition, step=step, **grid_parameters
+    )
+
+
+def clip_radiometry_bound(radiometry_bound: int, dem_raster: xr.DataArray) -> int:
+    """Clip the overlap to the smallest DEM chunk, the largest overlap dask supports."""
+    if not dem_raster.chunks:
+        return radiometry_bound
+    max_bound = min(min(c) for c in dem_raster.chunks)
+    if radiometry_bound > max_bound:
+        logger.warning(
+            f"radiometry overlap bound {radiometry_bound} clipped to the DEM chunks "
+            f"size {max_bound}, the gamma areas may be truncated. "
+            "Use larger chunks or radiometry_method='accumulator'"
+        )
+        radiometry_bound = max_bound
+    return radiometry_bound
+
+
+def estimate_bytes_per_pixel(
+    product_type: str,
+    correct_radiometry: str | None = None,
+    dem_itemsize: int = 4,
+) -> int:
+    """Estimate the peak memory of the processing of a DEM chunk in bytes per pixel."""
+    acquisition = (
+        "acquisition" if correct_radiometry is None else "acquisition_gamma_area"
+    )
+    steps = ["dem_ecef", acquisition, f"geocode_{product_type}"]
+    results = ["dem_ecef", acquisition, "geocoded"]
+    if correct_radiometry is not None:
+        steps.append(correct_radiometry)
+        results.append("simulated")
+    held = dem_itemsize + sum(RESULT_BYTES_PER_PIXEL[r] for r in results)
+    return held + max(STEP_BYTES_PER_PIXEL[s] for s in steps)
+
+
 def do_terrain_correction(
     product: datamodel.SarProduct,
     dem_raster: xr.DataArray,
@@ -128,10 +553,37 @@ def do_terrain_correction(
     interp_method: xr.core.types.InterpOptions = "nearest",
     grouping_area_factor: tuple[float, float] = (3.0, 3.0),
     radiometry_chunks: int = 2048,
-    radiometry_bound: int = 128,
-    seed_step: tuple[int, int] | None = None,
+    radiometry_bound: int | str = 128,
+    radiometry_method: str = "overlap",
+    seed_step: tuple[int, int] | str | None = None,
+    active_set: bool = False,
+    kernel: bool = False,
+    geometry_step: int | None = None,
+    geometry_tolerance: float = 0.1,
     persist_simulation: bool = False,
+    geometry_cache_urlpath: str | None = None,
+    footprint_culling: bool = True,
+    gamma_projection_urlpath: str | None = None,
+    polarisations: Sequence[str] = (),
+    target_raster: xr.DataArray | None = None,
 ) -> tuple[xr.DataArray, xr.DataArray | None]:
+    allowed_radiometry_methods = ["accumulator", "overlap"]
+    if radiometry_method not in allowed_radiometry_methods:
+        raise ValueError(
+            f"{radiometry_method=}. Must be one of: {allowed_radiometry_methods}"
+        )
+    if interp_method not in resampling.RESAMPLING_METHODS:
+        raise ValueError(
+            f"{interp_method=}. Must be one of: {resampling.RESAMPLING_METHODS}"
+        )
+    if active_set and kernel:
+        raise ValueError("active_set and kernel cannot be used together")
+    geocode_kwargs: dict[str, Any] = {
+        "seed_step": seed_step,
+        "active_set": active_set,
+        "kernel": kernel,
+    }
+
     logger.info("pre-process DEM")
 
     dem_ecef = xr.map_blocks(
@@ -144,12 +596,52 @@ def do_terrain_correction(
 
     orbit_interpolator = product.orbit_interpolator()
 
-    acquisition = map_simulate_acquisition(
-        dem_ecef,
-        orbit_interpolator,
-        correct_radiometry=correct_radiometry,
-        seed_step=seed_step,
-    )
+    chunk_classes = None
+    if footprint_culling and dem_raster.chunks:
+        chunk_classes = footprint.classify_chunks(
+            dem_raster,
+            product,
+            orbit_interpolator,
+            source_crs=convert_to_dem_ecef_kwargs.get("source_crs"),
+        )
+        counts = np.bincount(chunk_classes.ravel(), minlength=3)
+        logger.info(
+            f"DEM chunks outside: {counts[footprint.OUTSIDE]}, "
+            f"partial: {counts[footprint.PARTIAL]}, inside: {counts[footprint.INSIDE]}"
+        )
+
+    cached = None
+    if geometry_cache_urlpath is not None:
+        chunks = {str(d): c[0] for d, c in dem_raster.chunksizes.items()} or None
+        cached = cache.open_geometry_cache(geometry_cache_urlpath, chunks=chunks)
+
+    acquisition = None
+    if cached is not None:
+        acquisition = correct_cached_acquisition(
+            cached, dem_ecef, orbit_interpolator, **geocode_kwargs
+        )
+    if acquisition is None:
+        sparse_kwargs = {}
+        if geometry_step is not None:
+            pixel_grid = product.grid_parameters(grouping_area_factor=(1.0, 1.0))
+            sparse_kwargs = {
+                "geometry_step": geometry_step,
+                "tolerance": geometry_tolerance,
+                "azimuth_time_interval_s": pixel_grid["azimuth_time_interval_s"],
+                "slant_range_time_interval_s": pixel_grid[
+                    "slant_range_time_interval_s"
+                ],
+            }
+        acquisition = map_simulate_acquisition(
+            dem_ecef,
+            orbit_interpolator,
+            correct_radiometry=correct_radiometry,
+            **geocode_kwargs,
+            **sparse_kwargs,
+        )
+        if geometry_cache_urlpath is not None:
+            acquisition = cache.save_geometry_cache(acquisition, geometry_cache_urlpath)
+    acquisition = footprint.cull_chunks(acquisition, chunk_classes)
 
     simulated_beta_nought = None
     if correct_radiometry is not None:
@@ -162,14 +654,52 @@ def do_terrain_correction(
         elif correct_radiometry == "gamma_nearest":
             gamma_weights = radiometry.gamma_weights_nearest
 
-        simulated_beta_nought = chunking.map_overlap(
-            obj=acquisition,
-            function=gamma_weights,
-            chunks=radiometry_chunks,
-            bound=radiometry_bound,
-            kwargs=grid_parameters,
-            template=template_raster,
+        if gamma_projection_urlpath is not None:
+            method = correct_radiometry.removeprefix("gamma_")
+            projection_key = cache.gamma_projection_key(
+                product.geometry_key(), dem_raster, method, grid_parameters
+            )
+            simulated_beta_nought, acquisition = simulate_beta_nought_from_projection(
+                acquisition,
+                template_raster,
+                gamma_projection_urlpath,
+                projection_key,
+                method=method,
+                grid_parameters=grid_parameters,
+            )
+        elif radiometry_method == "accumulator":
+            simulated_beta_nought = chunking.map_scatter_gather(
+                radiometry.gamma_area_sar_grid_sum,
+                radiometry.merge_sar_grid_sums,
+                radiometry.gather_sar_grid_sum,
+                obj=acquisition,
+                template=template_raster,
+                kwargs=grid_parameters
+                | {"method": correct_radiometry.removeprefix("gamma_")},
+            )
+        else:
+            if radiometry_bound == "auto":
+                radiometry_bound = estimate_radiometry_bound(
+                    dem_ecef, orbit_interpolator, grid_parameters
+                )
+            assert not isinstance(radiometry_bound, str)
+            radiometry_bound = clip_radiometry_bound(radiometry_bound, dem_raster)
+            logger.info(f"radiometry overlap bound: {radiometry_bound} pixels")
+            simulated_beta_nought = chunking.map_overlap(
+                obj=acquisition,
+                function=gamma_weights,
+                chunks=radiometry_chunks,
+                bound=radiometry_bound,
+                kwargs=grid_parameters,
+                template=template_raster,
+            )
+        simulated_beta_nought = footprint.cull_chunks(
+            simulated_beta_nought, chunk_classes
         )
+        if target_raster is not None:
+            simulated_beta_nought = resampling.regrid_linear(
+                simulated_beta_nought, target_raster
+            )
         if persist_simulation:
             simulated_beta_nought = simulated_beta_nought.persist()
         simulated_beta_nought.attrs["long_name"] = "terrain-simulated beta nought"
@@ -178,33 +708,40 @@ def do_terrain_correction(
         simulated_beta_nought.y.attrs.update(dem_ecef.y.attrs)
         simulated_beta_nought.rio.write_crs(dem_ecef.rio.crs, inplace=True)
 
+    if target_raster is not None:
+        logger.info("interpolate the geometry on the target grid")
+        acquisition = resampling.regrid_linear(
+            acquisition[["azimuth_time", "slant_range_time"]], target_raster
+        )
+        template_raster = target_raster.drop_vars("spatial_ref", errors="ignore")
+        # the chunk classes refer to the DEM chunks
+        chunk_classes = None
+
     logger.info("terrain-correct image")
 
-    if product.product_type == "GRD":
-        # optimized GRD processing
-        geocoded = xr.map_blocks(
-            geocode_grd_chunk,
-            acquisition,
-            kwargs={"product": product, "method": interp_method},
+    template = None
+    if polarisations:
+        template = template_raster.expand_dims(
+            polarisation=[p.upper() for p in polarisations]
         )
-    else:
-        beta_nought = product.beta_nought()
-
-        # HACK: we monkey-patch away an optimisation in xr.DataArray.interp that actually makes
-        #   the interpolation much slower when indeces are dask arrays.
-        with mock.patch("xarray.core.missing._localize", lambda o, i: (o, i)):
-            geocoded = product.interp_sar(
-                beta_nought,
-                azimuth_time=acquisition.azimuth_time,
-                slant_range_time=acquisition.slant_range_time,
-                method=interp_method,
-            )
+    geocoded = xr.map_blocks(
+        geocode_chunk,
+        acquisition,
+        kwargs={
+            "product": product,
+            "method": interp_method,
+            "polarisations": polarisations,
+        },
+        template=template,
+    )
 
     if correct_radiometry is not None:
         assert simulated_beta_nought is not None
         geocoded = geocoded / simulated_beta_nought
         geocoded.attrs["long_name"] = "terrain-corrected gamma nought"
 
+    geocoded = footprint.cull_chunks(geocoded, chunk_classes)
+
     geocoded.x.attrs.update(dem_ecef.x.attrs)
     geocoded.y.attrs.update(dem_ecef.y.attrs)
     geocoded.rio.write_crs(dem_ecef.rio.crs, inplace=True)
@@ -212,6 +749,41 @@ def do_terrain_correction(
     return geocoded, simulated_beta_nought
 
 
+def save_raster(
+    data: xr.DataArray, urlpath: str, blocksize: int, client: Any = None
+) -> Any:
+    """Save to a tiled GeoTIFF, dask-backed data are written block by block on compute."""
+    if client is not None:
+        from dask.distributed import Lock
+
+        lock: Any = Lock(f"rio-{urlpath}", client=client)
+    else:
+        lock = threading.Lock()
+    return data.rio.to_raster(
+        urlpath,
+        dtype=np.float32,
+        tiled=True,
+        blockxsize=blocksize,
+        blockysize=blocksize,
+        compress="ZSTD",
+        num_threads="ALL_CPUS",
+        lock=lock,
+        compute=False,
+    )
+
+
+def save_zarr(geocoded: xr.DataArray, urlpath: str, **kwargs: Any) -> Any:
+    """Save to Zarr with one variable per polarisation, if any."""
+    # drop the auxiliary coordinates, if any
+    auxiliary = set(geocoded.coords) - set(geocoded.dims) - {"spatial_ref"}
+    geocoded = geocoded.drop_vars(auxiliary)
+    if "polarisation" in geocoded.dims:
+        dataset = geocoded.astype(np.float32).to_dataset(dim="polarisation")
+    else:
+        dataset = geocoded.astype(np.float32).to_dataset(name=geocoded.name or "gtc")
+    return dataset.to_zarr(urlpath, mode="w", **kwargs)
+
+
 def terrain_correction(
     product: datamodel.SarProduct,
     dem_urlpath: str,
@@ -224,11 +796,22 @@ def terrain_correction(
     dem_raster_sel: dict[str, slice] = {},
     chunks: int | None = 1024,
     radiometry_chunks: int = 2048,
-    radiometry_bound: int = 128,
+    radiometry_bound: int | str = 128,
+    radiometry_method: str = "overlap",
     enable_dask_distributed: bool = False,
     client_kwargs: dict[str, Any] = {"processes": False},
-    seed_step: tuple[int, int] | None = None,
+    seed_step: tuple[int, int] | str | None = None,
+    active_set: bool = False,
+    kernel: bool = False,
+    geometry_step: int | None = None,
+    geometry_tolerance: float = 0.1,
     convert_to_dem_ecef_kwargs: dict[str, Any] = {},
+    geometry_cache_dir: str | None = None,
+    footprint_culling: bool = True,
+    gamma_projection_urlpath: str | None = None,
+    polarisations: Sequence[str] = (),
+    memory_limit: int | str | None = None,
+    target_grid: tuple[Any, Any, tuple[int, int]] | None = None,
 ) -> xr.DataArray:
     """Apply the terrain-correction to sentinel-1 SLC and GRD products.
 
@@ -240,8 +823,8 @@ def terrain_correction(
     algorithm using bilinear interpolation to compute the weights. `correct_radiometry=gamma_nearest`
     applies the gamma flattening using nearest neighbours instead of bilinear interpolation.
     'gamma_nearest' significantly reduces the processing time
-    :param interp_method: interpolation method for product resampling.
-    The interpolation methods are the methods supported by ``xarray.DataArray.interp``
+    :param interp_method: interpolation method for product resampling, one of `"nearest"`,
+    `"linear"` or `"cubic"`. The SAR image is resampled by index on its regular grid
     :param grouping_area_factor: is a tuple of floats greater than 1. The default is `(1, 1)`.
     The `grouping_area_factor`  can be increased (i) to speed up the processing or
     (ii) when the input DEM resolution is low.
@@ -250,8 +833,49 @@ def terrain_correction(
     Otherwise, the output may have radiometric distortions.
     This problem can be avoided by increasing the `grouping_area_factor`.
     Be aware that `grouping_area_factor` too high may degrade the final result
+    :param radiometry_method: default `"overlap"`. The chunks of `radiometry_chunks` pixels are
+    processed independently with an overlap of `radiometry_bound` pixels, the sums are truncated
+    if the displacement is larger than the overlap. With `"accumulator"` the gamma areas of every
+    DEM chunk are summed on a global SAR-grid accumulator and every chunk gathers its simulated
+    beta nought from it, the result is exact for any terrain displacement but the memory of the
+    accumulator grows with the SAR grid spanned by the DEM
+    :param radiometry_bound: default `128`. Overlap in pixels of the `"overlap"` radiometry
+    method. With `"auto"` the smallest safe overlap is estimated from the acquisition geometry
+    of the DEM subsampled every 8 pixels, at the cost of an extra geocoding of the samples
     :param open_dem_raster_kwargs: additional keyword arguments passed on to ``xarray.open_dataset``
     to open the `dem_urlpath`
+    :param active_set: default `False`. Iterate the zero-Doppler solver only on the DEM pixels
+    that did not converge yet, see `geocoding.backward_geocode`
+    :param kernel: default `False`. Solve the zero-Doppler equation with the in-place NumPy kernel
+    `geocoding.backward_geocode_kernel`, that supports only polyfit orbits and that is faster and
+    uses less memory. It cannot be used together with `active_set`
+    :param geometry_step: default `None`. If set, the acquisition geometry is solved exactly only
+    every `geometry_step` DEM pixels and bilinearly upsampled. The cells of the sparse grid whose
+    error at the centre exceeds `geometry_tolerance` SAR pixels are solved exactly
+    :param geometry_tolerance: default `0.1`. Tolerance in SAR pixels of the sparse geometry
+    :param geometry_cache_dir: directory of the Zarr stores caching the acquisition geometry
+    by relative orbit and DEM tile. On a cache hit the Newton solve and the gamma area computation
+    are skipped and the cached geometry is corrected for the orbit of the product
+    :param footprint_culling: default `True`. Classify the DEM chunks against the footprint of
+    the product geocoding only their corners and skip the processing of the chunks outside it,
+    that are returned as missing values
+    :param gamma_projection_urlpath: path of the ``.npz`` file of the sparse DEM to SAR gamma area
+    projection matrix. If the file exists and was saved for the same product geometry, DEM grid,
+    `correct_radiometry` and SAR grid the simulated beta nought is computed from it, otherwise
+    the matrix is computed from the whole acquisition and saved, so that other polarisations and
+    re-runs of the same geometry skip the gamma weights computation
+    :param polarisations: polarisations of the swath of `product` to terrain-correct sharing the
+    acquisition geometry and the simulated beta nought, e.g. `["VV", "VH"]`.
+    The output has a `polarisation` dimension and it is saved as a multi-band GeoTIFF,
+    or as a Zarr store with one variable per polarisation if `output_urlpath` ends with `.zarr`
+    :param memory_limit: memory budget in bytes or as a string like `"8GB"`. If set, `chunks`
+    and `radiometry_chunks` are computed from the estimated peak memory per DEM pixel of the
+    selected processing, so that one chunk per CPU, with its radiometry overlap, fits the budget
+    :param target_grid: default `None`, the output has the grid of the DEM. Output grid as a
+    `(crs, transform, shape)` tuple of a north-up affine transform, e.g. a finer grid than the DEM.
+    The geometry and the simulated beta nought are computed at the DEM resolution on the DEM
+    pixels around the output grid and bilinearly interpolated on it before the SAR sampling.
+    The DEM is lazily and bilinearly reprojected at its resolution if `crs` is not its CRS
     """
     # rioxarray must be imported explicitly or accesses to `.rio` may fail in dask
     assert rioxarray.__version__
@@ -274,13 +898,11 @@ def terrain_correction(
 
     output_chunks = chunks if chunks is not None else 512
 
-    to_raster_kwargs: dict[str, Any] = {}
+    client = None
     if enable_dask_distributed:
-        from dask.distributed import Client, Lock
+        from dask.distributed import Client
 
         client = Client(**client_kwargs)
-        to_raster_kwargs["lock"] = Lock("rio", client=client)
-        to_raster_kwargs["compute"] = False
         print(f"Dask distributed dashboard at: {client.dashboard_link}")
 
     logger.info(f"open DEM {dem_urlpath!r}")
@@ -291,9 +913,96 @@ def terrain_correction(
     if dem_raster_sel:
         dem_raster = dem_raster.sel(dem_raster_sel)
 
-    persist_simulation = False
-    if simulated_urlpath is not None:
-        persist_simulation = True
+    target_raster = None
+    if target_grid is not None:
+        target_crs, transform, shape = target_grid
+        target_raster = scene.make_target_raster(
+            target_crs, transform, shape, chunks=output_chunks
+        )
+        if target_raster.rio.crs != dem_raster.rio.crs:
+            # the DEM is reprojected lazily at its resolution on the area of the target grid
+            dem_transform, _, _ = warp.calculate_default_transform(
+                dem_raster.rio.crs,
+                target_crs,
+                dem_raster.rio.width,
+                dem_raster.rio.height,
+                *dem_raster.rio.bounds(),
+            )
+            resolution = abs(dem_transform.a)
+            left, bottom, right, top = target_raster.rio.bounds()
+            dem_margin = 2 * resolution
+            dem_shape = (
+                int(np.ceil((top - bottom + 2 * dem_margin) / resolution)),
+                int(np.ceil((right - left + 2 * dem_margin) / resolution)),
+            )
+            logger.info(f"reproject DEM to {target_crs} with shape {dem_shape}")
+            dem_grid = scene.make_target_raster(
+                target_crs,
+                rio_transform.from_origin(
+                    left - dem_margin, top + dem_margin, resolution, resolution
+                ),
+                dem_shape,
+                chunks=chunks,
+            )
+            dem_encoding = dem_raster.encoding
+            dem_raster = resampling.reproject_linear(dem_raster, dem_grid)
+            dem_raster.encoding.update(dem_encoding)
+        else:
+            # the geometry is needed only on the DEM pixels around the target grid
+            margin = {
+                dim: 2 * abs(float(dem_raster[dim][1] - dem_raster[dim][0]))
+                for dim in ("y", "x")
+            }
+            dem_raster = dem_raster.sel(
+                {
+                    dim: slice(
+                        float(target_raster[dim].min()) - margin[dim],
+                        float(target_raster[dim].max()) + margin[dim],
+                    )
+                    for dim in ("y", "x")
+                }
+            )
+
+    if memory_limit is not None:
+        global_bytes_per_pixel = 0.0
+        bound = 0
+        if correct_radiometry is not None:
+            if gamma_projection_urlpath is not None:
+                global_bytes_per_pixel += GLOBAL_BYTES_PER_PIXEL["projection"]
+            elif radiometry_method == "accumulator":
+                global_bytes_per_pixel += GLOBAL_BYTES_PER_PIXEL["accumulator"]
+            else:
+                if radiometry_bound == "auto":
+                    radiometry_bound = estimate_radiometry_bound(
+                        xr.map_blocks(
+                            scene.convert_to_dem_ecef,
+                            dem_raster,
+                            kwargs=convert_to_dem_ecef_kwargs,
+                        ),
+                        product.orbit_interpolator(),
+                        product.grid_parameters(grouping_area_factor),
+                    )
+                assert not isinstance(radiometry_bound, str)
+                bound = radiometry_bound
+        chunks = chunking.memory_limit_chunks(
+            dask.utils.parse_bytes(memory_limit),
+            dem_raster.shape,
+            estimate_bytes_per_pixel(
+                product.product_type, correct_radiometry, dem_raster.dtype.itemsize
+            ),
+            bound=bound,
+            global_bytes_per_pixel=global_bytes_per_pixel,
+        )
+        logger.info(f"chunks for {memory_limit=}: {chunks}")
+        radiometry_chunks = output_chunks = chunks
+        dem_raster = dem_raster.chunk(chunks)
+
+    geometry_cache_urlpath = None
+    if geometry_cache_dir is not None:
+        key = cache.geometry_cache_key(
+            product.geometry_key(), dem_raster, correct_radiometry
+        )
+        geometry_cache_urlpath = cache.geometry_cache_urlpath(geometry_cache_dir, key)
 
     geocoded, simulated_beta_nought = do_terrain_correction(
         product=product,
@@ -303,47 +1012,40 @@ def terrain_correction(
         grouping_area_factor=grouping_area_factor,
         radiometry_chunks=radiometry_chunks,
         radiometry_bound=radiometry_bound,
+        radiometry_method=radiometry_method,
         seed_step=seed_step,
+        active_set=active_set,
+        kernel=kernel,
+        geometry_step=geometry_step,
+        geometry_tolerance=geometry_tolerance,
         convert_to_dem_ecef_kwargs=convert_to_dem_ecef_kwargs,
-        persist_simulation=persist_simulation,
+        geometry_cache_urlpath=geometry_cache_urlpath,
+        footprint_culling=footprint_culling,
+        gamma_projection_urlpath=gamma_projection_urlpath,
+        polarisations=polarisations,
+        target_raster=target_raster,
     )
 
+    # the outputs are computed at once, sharing the acquisition geometry, and are
+    # written block by block
+    writes = []
     if simulated_urlpath is not None:
         assert simulated_beta_nought is not None
-        logger.info("save simulated")
-
-        maybe_delayed = simulated_beta_nought.rio.to_raster(
-            simulated_urlpath,
-            dtype=np.float32,
-            tiled=True,
-            blockxsize=output_chunks,
-            blockysize=output_chunks,
-            compress="ZSTD",
-            num_threads="ALL_CPUS",
-            **to_raster_kwargs,
+        logger.info(f"save simulated {simulated_urlpath!r}")
+        writes.append(
+            save_raster(simulated_beta_nought, simulated_urlpath, output_chunks, client)
         )
 
-        if enable_dask_distributed:
-            maybe_delayed.compute()
+    if output_urlpath is not None:
+        logger.info(f"save output {output_urlpath!r}")
+        if output_urlpath.endswith(".zarr"):
+            writes.append(save_zarr(geocoded, output_urlpath, compute=False))
+        else:
+            writes.append(save_raster(geocoded, output_urlpath, output_chunks, client))
+
+    dask.compute(*writes)  # type: ignore
 
     if output_urlpath is None:
         assert simulated_beta_nought is not None
         return simulated_beta_nought
-
-    logger.info("save output")
-
-    maybe_delayed = geocoded.rio.to_raster(
-        output_urlpath,
-        dtype=np.float32,
-        tiled=True,
-        blockxsize=output_chunks,
-        blockysize=output_chunks,
-        compress="ZSTD",
-        num_threads="ALL_CPUS",
-        **to_raster_kwargs,
-    )
-
-    if enable_dask_distributed:
-        maybe_delayed.compute()
-
     return geocoded
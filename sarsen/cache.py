@@ -0,0 +1,156 @@
+"""On-disk cache of the acquisition geometry and of the gamma projection matrix."""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Any
+
+import numpy as np
+import xarray as xr
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+def dem_key(dem_raster: xr.DataArray) -> dict[str, Any]:
+    key = {
+        "source": dem_raster.encoding.get("source"),
+        "crs": dem_raster.rio.crs.to_wkt() if dem_raster.rio.crs else None,
+        "chunks": dem_raster.chunks,
+    }
+    for dim in ("y", "x"):
+        coord = dem_raster.coords[dim].values
+        key[dim] = [float(coord[0]), float(coord[-1]), coord.size]
+    return key
+
+
+def geometry_cache_key(
+    geometry_key: dict[str, Any],
+    dem_raster: xr.DataArray,
+    correct_radiometry: str | None = None,
+) -> str:
+    """Return a hash identifying the geometry of a relative orbit over a DEM tile."""
+    key = {
+        "geometry": geometry_key,
+        "dem": dem_key(dem_raster),
+        "gamma_area": correct_radiometry is not None,
+    }
+    key_json = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(key_json.encode()).hexdigest()[:16]
+
+
+def gamma_projection_key(
+    geometry_key: dict[str, Any],
+    dem_raster: xr.DataArray,
+    method: str,
+    grid_parameters: dict[str, Any],
+) -> str:
+    """Return a hash identifying the gamma projection matrix of a SAR grid over a DEM grid."""
+    key = {
+        "geometry": geometry_key,
+        # the matrix doesn't depend on the chunks of the DEM
+        "dem": {k: v for k, v in dem_key(dem_raster).items() if k != "chunks"},
+        "method": method,
+        "grid": grid_parameters,
+    }
+    key_json = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(key_json.encode()).hexdigest()[:16]
+
+
+def geometry_cache_urlpath(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"geometry-{key}.zarr")
+
+
+def open_geometry_cache(
+    urlpath: str, chunks: dict[str, int] | None = None
+) -> xr.Dataset | None:
+    """Open the geometry cache at the urlpath or return None if it is missing or unreadable.
+
+    The caches are written to a temporary store and renamed into place only when complete,
+    so a store that can't be opened, e.g. left by an older version, is recomputed.
+    """
+    try:
+        cached: xr.Dataset = xr.open_zarr(urlpath, chunks=chunks)
+    except FileNotFoundError:
+        return None
+    except (KeyError, ValueError) as ex:
+        logger.warning(f"ignore unreadable geometry cache {urlpath!r}: {ex!r}")
+        return None
+    logger.info(f"geometry cache hit {urlpath!r}")
+    return cached
+
+
+def save_geometry_cache(acquisition: xr.Dataset, urlpath: str) -> xr.Dataset:
+    """Compute and store the geometry, then return it lazily opened from the store.
+
+    The store is written next to ``urlpath`` and renamed into place at the end, so an
+    interrupted computation never leaves a partially written cache at ``urlpath``.
+    """
+    logger.info(f"save geometry cache {urlpath!r}")
+    # the attributes inherited from the DEM clash with the CF encoding of the times
+    to_store = acquisition.copy()
+    for data_var in to_store.data_vars.values():
+        data_var.attrs.clear()
+    tmp_urlpath = f"{urlpath}.{uuid.uuid4().hex}.tmp"
+    try:
+        to_store.to_zarr(tmp_urlpath, mode="w")
+        if os.path.exists(urlpath):
+            shutil.rmtree(urlpath)
+        os.replace(tmp_urlpath, urlpath)
+    finally:
+        if os.path.exists(tmp_urlpath):
+            shutil.rmtree(tmp_urlpath)
+    chunks = {str(d): c[0] for d, c in acquisition.chunksizes.items()} or None
+    cached = open_geometry_cache(urlpath, chunks=chunks)
+    assert cached is not None
+    return cached
+
+
+def open_gamma_projection(urlpath: str, key: str) -> sparse.csr_matrix | None:
+    """Open the gamma projection matrix at the urlpath or return None if it is missing.
+
+    A matrix saved with another key, i.e. for another geometry, DEM grid, method or SAR
+    grid, or without a key is ignored and None is returned.
+    """
+    if not os.path.exists(urlpath):
+        return None
+    with np.load(urlpath) as npz:
+        saved_key = str(npz["key"]) if "key" in npz else None
+        if saved_key != key:
+            logger.warning(f"ignore gamma projection {urlpath!r} of another geometry")
+            return None
+        projection = sparse.csr_matrix(
+            (npz["data"], npz["indices"], npz["indptr"]), shape=tuple(npz["shape"])
+        )
+    logger.info(f"load gamma projection {urlpath!r}")
+    return projection
+
+
+def save_gamma_projection(
+    projection: sparse.csr_matrix, urlpath: str, key: str
+) -> None:
+    """Save the gamma projection matrix with its key in the ``scipy.sparse.save_npz`` format.
+
+    As for the geometry cache the file is written next to ``urlpath`` and renamed into place.
+    """
+    logger.info(f"save gamma projection {urlpath!r}")
+    projection = projection.tocsr()
+    tmp_urlpath = f"{urlpath}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_urlpath, "wb") as file:
+            np.savez_compressed(
+                file,
+                format=np.array(b"csr"),
+                shape=np.array(projection.shape),
+                data=projection.data,
+                indices=projection.indices,
+                indptr=projection.indptr,
+                key=np.array(key),
+            )
+        os.replace(tmp_urlpath, urlpath)
+    finally:
+        if os.path.exists(tmp_urlpath):
+            os.remove(tmp_urlpath)
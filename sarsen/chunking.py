@@ -1,9 +1,14 @@
 import itertools
 import math
+import os
+from concurrent import futures
 from typing import Any, Callable
 
 import dask
+import dask.array
+import numpy as np
 import xarray as xr
+from dask.delayed import delayed
 
 
 def compute_chunks_1d(
@@ -82,7 +87,14 @@ def sync_map_overlap(
     bound: int = 128,
     kwargs: dict[Any, Any] = {},
     template: xr.DataArray | None = None,
+    max_workers: int | None = None,
 ) -> xr.DataArray:
+    """Apply ``function`` to the overlapping chunks of ``obj`` with a pool of threads.
+
+    At most ``2 * max_workers`` chunks are in flight and the inner part of every result is
+    written into the shared output buffer as soon as it is ready. The NumPy kernels release
+    the GIL so the chunks are processed in parallel without dask.
+    """
     dims = {}
     for d in obj.dims:
         dims[str(d)] = len(obj[d])
@@ -100,18 +112,34 @@ def sync_map_overlap(
         dims, chunks, bound
     )  # type ignore
 
-    try:
-        from dask.array import empty_like
-    except ModuleNotFoundError:
-        from numpy import empty_like  # type: ignore
-
-    out = xr.DataArray(empty_like(template.data), dims=template.dims)  # type: ignore
+    out = xr.DataArray(
+        np.empty(template.shape, dtype=template.dtype), dims=template.dims
+    )
     out.coords.update(obj.coords)
-    for ext_chunk, ext_chunk_bounds, int_chunk in zip(
-        ext_chunks, ext_chunks_bounds, int_chunks
-    ):
+
+    def process_chunk(
+        ext_chunk: dict[str, slice],
+        ext_chunk_bounds: dict[str, slice],
+        int_chunk: dict[str, slice],
+    ) -> None:
         out_chunk = function(obj.isel(ext_chunk), **kwargs)
-        out[int_chunk] = out_chunk.isel(ext_chunk_bounds)
+        out_chunk = out_chunk.isel(ext_chunk_bounds).transpose(*out.dims)
+        out.data[tuple(int_chunk[str(d)] for d in out.dims)] = out_chunk.values
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight: set[futures.Future[None]] = set()
+        for chunk_slices in zip(ext_chunks, ext_chunks_bounds, int_chunks):
+            if len(in_flight) >= 2 * max_workers:
+                done, in_flight = futures.wait(
+                    in_flight, return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    future.result()
+            in_flight.add(executor.submit(process_chunk, *chunk_slices))
+        for future in futures.as_completed(in_flight):
+            future.result()
     return out
 
 
@@ -160,4 +188,109 @@ def simple_dask_map_overlap(
     return mapped.data_vars[result_overlap.name]
 
 
+def dataset_block(
+    coords: xr.Dataset, dims: tuple[str, ...], data: dict[Any, Any]
+) -> xr.Dataset:
+    return coords.assign({name: (dims, values) for name, values in data.items()})
+
+
+def gather_block(
+    gather: Callable[..., xr.DataArray],
+    block: xr.Dataset,
+    accumulator: Any,
+    dims: tuple[str, ...],
+    kwargs: dict[Any, Any],
+) -> Any:
+    return gather(block, accumulator, **kwargs).transpose(*dims).values
+
+
+def map_scatter_gather(
+    scatter: Callable[..., Any],
+    merge: Callable[..., Any],
+    gather: Callable[..., xr.DataArray],
+    obj: xr.Dataset,
+    template: xr.DataArray,
+    kwargs: dict[Any, Any] = {},
+    split_every: int = 8,
+) -> xr.DataArray:
+    """Apply a global scatter-gather computation to the chunks of ``obj`` without overlap.
+
+    ``scatter(block, **kwargs)`` computes the partial accumulator of every chunk, the partial
+    accumulators are tree-reduced with ``merge(*partials)``, ``split_every`` at a time, and
+    ``gather(block, accumulator, **kwargs)`` computes every chunk of the output from the
+    global accumulator. The output has the chunks of ``obj``.
+    """
+    if not obj.chunks:
+        return gather(obj, scatter(obj, **kwargs), **kwargs)
+
+    dims = tuple(str(d) for d in template.dims)
+    chunks = [obj.chunksizes[d] for d in dims]
+    # the blocks are built from the unoptimised keys of the data variables so that both
+    # phases, and any other computation of obj, share the same tasks
+    data_blocks = {
+        name: var.transpose(*dims).data.to_delayed(optimize_graph=False)
+        for name, var in obj.data_vars.items()
+    }
+    blocks = {}
+    for index in itertools.product(*(range(len(c)) for c in chunks)):
+        starts = [sum(c[:i]) for c, i in zip(chunks, index)]
+        block_slices = {
+            d: slice(start, start + c[i])
+            for d, start, c, i in zip(dims, starts, chunks, index)
+        }
+        blocks[index] = delayed(dataset_block)(
+            obj[[]].isel(block_slices, missing_dims="ignore"),
+            dims,
+            {name: data[index] for name, data in data_blocks.items()},
+        )
+
+    partials = [delayed(scatter)(block, **kwargs) for block in blocks.values()]
+    while len(partials) > 1:
+        partials = [
+            delayed(merge)(*partials[i : i + split_every])
+            for i in range(0, len(partials), split_every)
+        ]
+    accumulator = partials[0]
+
+    out_blocks = np.empty(tuple(len(c) for c in chunks), dtype=object)
+    for index, block in blocks.items():
+        gathered = delayed(gather_block)(gather, block, accumulator, dims, kwargs)
+        shape = tuple(c[i] for c, i in zip(chunks, index))
+        out_blocks[index] = dask.array.from_delayed(  # type: ignore
+            gathered, shape=shape, dtype=template.dtype
+        )
+    data = dask.array.block(out_blocks.tolist())  # type: ignore
+    return template.copy(data=data)
+
+
+def memory_limit_chunks(
+    memory_limit: int,
+    shape: tuple[int, ...],
+    bytes_per_pixel: float,
+    bound: int = 0,
+    global_bytes_per_pixel: float = 0.0,
+    workers: int | None = None,
+    multiple: int = 16,
+) -> int:
+    """Return the largest square chunk size that fits ``workers`` chunks in ``memory_limit``.
+
+    Every in-flight chunk, extended by ``bound`` pixels of overlap on each side, needs
+    ``bytes_per_pixel`` and the whole array needs ``global_bytes_per_pixel`` for the data
+    held across chunks. The chunk size is a multiple of ``multiple`` and small enough that
+    every worker gets at least one chunk.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    size = math.prod(shape)
+    chunk_budget = (memory_limit - global_bytes_per_pixel * size) / workers
+    side = math.isqrt(max(int(chunk_budget / bytes_per_pixel), 0)) - 2 * bound
+    side = min(side, math.ceil(math.sqrt(size / workers)))
+    side = side // multiple * multiple
+    if side < multiple:
+        raise ValueError(
+            f"{memory_limit=} is too small to process {shape=} with {workers} workers"
+        )
+    return side
+
+
 map_overlap = simple_dask_map_overlap
@@ -4,6 +4,8 @@ from typing import Any
 import numpy as np
 import xarray as xr
 
+from . import resampling
+
 
 class OrbitInterpolator(abc.ABC):
     """Orbit as a function of calendar time or orbit time, defined as seconds from an epoch."""
@@ -29,6 +31,19 @@ class OrbitInterpolator(abc.ABC):
         self, orbit_time: xr.DataArray
     ) -> xr.DataArray: ...
 
+    def state_from_orbit_time(
+        self, orbit_time: xr.DataArray, derivatives: int = 2
+    ) -> tuple[xr.DataArray, ...]:
+        """Return the position and its first ``derivatives`` time derivatives."""
+        if not 0 <= derivatives <= 2:
+            raise ValueError(f"{derivatives=}. Must be one of: 0, 1, 2")
+        from_orbit_time = [
+            self.position_from_orbit_time,
+            self.velocity_from_orbit_time,
+            self.acceleration_from_orbit_time,
+        ]
+        return tuple(f(orbit_time) for f in from_orbit_time[: derivatives + 1])
+
     @abc.abstractmethod
     def position(self, calendar_time: xr.DataArray) -> xr.DataArray: ...
 
@@ -50,11 +65,38 @@ class SarProduct(abc.ABC):
     @abc.abstractmethod
     def beta_nought(self) -> xr.DataArray: ...
 
+    def image_coords(self) -> dict[str, Any]:
+        """Return the coordinates of the dimensions of the SAR image."""
+        beta_nought = self.beta_nought()
+        return {str(dim): beta_nought.coords[dim].values for dim in beta_nought.dims}
+
+    def beta_nought_window(self, window: dict[str, slice]) -> xr.DataArray:
+        """Return the beta nought of a window of the SAR image in memory."""
+        return self.beta_nought().isel(window).compute()
+
+    def bursts(self) -> list[tuple["SarProduct", tuple[np.datetime64, np.datetime64]]]:
+        """Return the bursts to geocode one by one, with the azimuth time interval each owns.
+
+        The ``[start, stop)`` intervals don't overlap, an empty list means that the SAR image
+        is geocoded as a whole.
+        """
+        return []
+
     @abc.abstractmethod
     def geospatial_bounds(self) -> str:
         """Describe the geospatial extent of the product in OGC's Well-Known Text (WKT)."""
         ...
 
+    @abc.abstractmethod
+    def geometry_key(self) -> dict[str, Any]:
+        """Identify the acquisition geometry shared by repeat-pass products, e.g. the relative orbit."""
+        ...
+
+    @abc.abstractmethod
+    def with_polarisation(self, polarisation: str) -> "SarProduct":
+        """Return the product of another polarisation with the same acquisition geometry."""
+        ...
+
     @abc.abstractmethod
     def orbit_interpolator(self, **kwargs: Any) -> OrbitInterpolator:
         """Create the best OrbitInterpolator for the product."""
@@ -84,6 +126,12 @@ class GroundRangeSarProduct(SarProduct):
         self, azimuth_time: xr.DataArray, slant_range_time: xr.DataArray
     ) -> xr.DataArray: ...
 
+    def ground_range_lookup(
+        self, azimuth_time: xr.DataArray, slant_range_time: xr.DataArray
+    ) -> xr.DataArray:
+        """Convert slant range time to ground range with a precomputed table, if any."""
+        return self.slant_range_time_to_ground_range(azimuth_time, slant_range_time)
+
     def interp_sar(
         self,
         data: xr.DataArray,
@@ -97,10 +145,9 @@ class GroundRangeSarProduct(SarProduct):
             ground_range = self.slant_range_time_to_ground_range(
                 azimuth_time, slant_range_time
             )
-        interpolated = data.interp(
-            azimuth_time=azimuth_time, ground_range=ground_range, method=method
+        return resampling.interp_sar_index(
+            data, {"azimuth_time": azimuth_time, "ground_range": ground_range}, method
         )
-        return interpolated.assign_attrs(data.attrs)
 
 
 class SlantRangeSarProduct(SarProduct):
@@ -121,8 +168,9 @@ class SlantRangeSarProduct(SarProduct):
         method: xr.core.types.InterpOptions = "nearest",
         ground_range: xr.DataArray | None = None,
     ) -> xr.DataArray:
-        assert ground_range is None
-        interpolated = data.interp(
-            azimuth_time=azimuth_time, slant_range_time=slant_range_time, method=method
+        assert ground_range is None and slant_range_time is not None
+        return resampling.interp_sar_index(
+            data,
+            {"azimuth_time": azimuth_time, "slant_range_time": slant_range_time},
+            method,
         )
-        return interpolated.assign_attrs(data.attrs)
@@ -0,0 +1,199 @@
+import logging
+import re
+from typing import Any
+
+import dask.array
+import numpy as np
+import numpy.typing as npt
+import xarray as xr
+from rasterio import warp
+
+from . import datamodel, geocoding, scene
+
+logger = logging.getLogger(__name__)
+
+SPEED_OF_LIGHT = 299_792_458.0  # m / s
+ONE_SECOND = np.timedelta64(10**9, "ns")
+
+# classes of the DEM chunks with respect to the footprint of the SAR image
+OUTSIDE = 0
+PARTIAL = 1
+INSIDE = 2
+
+
+def wkt_bbox(wkt: str) -> tuple[float, float, float, float]:
+    """Return the ``(xmin, ymin, xmax, ymax)`` bounding box of a WKT (multi)polygon.
+
+    Longitudes spanning more than 180 degrees are taken as crossing the antimeridian and
+    the negative ones are shifted by 360 degrees, so that ``xmax`` may be larger than 180.
+    """
+    match = re.fullmatch(
+        r"\s*(MULTI)?POLYGON\s*(Z\s*)?\((.*)\)\s*", wkt, flags=re.IGNORECASE | re.DOTALL
+    )
+    if match is None:
+        raise ValueError(f"{wkt=}. Must be a WKT POLYGON or MULTIPOLYGON")
+    points = [p.split() for p in re.split(r"[(),]", match.group(3)) if p.strip()]
+    coordinates = np.array([p[:2] for p in points], dtype=float)
+    if np.ptp(coordinates[:, 0]) > 180:
+        coordinates[:, 0] = np.where(
+            coordinates[:, 0] < 0, coordinates[:, 0] + 360, coordinates[:, 0]
+        )
+    xmin, ymin = coordinates.min(axis=0)
+    xmax, ymax = coordinates.max(axis=0)
+    return float(xmin), float(ymin), float(xmax), float(ymax)
+
+
+def wrap_longitude(
+    lon: npt.NDArray[np.float64], center: float
+) -> npt.NDArray[np.float64]:
+    """Return ``lon`` wrapped in the 360 degrees interval centred on ``center``."""
+    return (lon - center + 180) % 360 - 180 + center
+
+
+def chunk_corners_index(chunks: tuple[int, ...]) -> npt.NDArray[np.int_]:
+    """Return the index of the first and the last pixel of every chunk, shape ``(n, 2)``."""
+    stops = np.cumsum(chunks)
+    return np.stack([stops - np.array(chunks), stops - 1], axis=-1)
+
+
+def sar_image_extent(
+    product: datamodel.SarProduct,
+) -> tuple[npt.NDArray[np.datetime64], npt.NDArray[np.float64]]:
+    coords = product.image_coords()
+    range_dim = "ground_range" if product.product_type == "GRD" else "slant_range_time"
+    azimuth_time = coords["azimuth_time"]
+    range_ = coords[range_dim]
+    return azimuth_time[[0, -1]], range_[[0, -1]]
+
+
+def classify_chunks(
+    dem_raster: xr.DataArray,
+    product: datamodel.SarProduct,
+    orbit_interpolator: datamodel.OrbitInterpolator | None = None,
+    source_crs: Any = None,
+    height_range: tuple[float, float] = (-500.0, 9000.0),
+    bbox_margin: float = 0.5,
+    sar_margin: float = 0.1,
+    **kwargs: Any,
+) -> npt.NDArray[np.int8]:
+    """Classify the chunks of the DEM as OUTSIDE, PARTIAL or INSIDE the SAR image.
+
+    Chunks farther than ``bbox_margin`` degrees from the bounding box of the geospatial
+    bounds of the product are OUTSIDE. The corners of the other chunks are geocoded at the
+    heights of ``height_range`` and the chunks are classified comparing the extent of the
+    corners in image coordinates, enlarged by ``sar_margin`` times its size, with the extent
+    of the SAR image. Only the chunk corners are geocoded, the DEM is not read.
+    """
+    if source_crs is None:
+        source_crs = dem_raster.rio.crs
+    if orbit_interpolator is None:
+        orbit_interpolator = product.orbit_interpolator()
+    chunks = dem_raster.chunks or tuple((size,) for size in dem_raster.shape)
+    corners = dict(zip(dem_raster.dims, map(chunk_corners_index, chunks)))
+    # corners of all chunks, shape (y chunks, x chunks, y corners, x corners)
+    iy = corners["y"][:, None, :, None]
+    ix = corners["x"][None, :, None, :]
+    iy, ix = np.broadcast_arrays(iy, ix)
+    x = dem_raster.x.values[ix]
+    y = dem_raster.y.values[iy]
+    chunk_classes = np.full(x.shape[:2], PARTIAL, dtype=np.int8)
+
+    lon, lat = warp.transform(source_crs, "EPSG:4326", x.flat, y.flat)
+    lat = np.reshape(lat, x.shape)
+    xmin, ymin, xmax, ymax = wkt_bbox(product.geospatial_bounds())
+    # the longitudes are compared on the side of the antimeridian of the bounding box
+    lon = wrap_longitude(np.reshape(lon, x.shape), (xmin + xmax) / 2)
+    far = (
+        (lon.max(axis=(2, 3)) < xmin - bbox_margin)
+        | (lon.min(axis=(2, 3)) > xmax + bbox_margin)
+        | (lat.max(axis=(2, 3)) < ymin - bbox_margin)
+        | (lat.min(axis=(2, 3)) > ymax + bbox_margin)
+    )
+    chunk_classes[far] = OUTSIDE
+    near = ~far
+    if not np.any(near):
+        return chunk_classes
+
+    # geocode the corners of the near chunks, shape (near chunks, corners, heights)
+    x_near = np.repeat(x[near].reshape(-1, 4, 1), len(height_range), axis=-1)
+    y_near = np.repeat(y[near].reshape(-1, 4, 1), len(height_range), axis=-1)
+    h_near = np.broadcast_to(np.array(height_range), x_near.shape)
+    dims = ("chunk", "corner", "height")
+    dem_3d = scene.make_nd_dataarray(
+        [xr.DataArray(a, dims=dims) for a in (x_near, y_near, h_near)]
+    )
+    dem_ecef = scene.transform_dem_3d(dem_3d, source_crs=source_crs)
+    acquisition = geocoding.backward_geocode(dem_ecef, orbit_interpolator, **kwargs)
+    if "slant_range" in acquisition.data_vars:
+        slant_range = acquisition.data_vars["slant_range"]
+    else:
+        slant_range = (acquisition.dem_distance**2).sum(dim="axis") ** 0.5
+    slant_range_time = 2.0 / SPEED_OF_LIGHT * slant_range
+    azimuth_time = acquisition.azimuth_time
+
+    image_azimuth_time, image_range = sar_image_extent(product)
+    if product.product_type == "GRD":
+        assert isinstance(product, datamodel.GroundRangeSarProduct)
+        range_ = product.slant_range_time_to_ground_range(
+            azimuth_time.clip(*image_azimuth_time), slant_range_time
+        )
+    else:
+        range_ = slant_range_time
+
+    azimuth = ((azimuth_time - image_azimuth_time[0]) / ONE_SECOND).transpose(*dims)
+    azimuth_extent = (image_azimuth_time - image_azimuth_time[0]) / ONE_SECOND
+    outside = np.zeros(azimuth.shape[0], dtype=bool)
+    inside = np.ones(azimuth.shape[0], dtype=bool)
+    for values, (start, stop) in [
+        (azimuth.values, azimuth_extent),
+        (range_.transpose(*dims).values, image_range),
+    ]:
+        low = values.min(axis=(1, 2))
+        high = values.max(axis=(1, 2))
+        margin = sar_margin * (high - low)
+        outside |= (high + margin < start) | (low - margin > stop)
+        inside &= (low - margin >= start) & (high + margin <= stop)
+    # NaN corners, e.g. failed geocoding, are conservatively left PARTIAL
+    classes_near = np.where(outside, OUTSIDE, np.where(inside, INSIDE, PARTIAL))
+    chunk_classes[near] = classes_near
+    return chunk_classes
+
+
+def cull_chunks(
+    obj: xr.DataArray | xr.Dataset, chunk_classes: npt.NDArray[np.int8] | None
+) -> Any:
+    """Replace the OUTSIDE chunks of ``obj`` with constant blocks of missing values.
+
+    The replaced chunks are not part of the dask graph of the result so they are never
+    computed. Arrays that are not dask arrays with ``("y", "x")`` trailing dimensions and
+    the chunks of ``chunk_classes`` are returned unchanged.
+    """
+    if chunk_classes is None:
+        return obj
+    if isinstance(obj, xr.Dataset):
+        return obj.map(cull_chunks, chunk_classes=chunk_classes, keep_attrs=True)
+    data = obj.data
+    if (
+        not isinstance(data, dask.array.Array)
+        or obj.dims[-2:] != ("y", "x")
+        or data.numblocks[-2:] != chunk_classes.shape
+    ):
+        return obj
+    fill_value = np.datetime64("NaT", "ns") if obj.dtype.kind == "M" else np.nan
+    leading = (slice(None),) * (obj.ndim - 2)
+    blocks = [
+        [
+            data.blocks[leading + (i, j)]
+            if chunk_classes[i, j] != OUTSIDE
+            else dask.array.full(  # type: ignore
+                data.shape[:-2] + (data.chunks[-2][i], data.chunks[-1][j]),
+                fill_value,
+                dtype=obj.dtype,
+                chunks=data.chunks[:-2]
+                + ((data.chunks[-2][i],), (data.chunks[-1][j],)),
+            )
+            for j in range(chunk_classes.shape[1])
+        ]
+        for i in range(chunk_classes.shape[0])
+    ]
+    return obj.copy(data=dask.array.block(blocks))  # type: ignore
@@ -10,11 +10,20 @@ import numpy as np
 import numpy.typing as npt
 import xarray as xr
 
-from . import datamodel
+from . import datamodel, orbit
 
 ArrayLike = TypeVar("ArrayLike", bound=npt.ArrayLike)
 FloatArrayLike = TypeVar("FloatArrayLike", bound=npt.ArrayLike)
 
+FloatArray = npt.NDArray[np.float64]
+IndexArray = npt.NDArray[np.intp]
+ActiveSetUfunc = Callable[
+    [FloatArray, IndexArray], tuple[FloatArray, tuple[FloatArray, ...]]
+]
+ActiveSetUfuncPrime = Callable[
+    [FloatArray, IndexArray, tuple[FloatArray, ...]], FloatArray
+]
+
 
 def secant_method(
     ufunc: Callable[[ArrayLike], tuple[FloatArrayLike, Any]],
@@ -86,33 +95,230 @@ def newton_raphson_method(
     return t_curr, f_curr, k, payload_curr
 
 
+def update_active_set_payload(
+    payload: tuple[FloatArray, ...] | None,
+    payload_active: tuple[FloatArray, ...],
+    active: IndexArray,
+) -> tuple[FloatArray, ...]:
+    # the first evaluation is always on all the points
+    if payload is None:
+        return tuple(np.array(p, dtype="float64") for p in payload_active)
+    for p, p_active in zip(payload, payload_active):
+        p[..., active] = p_active
+    return payload
+
+
+def secant_method_active_set(
+    ufunc: ActiveSetUfunc,
+    t_prev: FloatArray,
+    t_curr: FloatArray,
+    diff_ufunc: float = 1.0,
+    diff_t: float = 1e-6,
+    maxiter: int = 10,
+) -> tuple[
+    FloatArray, FloatArray, FloatArray, npt.NDArray[np.int_], tuple[FloatArray, ...]
+]:
+    """Return the root of ufunc calculated using the secant method on the active points only.
+
+    Points that reach one of the two thresholds are removed from the active set and are not
+    evaluated again. ``ufunc`` is called with the times of the active points and with their
+    flat indices and returns the function values and a payload whose last axis runs over
+    the active points. The number of iterations is returned per point.
+    """
+    if maxiter < 1:
+        raise TypeError("maxiter must be greater than 1")
+
+    t_prev = np.array(t_prev, dtype="float64").ravel()
+    t_curr = np.array(t_curr, dtype="float64").ravel()
+    active = np.arange(t_curr.size)
+    iterations = np.zeros(t_curr.size, dtype=int)
+
+    f_prev, _ = ufunc(t_prev, active)
+    f_curr = np.full_like(t_curr, np.nan)
+    payload = None
+
+    for _ in range(maxiter):
+        f_active, payload_active = ufunc(t_curr[active], active)
+        f_curr[active] = f_active
+        payload = update_active_set_payload(payload, payload_active, active)
+
+        # as in `secant_method` `np.nan` values are accepted as good values, but
+        # the points are dropped from the active set so their times are set to `np.nan` here
+        t_curr[active[~np.isfinite(f_active)]] = np.nan
+        keep = np.abs(f_active) > diff_ufunc
+        active, f_active = active[keep], f_active[keep]
+        if active.size == 0:
+            break
+
+        t_diff = t_curr[active] - t_prev[active]
+        keep = np.abs(t_diff) > diff_t
+        active, f_active, t_diff = active[keep], f_active[keep], t_diff[keep]
+        if active.size == 0:
+            break
+
+        q = f_active - f_prev[active]
+        t_prev[active] = t_curr[active]
+        t_curr[active] -= np.where(q != 0, f_active / q, 0) * t_diff
+        f_prev[active] = f_active
+        iterations[active] += 1
+    else:
+        # as in `secant_method` not converging in `maxiter` iterations is an error
+        raise TypeError(
+            f"{active.size} points did not converge: maxiter must be greater than {maxiter}"
+        )
+
+    assert payload is not None
+    return t_curr, t_prev, f_curr, iterations, payload
+
+
+def newton_raphson_method_active_set(
+    ufunc: ActiveSetUfunc,
+    ufunc_prime: ActiveSetUfuncPrime,
+    t_curr: FloatArray,
+    diff_ufunc: float = 1.0,
+    diff_t: float = 1e-6,
+    maxiter: int = 10,
+) -> tuple[FloatArray, FloatArray, npt.NDArray[np.int_], tuple[FloatArray, ...]]:
+    """Return the root of ufunc calculated using the Newton method on the active points only.
+
+    See `secant_method_active_set` for the signature of ``ufunc``, ``ufunc_prime`` is called
+    with the times, the flat indices and the payload of the active points.
+    """
+    if maxiter < 1:
+        raise TypeError("maxiter must be greater than 1")
+
+    t_curr = np.array(t_curr, dtype="float64").ravel()
+    active = np.arange(t_curr.size)
+    iterations = np.zeros(t_curr.size, dtype=int)
+
+    f_curr = np.full_like(t_curr, np.nan)
+    payload = None
+
+    for _ in range(maxiter):
+        f_active, payload_active = ufunc(t_curr[active], active)
+        f_curr[active] = f_active
+        payload = update_active_set_payload(payload, payload_active, active)
+
+        # as in `newton_raphson_method` `np.nan` values are accepted as good values, but
+        # the points are dropped from the active set so their times are set to `np.nan` here
+        t_curr[active[~np.isfinite(f_active)]] = np.nan
+        keep = np.abs(f_active) > diff_ufunc
+        active, f_active = active[keep], f_active[keep]
+        payload_active = tuple(p[..., keep] for p in payload_active)
+        if active.size == 0:
+            break
+
+        fp_active = ufunc_prime(t_curr[active], active, payload_active)
+        t_diff = f_active / fp_active
+
+        keep = np.abs(t_diff) > diff_t
+        active, t_diff = active[keep], t_diff[keep]
+        if active.size == 0:
+            break
+
+        t_curr[active] -= t_diff
+        iterations[active] += 1
+    else:
+        # as in `newton_raphson_method` not converging in `maxiter` iterations is an error
+        raise TypeError(
+            f"{active.size} points did not converge: maxiter must be greater than {maxiter}"
+        )
+
+    assert payload is not None
+    return t_curr, f_curr, iterations, payload
+
+
 def zero_doppler_plane_distance_velocity(
     dem_ecef: xr.DataArray,
     orbit_interpolator: datamodel.OrbitInterpolator,
     orbit_time: xr.DataArray,
     dim: str = "axis",
-) -> tuple[xr.DataArray, tuple[xr.DataArray, xr.DataArray]]:
-    dem_distance = dem_ecef - orbit_interpolator.position_from_orbit_time(orbit_time)
-    satellite_velocity = orbit_interpolator.velocity_from_orbit_time(orbit_time)
+    derivatives: int = 1,
+) -> tuple[xr.DataArray, tuple[xr.DataArray, ...]]:
+    position, satellite_velocity, *satellite_acceleration = (
+        orbit_interpolator.state_from_orbit_time(orbit_time, derivatives)
+    )
+    dem_distance = dem_ecef - position
     plane_distance_velocity = (dem_distance * satellite_velocity).sum(dim, skipna=False)
-    return plane_distance_velocity, (dem_distance, satellite_velocity)
+    return plane_distance_velocity, (
+        dem_distance,
+        satellite_velocity,
+        *satellite_acceleration,
+    )
 
 
 def zero_doppler_plane_distance_velocity_prime(
     orbit_interpolator: datamodel.OrbitInterpolator,
     orbit_time: xr.DataArray,
-    payload: tuple[xr.DataArray, xr.DataArray],
+    payload: tuple[xr.DataArray, ...],
     dim: str = "axis",
 ) -> xr.DataArray:
-    dem_distance, satellite_velocity = payload
+    # the acceleration is in the payload when computed with `derivatives=2`
+    if len(payload) == 3:
+        dem_distance, satellite_velocity, satellite_acceleration = payload
+    else:
+        dem_distance, satellite_velocity = payload
+        satellite_acceleration = orbit_interpolator.state_from_orbit_time(orbit_time)[2]
 
     plane_distance_velocity_prime = (
-        dem_distance * orbit_interpolator.acceleration_from_orbit_time(orbit_time)
-        - satellite_velocity**2
+        dem_distance * satellite_acceleration - satellite_velocity**2
     ).sum(dim)
     return plane_distance_velocity_prime
 
 
+def orbit_state_from_orbit_time(
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    orbit_time: FloatArray,
+    derivatives: int = 2,
+    dim: str = "axis",
+) -> tuple[FloatArray, ...]:
+    state = orbit_interpolator.state_from_orbit_time(
+        xr.DataArray(orbit_time, dims="point"), derivatives
+    )
+    return tuple(s.transpose(dim, "point").values for s in state)
+
+
+def zero_doppler_plane_distance_velocity_active_set(
+    dem_ecef: FloatArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    orbit_time: FloatArray,
+    index: IndexArray,
+    dim: str = "axis",
+    derivatives: int = 1,
+) -> tuple[FloatArray, tuple[FloatArray, ...]]:
+    position, satellite_velocity, *satellite_acceleration = orbit_state_from_orbit_time(
+        orbit_interpolator, orbit_time, derivatives, dim
+    )
+    dem_distance = dem_ecef[:, index] - position
+    plane_distance_velocity = (dem_distance * satellite_velocity).sum(axis=0)
+    return plane_distance_velocity, (
+        dem_distance,
+        satellite_velocity,
+        *satellite_acceleration,
+    )
+
+
+def zero_doppler_plane_distance_velocity_prime_active_set(
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    orbit_time: FloatArray,
+    index: IndexArray,
+    payload: tuple[FloatArray, ...],
+    dim: str = "axis",
+) -> FloatArray:
+    # the acceleration is in the payload when computed with `derivatives=2`
+    if len(payload) == 3:
+        dem_distance, satellite_velocity, satellite_acceleration = payload
+    else:
+        dem_distance, satellite_velocity = payload
+        satellite_acceleration = orbit_state_from_orbit_time(
+            orbit_interpolator, orbit_time, 2, dim
+        )[2]
+    plane_distance_velocity_prime = (
+        dem_distance * satellite_acceleration - satellite_velocity**2
+    ).sum(axis=0)
+    return plane_distance_velocity_prime
+
+
 def backward_geocode_simple(
     dem_ecef: xr.DataArray,
     orbit_interpolator: datamodel.OrbitInterpolator,
@@ -153,8 +359,8 @@ def backward_geocode_simple(
         zero_doppler_prime = functools.partial(
             zero_doppler_plane_distance_velocity_prime, orbit_interpolator
         )
-        orbit_time, _, k, (dem_distance, satellite_velocity) = newton_raphson_method(
-            zero_doppler,
+        orbit_time, _, k, (dem_distance, satellite_velocity, _) = newton_raphson_method(
+            functools.partial(zero_doppler, derivatives=2),
             zero_doppler_prime,
             orbit_time_guess,
             diff_ufunc,
@@ -166,6 +372,278 @@ def backward_geocode_simple(
     return orbit_time, dem_distance, satellite_velocity
 
 
+def backward_geocode_simple_active_set(
+    dem_ecef: xr.DataArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    orbit_time_guess: xr.DataArray | float = 0.0,
+    dim: str = "axis",
+    zero_doppler_distance: float = 1.0,
+    satellite_speed: float = 7_500.0,
+    method: str = "secant",
+    orbit_time_prev_shift: float = -0.1,
+    maxiter: int = 10,
+) -> tuple[xr.DataArray, xr.DataArray, xr.DataArray, xr.DataArray]:
+    """Geocode like `backward_geocode_simple` iterating only the non-converged pixels.
+
+    Also return the number of iterations per pixel.
+    """
+    diff_ufunc = zero_doppler_distance * satellite_speed
+
+    dem_ecef = dem_ecef.transpose(dim, ...)
+    dem_ecef_flat = dem_ecef.values.reshape(dem_ecef.sizes[dim], -1)
+
+    t_template = dem_ecef.isel({dim: 0}).drop_vars(dim).rename("azimuth_time")
+    if isinstance(orbit_time_guess, xr.DataArray):
+        orbit_time_guess_flat = orbit_time_guess.broadcast_like(t_template)
+        orbit_time_guess_flat = orbit_time_guess_flat.transpose(*t_template.dims)
+        orbit_time_guess_values = orbit_time_guess_flat.values.ravel()
+    else:
+        orbit_time_guess_values = np.full(t_template.size, orbit_time_guess)
+
+    zero_doppler = functools.partial(
+        zero_doppler_plane_distance_velocity_active_set,
+        dem_ecef_flat,
+        orbit_interpolator,
+        dim=dim,
+    )
+
+    if method == "secant":
+        orbit_time_guess_prev = orbit_time_guess_values + orbit_time_prev_shift
+        orbit_time, _, _, iterations, payload = secant_method_active_set(
+            zero_doppler,
+            orbit_time_guess_prev,
+            orbit_time_guess_values,
+            diff_ufunc,
+            maxiter=maxiter,
+        )
+    elif method in {"newton", "newton_raphson"}:
+        zero_doppler_prime = functools.partial(
+            zero_doppler_plane_distance_velocity_prime_active_set,
+            orbit_interpolator,
+            dim=dim,
+        )
+        orbit_time, _, iterations, payload = newton_raphson_method_active_set(
+            functools.partial(zero_doppler, derivatives=2),
+            zero_doppler_prime,
+            orbit_time_guess_values,
+            diff_ufunc,
+            maxiter=maxiter,
+        )
+    else:
+        raise TypeError("method must be one of: 'secant', 'newton', 'newton_raphson'")
+
+    dem_distance, satellite_velocity, *_ = payload
+    return (
+        t_template.copy(data=orbit_time.reshape(t_template.shape)),
+        dem_ecef.copy(data=dem_distance.reshape(dem_ecef.shape)),
+        dem_ecef.copy(data=satellite_velocity.reshape(dem_ecef.shape)),
+        t_template.copy(data=iterations.reshape(t_template.shape)).rename("iterations"),
+    )
+
+
+def polyval_kernel(
+    orbit_time: FloatArray, coefficients: FloatArray, out: FloatArray
+) -> FloatArray:
+    """Evaluate a vector polynomial in place using the Horner method.
+
+    ``coefficients`` has the degree, in decreasing order, on the first axis and the vector
+    components on the second axis, ``out`` has the vector components on the first axis.
+    """
+    shape = (-1,) + (1,) * orbit_time.ndim
+    out[...] = coefficients[0].reshape(shape)
+    for coefficient in coefficients[1:]:
+        out *= orbit_time
+        out += coefficient.reshape(shape)
+    return out
+
+
+def backward_geocode_kernel(
+    dem_ecef: FloatArray,
+    position_coefficients: FloatArray,
+    velocity_coefficients: FloatArray,
+    acceleration_coefficients: FloatArray,
+    orbit_time_guess: FloatArray | float = 0.0,
+    diff_ufunc: float = 7_500.0,
+    diff_t: float = 1e-6,
+    method: str = "newton",
+    orbit_time_prev_shift: float = -0.1,
+    maxiter: int = 10,
+) -> tuple[FloatArray, FloatArray, FloatArray, FloatArray]:
+    """Solve the zero-Doppler equation on plain arrays in preallocated buffers.
+
+    ``dem_ecef`` has the cartesian axis first, the coefficients are formatted as in
+    `polyval_kernel`. Return orbit time, DEM distance, satellite velocity and slant range.
+    """
+    shape = dem_ecef.shape[1:]
+    orbit_time = np.empty(shape)
+    orbit_time[...] = orbit_time_guess
+    dem_distance = np.empty_like(dem_ecef)
+    satellite_velocity = np.empty_like(dem_ecef)
+    f_curr = np.empty(shape)
+    t_diff = np.empty(shape)
+    work = np.empty(shape)
+    mask = np.empty(shape, dtype=bool)
+
+    def zero_doppler(t: FloatArray, f: FloatArray) -> None:
+        polyval_kernel(t, position_coefficients, dem_distance)
+        np.subtract(dem_ecef, dem_distance, out=dem_distance)
+        polyval_kernel(t, velocity_coefficients, satellite_velocity)
+        np.einsum("i...,i...->...", dem_distance, satellite_velocity, out=f)
+
+    # the `> threshold` construct let us accept `np.nan` as good values
+    def any_above(values: FloatArray, threshold: float) -> bool:
+        np.abs(values, out=work)
+        np.greater(work, threshold, out=mask)
+        return bool(mask.any())
+
+    if method == "secant":
+        orbit_time_prev = orbit_time + orbit_time_prev_shift
+        f_prev = np.empty(shape)
+        zero_doppler(orbit_time_prev, f_prev)
+        for _ in range(maxiter):
+            zero_doppler(orbit_time, f_curr)
+            if not any_above(f_curr, diff_ufunc):
+                break
+
+            np.subtract(orbit_time, orbit_time_prev, out=t_diff)
+            if not any_above(t_diff, diff_t):
+                break
+
+            # the step is `np.where(q != 0, f_curr / q, 0) * t_diff`, q is kept in f_prev
+            np.subtract(f_curr, f_prev, out=f_prev)
+            np.not_equal(f_prev, 0, out=mask)
+            work.fill(0)
+            np.divide(f_curr, f_prev, out=work, where=mask)
+            work *= t_diff
+            orbit_time_prev[...] = orbit_time
+            orbit_time -= work
+            f_prev, f_curr = f_curr, f_prev
+        else:
+            raise TypeError("maxiter must be greater than 1")
+    elif method in {"newton", "newton_raphson"}:
+        satellite_acceleration = np.empty_like(dem_ecef)
+        for _ in range(maxiter):
+            zero_doppler(orbit_time, f_curr)
+            if not any_above(f_curr, diff_ufunc):
+                break
+
+            polyval_kernel(
+                orbit_time, acceleration_coefficients, satellite_acceleration
+            )
+            np.einsum(
+                "i...,i...->...", dem_distance, satellite_acceleration, out=t_diff
+            )
+            t_diff -= np.einsum(
+                "i...,i...->...", satellite_velocity, satellite_velocity, out=work
+            )
+            np.divide(f_curr, t_diff, out=t_diff)
+            if not any_above(t_diff, diff_t):
+                break
+
+            orbit_time -= t_diff
+        else:
+            raise TypeError("maxiter must be greater than 1")
+    else:
+        raise TypeError("method must be one of: 'secant', 'newton', 'newton_raphson'")
+
+    slant_range = np.einsum("i...,i...->...", dem_distance, dem_distance, out=work)
+    np.sqrt(slant_range, out=slant_range)
+    return orbit_time, dem_distance, satellite_velocity, slant_range
+
+
+def backward_geocode_simple_kernel(
+    dem_ecef: xr.DataArray,
+    orbit_interpolator: datamodel.OrbitInterpolator,
+    orbit_time_guess: xr.DataArray | float = 0.0,
+    dim: str = "axis",
+    zero_doppler_distance: float = 1.0,
+    satellite_speed: float = 7_500.0,
+    method: str = "secant",
+    orbit_time_prev_shift: float = -0.1,
+    maxiter: int = 10,
+) -> tuple[xr.DataArray, xr.DataArray, xr.DataArray, xr.DataArray]:
+    """Geocode like `backward_geocode_simple` using `backward_geocode_kernel`.
+
+    Also return the slant range.
+    """
+    if not isinstance(orbit_interpolator, orbit.OrbitPolyfitInterpolator):
+        raise TypeError("the kernel supports only OrbitPolyfitInterpolator orbits")
+
+    dem_ecef = dem_ecef.transpose(dim, ...)
+    t_template = dem_ecef.isel({dim: 0}).drop_vars(dim).rename("azimuth_time")
+    orbit_time_guess_values: FloatArray | float
+    if isinstance(orbit_time_guess, xr.DataArray):
+        orbit_time_guess = orbit_time_guess.broadcast_like(t_template)
+        orbit_time_guess_values = orbit_time_guess.transpose(*t_template.dims).values
+    else:
+        orbit_time_guess_values = orbit_time_guess
+
+    position_coefficients, velocity_coefficients, acceleration_coefficients = (
+        c.transpose("degree", dim).values
+        for c in (
+            orbit_interpolator.position_coefficients,
+            orbit_interpolator.velocity_coefficients,
+            orbit_interpolator.acceleration_coefficients,
+        )
+    )
+    orbit_time, dem_distance, satellite_velocity, slant_range = backward_geocode_kernel(
+        np.asarray(dem_ecef.values, dtype="float64"),
+        position_coefficients,
+        velocity_coefficients,
+        acceleration_coefficients,
+        orbit_time_guess_values,
+        diff_ufunc=zero_doppler_distance * satellite_speed,
+        method=method,
+        orbit_time_prev_shift=orbit_time_prev_shift,
+        maxiter=maxiter,
+    )
+
+    return (
+        t_template.copy(data=orbit_time),
+        dem_ecef.copy(data=dem_distance),
+        dem_ecef.copy(data=satellite_velocity),
+        t_template.copy(data=slant_range).rename("slant_range"),
+    )
+
+
+def seed_pyramid_steps(
+    dem_ecef: xr.DataArray,
+    dim: str = "axis",
+    ratio: int = 8,
+    max_step: int = 64,
+    min_seeds: int = 4,
+    max_height_error: float = 100.0,
+) -> list[int]:
+    """Return the decreasing grid steps of the seed pyramid, the last one is always 1.
+
+    The coarsest step leaves at least ``min_seeds`` seeds per side and it is halved until
+    the linear interpolation between seeds deviates from the terrain by less than
+    ``max_height_error`` metres. Each level is ``ratio`` times finer than the previous one.
+    """
+    step = max_step
+    while step > 1 and min(dem_ecef.sizes["y"], dem_ecef.sizes["x"]) < step * min_seeds:
+        step //= 2
+
+    # the distance from the Earth centre is a proxy for the elevation
+    radius = np.sqrt((dem_ecef.transpose(dim, "y", "x").values ** 2).sum(axis=0))
+    while step > 1:
+        half = radius[:: step // 2, :: step // 2]
+        deviation = np.concatenate(
+            [
+                np.ravel(half[1:-1:2] - (half[:-2:2] + half[2::2]) / 2),
+                np.ravel(half[:, 1:-1:2] - (half[:, :-2:2] + half[:, 2::2]) / 2),
+            ]
+        )
+        if not np.any(np.abs(deviation) > max_height_error):
+            break
+        step //= 2
+
+    steps = [step]
+    while steps[-1] > 1:
+        steps.append(max(steps[-1] // ratio, 1))
+    return steps
+
+
 def backward_geocode(
     dem_ecef: xr.DataArray,
     orbit_interpolator: datamodel.OrbitInterpolator,
@@ -174,17 +652,52 @@ def backward_geocode(
     zero_doppler_distance: float = 1.0,
     satellite_speed: float = 7_500.0,
     method: str = "newton",
-    seed_step: tuple[int, int] | None = None,
+    seed_step: tuple[int, int] | str | None = None,
     maxiter: int = 10,
     maxiter_after_seed: int = 1,
     orbit_time_prev_shift: float = -0.1,
+    active_set: bool = False,
+    kernel: bool = False,
 ) -> xr.Dataset:
-    if seed_step is not None:
+    """Compute the orbit time and the satellite geometry of every DEM point.
+
+    With ``active_set=True`` only the pixels that did not converge yet are iterated and the
+    number of iterations per pixel is returned in the ``iterations`` variable.
+    With ``kernel=True`` the solver runs on plain arrays via `backward_geocode_kernel` and
+    the slant range is returned in the ``slant_range`` variable.
+    With ``seed_step="auto"`` the solution is refined on the grids of `seed_pyramid_steps`,
+    each level using the solution of the coarser one as initial guess.
+    """
+    if active_set and kernel:
+        raise ValueError("active_set and kernel cannot be used together")
+
+    backward_geocode_seed: Callable[..., tuple[xr.DataArray, ...]]
+    if active_set:
+        backward_geocode_seed = backward_geocode_simple_active_set
+    elif kernel:
+        backward_geocode_seed = backward_geocode_simple_kernel
+    else:
+        backward_geocode_seed = backward_geocode_simple
+
+    seed_steps: list[tuple[int, int]] = []
+    if seed_step == "auto":
+        steps = seed_pyramid_steps(dem_ecef, dim)
+        seed_steps = [(step, step) for step in steps[:-1]]
+    elif seed_step is not None:
+        assert not isinstance(seed_step, str)
+        seed_steps = [seed_step]
+
+    orbit_time_seed = None
+    for step in seed_steps:
         dem_ecef_seed = dem_ecef.isel(
-            y=slice(seed_step[0] // 2, None, seed_step[0]),
-            x=slice(seed_step[1] // 2, None, seed_step[1]),
+            y=slice(step[0] // 2, None, step[0]),
+            x=slice(step[1] // 2, None, step[1]),
         )
-        orbit_time_seed, _, _ = backward_geocode_simple(
+        if orbit_time_seed is not None:
+            orbit_time_guess = orbit_time_seed.interp_like(
+                dem_ecef_seed.sel({dim: 0}), kwargs={"fill_value": "extrapolate"}
+            )
+        orbit_time_seed = backward_geocode_seed(
             dem_ecef_seed,
             orbit_interpolator,
             orbit_time_guess,
@@ -192,24 +705,61 @@ def backward_geocode(
             zero_doppler_distance,
             satellite_speed,
             method,
+            maxiter=maxiter,
             orbit_time_prev_shift=orbit_time_prev_shift,
-        )
+        )[0]
+
+    if orbit_time_seed is not None:
         orbit_time_guess = orbit_time_seed.interp_like(
-            dem_ecef.sel(axis=0), kwargs={"fill_value": "extrapolate"}
+            dem_ecef.sel({dim: 0}), kwargs={"fill_value": "extrapolate"}
+        )
+        # with the automatic pyramid maxiter is only an upper bound of the last level
+        if seed_step != "auto":
+            maxiter = maxiter_after_seed
+
+    data_vars = {}
+    if active_set:
+        orbit_time, dem_distance, satellite_velocity, iterations = (
+            backward_geocode_simple_active_set(
+                dem_ecef,
+                orbit_interpolator,
+                orbit_time_guess,
+                dim,
+                zero_doppler_distance,
+                satellite_speed,
+                method,
+                maxiter=maxiter,
+                orbit_time_prev_shift=orbit_time_prev_shift,
+            )
+        )
+        data_vars["iterations"] = iterations
+    elif kernel:
+        orbit_time, dem_distance, satellite_velocity, slant_range = (
+            backward_geocode_simple_kernel(
+                dem_ecef,
+                orbit_interpolator,
+                orbit_time_guess,
+                dim,
+                zero_doppler_distance,
+                satellite_speed,
+                method,
+                maxiter=maxiter,
+                orbit_time_prev_shift=orbit_time_prev_shift,
+            )
+        )
+        data_vars["slant_range"] = slant_range
+    else:
+        orbit_time, dem_distance, satellite_velocity = backward_geocode_simple(
+            dem_ecef,
+            orbit_interpolator,
+            orbit_time_guess,
+            dim,
+            zero_doppler_distance,
+            satellite_speed,
+            method,
+            maxiter=maxiter,
+            orbit_time_prev_shift=orbit_time_prev_shift,
         )
-        maxiter = maxiter_after_seed
-
-    orbit_time, dem_distance, satellite_velocity = backward_geocode_simple(
-        dem_ecef,
-        orbit_interpolator,
-        orbit_time_guess,
-        dim,
-        zero_doppler_distance,
-        satellite_speed,
-        method,
-        maxiter=maxiter,
-        orbit_time_prev_shift=orbit_time_prev_shift,
-    )
 
     acquisition = xr.Dataset(
         data_vars={
@@ -217,5 +767,6 @@ def backward_geocode(
             "dem_distance": dem_distance,
             "satellite_velocity": satellite_velocity.transpose(*dem_distance.dims),
         }
+        | data_vars
     )
     return acquisition
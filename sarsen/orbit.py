@@ -1,7 +1,10 @@
-from typing import Any
+import abc
+import math
+from typing import Any, Callable
 
 import attrs
 import numpy as np
+import numpy.typing as npt
 import xarray as xr
 
 from . import datamodel
@@ -19,6 +22,100 @@ def polyder(coefficients: xr.DataArray) -> xr.DataArray:
     return derivative_coefficients
 
 
+def polyval_derivatives(
+    x: npt.NDArray[np.float64],
+    coefficients: npt.NDArray[np.float64],
+    derivatives: int = 2,
+) -> tuple[npt.NDArray[np.float64], ...]:
+    """Evaluate a polynomial and its derivatives with a single Horner recurrence.
+
+    ``coefficients`` has the degree, in decreasing order, on the first axis, the other axes
+    are appended to the axes of ``x`` in the results.
+    """
+    x = x.reshape(x.shape + (1,) * (coefficients.ndim - 1))
+    shape = x.shape[: x.ndim - coefficients.ndim + 1] + coefficients.shape[1:]
+    values = [np.zeros(shape) for _ in range(derivatives + 1)]
+    values[0][...] = coefficients[0]
+    for coefficient in coefficients[1:]:
+        for n in range(derivatives, 0, -1):
+            values[n] *= x
+            values[n] += values[n - 1]
+        values[0] *= x
+        values[0] += coefficient
+    # values[n] holds the n-th derivative divided by n!
+    for n in range(2, derivatives + 1):
+        values[n] *= math.factorial(n)
+    return tuple(values)
+
+
+def hermite_derivatives(
+    x: npt.NDArray[np.float64],
+    coefficients: npt.NDArray[np.float64],
+    knots: npt.NDArray[np.float64],
+    step: float | None = None,
+    derivatives: int = 2,
+) -> tuple[npt.NDArray[np.float64], ...]:
+    """Evaluate piecewise cubic polynomials and their derivatives.
+
+    ``coefficients`` has the segment on the first axis and the degree, in increasing order,
+    on the second axis, the other axes are appended to the axes of ``x`` in the results.
+    ``knots`` are the start times of the segments followed by the end time of the last one.
+    If ``step`` is given the knots are evenly spaced and the segment lookup is O(1).
+    """
+    number_of_segments = coefficients.shape[0]
+    if step is not None:
+        index = np.floor((x - knots[0]) / step)
+    else:
+        index = np.searchsorted(knots, x, side="right") - 1.0
+    # points outside the knots are extrapolated with the first and last segments
+    np.clip(index, 0, number_of_segments - 1, out=index)
+    segment = np.nan_to_num(index).astype(np.intp)
+
+    s = x - knots[segment]
+    s = s.reshape(s.shape + (1,) * (coefficients.ndim - 2))
+    c0, c1, c2, c3 = (coefficients[segment, n] for n in range(4))
+
+    values = [((c3 * s + c2) * s + c1) * s + c0]
+    if derivatives >= 1:
+        values.append((3 * c3 * s + 2 * c2) * s + c1)
+    if derivatives >= 2:
+        values.append(6 * c3 * s + 2 * c2)
+    return tuple(values)
+
+
+def apply_state_ufunc(
+    func: Callable[..., tuple[npt.NDArray[np.float64], ...]],
+    orbit_time: xr.DataArray,
+    coefficients: xr.DataArray,
+    vector_dims: list[str],
+    derivatives: int = 2,
+    **kwargs: Any,
+) -> tuple[xr.DataArray, ...]:
+    if not 0 <= derivatives <= 2:
+        raise ValueError(f"{derivatives=}. Must be one of: 0, 1, 2")
+
+    def func_derivatives(
+        *args: Any,
+    ) -> npt.NDArray[np.float64] | tuple[npt.NDArray[np.float64], ...]:
+        values = func(*args, derivatives=derivatives, **kwargs)
+        # apply_ufunc expects a single array for a single output
+        return values if derivatives > 0 else values[0]
+
+    state = xr.apply_ufunc(
+        func_derivatives,
+        orbit_time,
+        coefficients,
+        input_core_dims=[[], list(coefficients.dims)],
+        output_core_dims=[vector_dims] * (derivatives + 1),
+        dask="parallelized",
+        output_dtypes=[np.float64] * (derivatives + 1),
+    )
+    if derivatives == 0:
+        state = (state,)
+    names = ["position", "velocity", "acceleration"]
+    return tuple(s.rename(name) for s, name in zip(state, names))
+
+
 def to_calendar_time(
     orbit_time: xr.DataArray, epoch: np.datetime64, name: str = "calendar_time"
 ) -> xr.DataArray:
@@ -31,8 +128,69 @@ def to_orbit_time(calendar_time: xr.DataArray, epoch: np.datetime64) -> xr.DataA
     return orbit_time.rename("orbit_time")
 
 
+class OrbitStateInterpolator(datamodel.OrbitInterpolator):
+    """Base of the OrbitInterpolators evaluating the state with a ``*_derivatives`` function."""
+
+    @abc.abstractmethod
+    def state_function(
+        self,
+    ) -> tuple[
+        Callable[..., tuple[npt.NDArray[np.float64], ...]], xr.DataArray, dict[str, Any]
+    ]:
+        """Return the derivatives function, its coefficients and its keyword arguments.
+
+        The vector dimensions of the coefficients follow the ``segment`` and ``degree`` ones.
+        """
+
+    def to_orbit_time(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
+        return to_orbit_time(calendar_time, self.epoch, **kwargs)
+
+    def to_calendar_time(self, orbit_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
+        return to_calendar_time(orbit_time, self.epoch, **kwargs)
+
+    def state_from_orbit_time(
+        self, orbit_time: xr.DataArray, derivatives: int = 2
+    ) -> tuple[xr.DataArray, ...]:
+        func, coefficients, kwargs = self.state_function()
+        vector_dims = [
+            str(d) for d in coefficients.dims if d not in ("segment", "degree")
+        ]
+        return apply_state_ufunc(
+            func, orbit_time, coefficients, vector_dims, derivatives, **kwargs
+        )
+
+    def position_from_orbit_time(self, orbit_time: xr.DataArray) -> xr.DataArray:
+        return self.state_from_orbit_time(orbit_time, derivatives=0)[0]
+
+    def velocity_from_orbit_time(self, orbit_time: xr.DataArray) -> xr.DataArray:
+        return self.state_from_orbit_time(orbit_time, derivatives=1)[1]
+
+    def acceleration_from_orbit_time(self, orbit_time: xr.DataArray) -> xr.DataArray:
+        return self.state_from_orbit_time(orbit_time, derivatives=2)[2]
+
+    def position(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
+        assert calendar_time.dtype.name in ("datetime64[ns]", "timedelta64[ns]")
+
+        position = self.position_from_orbit_time(self.to_orbit_time(calendar_time))
+        return position.assign_coords({calendar_time.name: calendar_time})
+
+    def velocity(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
+        assert calendar_time.dtype.name in ("datetime64[ns]", "timedelta64[ns]")
+
+        velocity = self.velocity_from_orbit_time(self.to_orbit_time(calendar_time))
+        return velocity.assign_coords({calendar_time.name: calendar_time})
+
+    def acceleration(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
+        assert calendar_time.dtype.name in ("datetime64[ns]", "timedelta64[ns]")
+
+        acceleration = self.acceleration_from_orbit_time(
+            self.to_orbit_time(calendar_time)
+        )
+        return acceleration.assign_coords({calendar_time.name: calendar_time})
+
+
 @attrs.define
-class OrbitPolyfitInterpolator(datamodel.OrbitInterpolator):
+class OrbitPolyfitInterpolator(OrbitStateInterpolator):
     """Creates an OrbitInterpolator from a set of state vectors using polyfit."""
 
     epoch: np.datetime64
@@ -83,11 +241,16 @@ class OrbitPolyfitInterpolator(datamodel.OrbitInterpolator):
     #
     # OrbitInterpolator interface
     #
-    def to_orbit_time(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
-        return to_orbit_time(calendar_time, self.epoch, **kwargs)
-
-    def to_calendar_time(self, orbit_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
-        return to_calendar_time(orbit_time, self.epoch, **kwargs)
+    def state_function(
+        self,
+    ) -> tuple[
+        Callable[..., tuple[npt.NDArray[np.float64], ...]], xr.DataArray, dict[str, Any]
+    ]:
+        return (
+            polyval_derivatives,
+            self.position_coefficients.transpose("degree", ...),
+            {},
+        )
 
     def position_from_orbit_time(self, orbit_time: xr.DataArray) -> xr.DataArray:
         position = xr.polyval(orbit_time, self.position_coefficients)
@@ -101,22 +264,83 @@ class OrbitPolyfitInterpolator(datamodel.OrbitInterpolator):
         velocity = xr.polyval(orbit_time, self.acceleration_coefficients)
         return velocity.rename("acceleration")
 
-    def position(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
-        assert calendar_time.dtype.name in ("datetime64[ns]", "timedelta64[ns]")
+    def state_from_orbit_time(
+        self, orbit_time: xr.DataArray, derivatives: int = 2
+    ) -> tuple[xr.DataArray, ...]:
+        if orbit_time.dtype.kind not in "fiu":
+            # let `xr.polyval` handle the conversion of datetime-like values
+            return datamodel.OrbitInterpolator.state_from_orbit_time(
+                self, orbit_time, derivatives
+            )
+        return super().state_from_orbit_time(orbit_time, derivatives)
 
-        position = self.position_from_orbit_time(self.to_orbit_time(calendar_time))
-        return position.assign_coords({calendar_time.name: calendar_time})
 
-    def velocity(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
-        assert calendar_time.dtype.name in ("datetime64[ns]", "timedelta64[ns]")
+@attrs.define
+class OrbitHermiteInterpolator(OrbitStateInterpolator):
+    """Creates an OrbitInterpolator from a set of state vectors using cubic Hermite segments."""
 
-        velocity = self.velocity_from_orbit_time(self.to_orbit_time(calendar_time))
-        return velocity.assign_coords({calendar_time.name: calendar_time})
+    epoch: np.datetime64
+    interval: tuple[np.datetime64, np.datetime64]
+    knots: npt.NDArray[np.float64]
+    segment_coefficients: xr.DataArray
+    step: float | None = None
 
-    def acceleration(self, calendar_time: xr.DataArray, **kwargs: Any) -> xr.DataArray:
-        assert calendar_time.dtype.name in ("datetime64[ns]", "timedelta64[ns]")
+    #
+    # custom methods
+    #
+    @classmethod
+    def from_position_velocity(
+        cls,
+        position: xr.DataArray,
+        velocity: xr.DataArray,
+        dim: str = "azimuth_time",
+        epoch: np.datetime64 | None = None,
+        interval: tuple[np.datetime64, np.datetime64] | None = None,
+    ) -> "OrbitHermiteInterpolator":
+        time = position.coords[dim]
 
-        acceleration = self.acceleration_from_orbit_time(
-            self.to_orbit_time(calendar_time)
+        if epoch is None:
+            # NOTE: summing two datetime64 is not defined and we cannot use:
+            #   `(time[0] + time[-1]) / 2` directly
+            epoch = time.values[0] + (time.values[-1] - time.values[0]) / 2
+
+        if interval is None:
+            interval = (time.values[0], time.values[-1])
+
+        position = position.transpose(dim, ...)
+        velocity = velocity.transpose(*position.dims)
+        vector_dims = position.dims[1:]
+
+        knots = to_orbit_time(time, epoch).values
+        steps = np.diff(knots)
+        p0, p1 = position.values[:-1], position.values[1:]
+        v0, v1 = velocity.values[:-1], velocity.values[1:]
+        h = steps.reshape(steps.shape + (1,) * len(vector_dims))
+        slope = (p1 - p0) / h
+        coefficients = np.stack(
+            [p0, v0, (3 * slope - 2 * v0 - v1) / h, (v0 + v1 - 2 * slope) / h**2],
+            axis=1,
         )
-        return acceleration.assign_coords({calendar_time.name: calendar_time})
+        segment_coefficients = xr.DataArray(
+            coefficients,
+            dims=("segment", "degree") + vector_dims,
+            coords={"degree": [0, 1, 2, 3]}
+            | {d: position.coords[d] for d in vector_dims if d in position.coords},
+        )
+
+        step = None
+        if np.allclose(steps, steps[0], rtol=0, atol=1e-6):
+            step = float(steps.mean())
+
+        return cls(epoch, interval, knots, segment_coefficients, step)
+
+    #
+    # OrbitInterpolator interface
+    #
+    def state_function(
+        self,
+    ) -> tuple[
+        Callable[..., tuple[npt.NDArray[np.float64], ...]], xr.DataArray, dict[str, Any]
+    ]:
+        kwargs = {"knots": self.knots, "step": self.step}
+        return hermite_derivatives, self.segment_coefficients, kwargs
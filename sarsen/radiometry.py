@@ -1,9 +1,13 @@
 import logging
+from typing import Any
 from unittest import mock
 
 import flox.xarray
 import numpy as np
+import numpy.typing as npt
+import pandas as pd
 import xarray as xr
+from scipy import ndimage, sparse
 
 from . import scene
 
@@ -12,12 +16,17 @@ logger = logging.getLogger(__name__)
 ONE_SECOND = np.timedelta64(10**9, "ns")
 
 
-def sum_weights(
+def sum_weights_flox(
     initial_weights: xr.DataArray,
     azimuth_index: xr.DataArray,
     slant_range_index: xr.DataArray,
     multilook: tuple[int, int] | None = None,
 ) -> xr.DataArray:
+    # flox needs the expected groups of dask-chunked indices, NaN indices are dropped
+    expected_groups = tuple(
+        pd.Index(np.arange(float(index.min()), float(index.max()) + 1))
+        for index in (slant_range_index, azimuth_index)
+    )
     geocoded = initial_weights.assign_coords(
         slant_range_index=slant_range_index, azimuth_index=azimuth_index
     )
@@ -27,6 +36,8 @@ def sum_weights(
         geocoded.slant_range_index,
         geocoded.azimuth_index,
         func="sum",
+        expected_groups=expected_groups,
+        fill_value=np.nan,
         method="map-reduce",
     )
 
@@ -45,7 +56,463 @@ def sum_weights(
             method="nearest",
         )
 
-    return weights_sum
+    valid = azimuth_index.notnull() & slant_range_index.notnull()
+    weights_sum = weights_sum.where(valid, 0)
+    return weights_sum.drop_vars(["slant_range_index", "azimuth_index"])
+
+
+def sum_weights_bincount(
+    initial_weights: xr.DataArray,
+    azimuth_index: xr.DataArray,
+    slant_range_index: xr.DataArray,
+    multilook: tuple[int, int] | None = None,
+) -> xr.DataArray:
+    azimuth = azimuth_index.values
+    slant_range = slant_range_index.values
+    valid = np.isfinite(azimuth) & np.isfinite(slant_range)
+    azimuth = azimuth[valid].astype(int)
+    slant_range = slant_range[valid].astype(int)
+    weights = np.nan_to_num(initial_weights.values[valid])
+
+    weights_sum = np.zeros(valid.shape)
+    if azimuth.size > 0:
+        azimuth -= azimuth.min()
+        slant_range -= slant_range.min()
+        grid_shape = (azimuth.max() + 1, slant_range.max() + 1)
+        index = np.ravel_multi_index((azimuth, slant_range), grid_shape)
+        flat_sum = np.bincount(index, weights=weights, minlength=np.prod(grid_shape))
+
+        if multilook:
+            # SAR cells without pixels do not count in the multilook mean
+            count = np.bincount(index, minlength=flat_sum.size)
+            flat_sum[count == 0] = np.nan
+            flat_sum_grid = xr.DataArray(
+                flat_sum.reshape(grid_shape), dims=("azimuth", "slant_range")
+            )
+            flat_sum = (
+                flat_sum_grid.rolling(
+                    azimuth=multilook[0],
+                    slant_range=multilook[1],
+                    center=True,
+                    min_periods=multilook[0] * multilook[1] // 2 + 1,
+                )
+                .mean()
+                .values.ravel()
+            )
+
+        weights_sum[valid] = flat_sum[index]
+
+    return xr.DataArray(
+        weights_sum,
+        dims=initial_weights.dims,
+        coords=initial_weights.coords,
+        name=initial_weights.name,
+    )
+
+
+def sum_weights(
+    initial_weights: xr.DataArray,
+    azimuth_index: xr.DataArray,
+    slant_range_index: xr.DataArray,
+    multilook: tuple[int, int] | None = None,
+    method: str = "bincount",
+) -> xr.DataArray:
+    """Sum the weights of the pixels that share the same azimuth and slant range index.
+
+    With ``method="bincount"`` the indices are linearised and summed with ``np.bincount``,
+    pixels with NaN indices get zero. With ``method="flox"``, also used for dask-chunked
+    indices, the sums are computed with a flox groupby and gathered with ``interp``.
+    """
+    allowed_methods = ["bincount", "flox"]
+    if method not in allowed_methods:
+        raise ValueError(f"{method=}. Must be one of: {allowed_methods}")
+    if azimuth_index.chunks is not None or slant_range_index.chunks is not None:
+        method = "flox"
+
+    if method == "flox":
+        return sum_weights_flox(
+            initial_weights, azimuth_index, slant_range_index, multilook
+        )
+    return sum_weights_bincount(
+        initial_weights, azimuth_index, slant_range_index, multilook
+    )
+
+
+def bilinear_cells(
+    azimuth: npt.NDArray[np.float64], slant_range: npt.NDArray[np.float64]
+) -> tuple[npt.NDArray[np.int_], npt.NDArray[np.int_], npt.NDArray[np.float64]]:
+    """Return the SAR-grid position and the weight of the four corners of the pixel cells.
+
+    The arrays have the ``(4, pixels)`` layout, corner ``i`` of all pixels is summed in
+    its own SAR-grid plane. Indices must be finite.
+    """
+    azimuth_01 = np.stack([np.floor(azimuth), np.ceil(azimuth)]).astype(int)
+    slant_range_01 = np.stack([np.floor(slant_range), np.ceil(slant_range)])
+    slant_range_01 = slant_range_01.astype(int)
+    # the bilinear weight of a corner is the area of the opposite sub-rectangle
+    azimuth_weights = abs(azimuth_01[::-1] - azimuth)
+    slant_range_weights = abs(slant_range_01[::-1] - slant_range)
+
+    corners = [(0, 0), (0, 1), (1, 0), (1, 1)]
+    azimuth_cells = np.stack([azimuth_01[i] for i, _ in corners])
+    slant_range_cells = np.stack([slant_range_01[j] for _, j in corners])
+    weights = np.stack(
+        [azimuth_weights[i] * slant_range_weights[j] for i, j in corners]
+    )
+    return azimuth_cells, slant_range_cells, weights
+
+
+def nearest_cells(
+    azimuth: npt.NDArray[np.float64], slant_range: npt.NDArray[np.float64]
+) -> tuple[npt.NDArray[np.int_], npt.NDArray[np.int_], npt.NDArray[np.float64]]:
+    """Return the SAR-grid position of the nearest cell of the pixels, like `bilinear_cells`."""
+    azimuth_cells = np.round(azimuth).astype(int)[None]
+    slant_range_cells = np.round(slant_range).astype(int)[None]
+    return azimuth_cells, slant_range_cells, np.ones(azimuth_cells.shape)
+
+
+SAR_CELLS = {"bilinear": bilinear_cells, "nearest": nearest_cells}
+
+
+def sar_grid_bounds(
+    azimuth_cells: npt.NDArray[np.int_], slant_range_cells: npt.NDArray[np.int_]
+) -> tuple[tuple[int, int], tuple[int, int]]:
+    """Return the origin and the shape of the bounding box of the SAR-grid cells."""
+    origin = (int(azimuth_cells.min()), int(slant_range_cells.min()))
+    grid_shape = (
+        int(azimuth_cells.max()) - origin[0] + 1,
+        int(slant_range_cells.max()) - origin[1] + 1,
+    )
+    return origin, grid_shape
+
+
+def stacked_planes_index(
+    azimuth_cells: npt.NDArray[np.int_],
+    slant_range_cells: npt.NDArray[np.int_],
+    origin: tuple[int, int],
+    grid_shape: tuple[int, int],
+) -> npt.NDArray[np.int_]:
+    """Linearise the cell positions in stacked SAR-grid planes, one per row of the cells."""
+    planes = np.arange(azimuth_cells.shape[0])[:, None]
+    index = np.ravel_multi_index(
+        (planes, azimuth_cells - origin[0], slant_range_cells - origin[1]),
+        (azimuth_cells.shape[0],) + grid_shape,
+    )
+    return index
+
+
+def sar_cells_index(
+    azimuth: npt.NDArray[np.float64],
+    slant_range: npt.NDArray[np.float64],
+    method: str = "bilinear",
+) -> tuple[
+    npt.NDArray[np.int_], npt.NDArray[np.float64], tuple[int, int], tuple[int, int]
+]:
+    """Return the linear index and the weight of the SAR cells of the pixels of ``method``.
+
+    The cells are indexed in the stacked planes of the bounding box of the cells, whose
+    origin and shape are also returned. Indices must be finite.
+    """
+    if method not in SAR_CELLS:
+        raise ValueError(f"{method=}. Must be one of: {list(SAR_CELLS)}")
+    azimuth_cells, slant_range_cells, weights = SAR_CELLS[method](azimuth, slant_range)
+    origin, grid_shape = sar_grid_bounds(azimuth_cells, slant_range_cells)
+    index = stacked_planes_index(azimuth_cells, slant_range_cells, origin, grid_shape)
+    return index, weights, origin, grid_shape
+
+
+def sum_weights_bilinear(
+    initial_weights: xr.DataArray,
+    azimuth_index: xr.DataArray,
+    slant_range_index: xr.DataArray,
+) -> xr.DataArray:
+    """Sum the bilinear contributions of the pixels to the four corners of their SAR cell.
+
+    The weights of the four corners are scattered into a single accumulator, one SAR-grid
+    plane per corner, with one ``np.bincount`` over linearised indices, and they are gathered
+    back in one pass. Pixels with invalid indices get zero.
+    """
+    azimuth = azimuth_index.values
+    slant_range = slant_range_index.values
+    weights = np.nan_to_num(initial_weights.values)
+    valid = np.isfinite(azimuth) & np.isfinite(slant_range)
+
+    tot_area = np.zeros(valid.shape)
+    if np.any(valid):
+        index, corner_weights, _, grid_shape = sar_cells_index(
+            azimuth[valid], slant_range[valid]
+        )
+        accumulator = np.bincount(
+            index.ravel(),
+            weights=(corner_weights * weights[valid]).ravel(),
+            minlength=index.shape[0] * grid_shape[0] * grid_shape[1],
+        )
+        tot_area[valid] = accumulator[index].sum(axis=0)
+
+    return xr.DataArray(
+        tot_area, dims=initial_weights.dims, coords=initial_weights.coords
+    )
+
+
+def sar_grid_index(
+    dem_coords: xr.Dataset,
+    slant_range_time0: float,
+    azimuth_time0: np.datetime64,
+    slant_range_time_interval_s: float,
+    azimuth_time_interval_s: float,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Return the fractional azimuth and slant range index of the DEM pixels, in C order."""
+    azimuth = (
+        (dem_coords.azimuth_time - azimuth_time0) / ONE_SECOND / azimuth_time_interval_s
+    ).values.ravel()
+    slant_range = (
+        (dem_coords.slant_range_time - slant_range_time0) / slant_range_time_interval_s
+    ).values.ravel()
+    return azimuth, slant_range
+
+
+def gamma_projection_matrix(
+    dem_coords: xr.Dataset,
+    slant_range_time0: float,
+    azimuth_time0: np.datetime64,
+    slant_range_time_interval_s: float,
+    azimuth_time_interval_s: float,
+    slant_range_spacing_m: float = 1.0,
+    azimuth_spacing_m: float = 1.0,
+    method: str = "bilinear",
+) -> sparse.csr_matrix:
+    """Build the sparse matrix projecting the gamma area of the DEM pixels on the SAR grid.
+
+    The matrix has one column per DEM pixel, in C order, and one row per SAR cell of the
+    stacked planes of `sar_cells_index`. It depends only on the geometry,
+    `apply_gamma_projection` computes the simulated beta nought of `gamma_weights_bilinear`
+    or `gamma_weights_nearest` from it.
+    """
+    if method not in SAR_CELLS:
+        raise ValueError(f"{method=}. Must be one of: {list(SAR_CELLS)}")
+
+    azimuth, slant_range = sar_grid_index(
+        dem_coords,
+        slant_range_time0,
+        azimuth_time0,
+        slant_range_time_interval_s,
+        azimuth_time_interval_s,
+    )
+    gamma_area = np.nan_to_num(dem_coords["gamma_area"].values.ravel())
+    valid = np.isfinite(azimuth) & np.isfinite(slant_range)
+    pixels = np.flatnonzero(valid)
+
+    if pixels.size == 0:
+        return sparse.csr_matrix((0, valid.size))
+    index, corner_weights, _, grid_shape = sar_cells_index(
+        azimuth[valid], slant_range[valid], method
+    )
+    size = index.shape[0] * grid_shape[0] * grid_shape[1]
+    area = (
+        corner_weights * gamma_area[valid] / (azimuth_spacing_m * slant_range_spacing_m)
+    )
+    columns = np.broadcast_to(pixels, index.shape)
+    # the structural zeros of the corners with zero weight are kept for the gather
+    return sparse.csr_matrix(
+        (area.ravel(), (index.ravel(), columns.ravel())), shape=(size, valid.size)
+    )
+
+
+def apply_gamma_projection(
+    projection: sparse.csr_matrix, template: xr.DataArray
+) -> xr.DataArray:
+    """Compute the simulated beta nought of the DEM pixels of ``template``.
+
+    The areas are summed on the SAR grid, ``projection @ 1``, and each DEM pixel gathers the
+    sums of its SAR cells with the transposed sparsity pattern of ``projection``.
+    """
+    if projection.shape[1] != template.size:
+        raise ValueError(
+            f"{projection.shape=} does not match the {template.size} DEM pixels"
+        )
+    gather = projection.transpose().tocsr()
+    gather.data[:] = 1.0
+    tot_area = gather @ (projection @ np.ones(projection.shape[1]))
+    return xr.DataArray(
+        tot_area.reshape(template.shape), dims=template.dims, coords=template.coords
+    )
+
+
+def gamma_area_sar_grid_sum(
+    dem_coords: xr.Dataset,
+    slant_range_time0: float,
+    azimuth_time0: np.datetime64,
+    slant_range_time_interval_s: float,
+    azimuth_time_interval_s: float,
+    slant_range_spacing_m: float = 1.0,
+    azimuth_spacing_m: float = 1.0,
+    method: str = "bilinear",
+) -> tuple[tuple[int, int], npt.NDArray[np.float64]]:
+    """Scatter the gamma area of the DEM pixels on the SAR grid.
+
+    Return the SAR-grid ``origin`` and the ``(planes, azimuth, slant range)`` partial sums
+    of the normalised gamma area over the bounding box of the cells hit by the pixels.
+    The partial sums of the DEM chunks are added with `merge_sar_grid_sums`.
+    """
+    if method not in SAR_CELLS:
+        raise ValueError(f"{method=}. Must be one of: {list(SAR_CELLS)}")
+    planes = 4 if method == "bilinear" else 1
+
+    azimuth, slant_range = sar_grid_index(
+        dem_coords,
+        slant_range_time0,
+        azimuth_time0,
+        slant_range_time_interval_s,
+        azimuth_time_interval_s,
+    )
+    valid = np.isfinite(azimuth) & np.isfinite(slant_range)
+    if not np.any(valid):
+        return (0, 0), np.zeros((planes, 0, 0))
+
+    index, weights, origin, grid_shape = sar_cells_index(
+        azimuth[valid], slant_range[valid], method
+    )
+    gamma_area = np.nan_to_num(dem_coords["gamma_area"].values.ravel()[valid])
+    area = weights * gamma_area / (azimuth_spacing_m * slant_range_spacing_m)
+    flat_sum = np.bincount(
+        index.ravel(), weights=area.ravel(), minlength=planes * np.prod(grid_shape)
+    )
+    return origin, flat_sum.reshape((planes,) + grid_shape)
+
+
+def merge_sar_grid_sums(
+    *sar_grid_sums: tuple[tuple[int, int], npt.NDArray[np.float64]],
+) -> tuple[tuple[int, int], npt.NDArray[np.float64]]:
+    """Add partial sums of `gamma_area_sar_grid_sum` on the union of their bounding boxes."""
+    non_empty = [(o, g) for o, g in sar_grid_sums if g.size > 0]
+    if len(non_empty) <= 1:
+        return non_empty[0] if non_empty else sar_grid_sums[0]
+
+    origin = (
+        min(o[0] for o, _ in non_empty),
+        min(o[1] for o, _ in non_empty),
+    )
+    stop = (
+        max(o[0] + g.shape[1] for o, g in non_empty),
+        max(o[1] + g.shape[2] for o, g in non_empty),
+    )
+    planes = non_empty[0][1].shape[0]
+    merged = np.zeros((planes, stop[0] - origin[0], stop[1] - origin[1]))
+    for (azimuth0, slant_range0), grid in non_empty:
+        azimuth0 -= origin[0]
+        slant_range0 -= origin[1]
+        merged[
+            :,
+            azimuth0 : azimuth0 + grid.shape[1],
+            slant_range0 : slant_range0 + grid.shape[2],
+        ] += grid
+    return origin, merged
+
+
+def gather_sar_grid_sum(
+    dem_coords: xr.Dataset,
+    sar_grid_sum: tuple[tuple[int, int], npt.NDArray[np.float64]],
+    slant_range_time0: float,
+    azimuth_time0: np.datetime64,
+    slant_range_time_interval_s: float,
+    azimuth_time_interval_s: float,
+    slant_range_spacing_m: float = 1.0,
+    azimuth_spacing_m: float = 1.0,
+    method: str = "bilinear",
+) -> xr.DataArray:
+    """Gather the simulated beta nought of the DEM pixels from the global SAR-grid sum.
+
+    ``sar_grid_sum`` must cover the cells of all the valid pixels of ``dem_coords``, e.g. the
+    merge of the partial sums of all the DEM chunks. Pixels with invalid indices get zero.
+    """
+    template = dem_coords.data_vars["slant_range_time"]
+    if template.size == 0:
+        return template
+
+    azimuth, slant_range = sar_grid_index(
+        dem_coords,
+        slant_range_time0,
+        azimuth_time0,
+        slant_range_time_interval_s,
+        azimuth_time_interval_s,
+    )
+    valid = np.isfinite(azimuth) & np.isfinite(slant_range)
+    tot_area = np.zeros(valid.shape)
+    if np.any(valid):
+        origin, grid = sar_grid_sum
+        azimuth_cells, slant_range_cells, _ = SAR_CELLS[method](
+            azimuth[valid], slant_range[valid]
+        )
+        grid_shape = (grid.shape[1], grid.shape[2])
+        index = stacked_planes_index(
+            azimuth_cells, slant_range_cells, origin, grid_shape
+        )
+        tot_area[valid] = grid.ravel()[index].sum(axis=0)
+
+    return xr.DataArray(
+        tot_area.reshape(template.shape), dims=template.dims, coords=template.coords
+    )
+
+
+def estimate_overlap_bound(
+    dem_coords: xr.Dataset,
+    slant_range_time0: float,
+    azimuth_time0: np.datetime64,
+    slant_range_time_interval_s: float,
+    azimuth_time_interval_s: float,
+    step: int = 1,
+    **kwargs: Any,
+) -> int:
+    """Estimate the overlap, in DEM pixels, needed to sum the gamma areas chunk by chunk.
+
+    ``dem_coords`` is the ``("y", "x")`` acquisition of the DEM subsampled every ``step``
+    pixels. The samples are binned on the SAR grid with bins of the size of the typical SAR
+    displacement between neighbouring samples, the DEM pixels that share SAR cells fall in
+    the same or in neighbouring bins. The bound is the largest extent in DEM pixels of the
+    samples of 3 x 3 neighbouring bins, it grows with layover and foreshortening.
+    """
+    azimuth, slant_range = sar_grid_index(
+        dem_coords.transpose("y", "x"),
+        slant_range_time0,
+        azimuth_time0,
+        slant_range_time_interval_s,
+        azimuth_time_interval_s,
+    )
+    shape = (dem_coords.sizes["y"], dem_coords.sizes["x"])
+    iy, ix = (np.indices(shape).reshape(2, -1) * step).astype(float)
+    valid = np.isfinite(azimuth) & np.isfinite(slant_range)
+    if not np.any(valid):
+        return 0
+
+    # the bins are at least one SAR cell wide
+    bin_sizes = []
+    for index in (azimuth.reshape(shape), slant_range.reshape(shape)):
+        diffs = np.concatenate(
+            [
+                np.abs(np.diff(index, axis=0)).ravel(),
+                np.abs(np.diff(index, axis=1)).ravel(),
+            ]
+        )
+        diffs = diffs[np.isfinite(diffs)]
+        bin_sizes.append(max(float(np.median(diffs)) if diffs.size else 1.0, 1.0))
+    azimuth_bins = np.floor(azimuth[valid] / bin_sizes[0]).astype(int)
+    slant_range_bins = np.floor(slant_range[valid] / bin_sizes[1]).astype(int)
+    azimuth_bins -= azimuth_bins.min()
+    slant_range_bins -= slant_range_bins.min()
+    bins_shape = (azimuth_bins.max() + 1, slant_range_bins.max() + 1)
+    bins = np.ravel_multi_index((azimuth_bins, slant_range_bins), bins_shape)
+
+    bound = 0
+    for position in (iy[valid], ix[valid]):
+        low = np.full(bins_shape, np.inf)
+        high = np.full(bins_shape, -np.inf)
+        np.minimum.at(low.ravel(), bins, position)
+        np.maximum.at(high.ravel(), bins, position)
+        low = ndimage.minimum_filter(low, size=3, mode="constant", cval=np.inf)
+        high = ndimage.maximum_filter(high, size=3, mode="constant", cval=-np.inf)
+        extent = high - low
+        bound = max(bound, int(np.max(extent[np.isfinite(extent)])))
+    return bound + step
 
 
 def compute_gamma_area(
@@ -79,55 +546,15 @@ def gamma_weights_bilinear(
         slant_range_time_interval_s
     )
 
-    slant_range_index_0 = np.floor(slant_range_index).astype(int).compute()
-    slant_range_index_1 = np.ceil(slant_range_index).astype(int).compute()
-    azimuth_index_0 = np.floor(azimuth_index).astype(int).compute()
-    azimuth_index_1 = np.ceil(azimuth_index).astype(int).compute()
-
-    logger.info("compute gamma areas 1/4")
-    w_00 = abs(
-        (azimuth_index_1 - azimuth_index) * (slant_range_index_1 - slant_range_index)
-    )
-    tot_area_00 = sum_weights(
-        dem_coords["gamma_area"] * w_00,
-        azimuth_index=azimuth_index_0,
-        slant_range_index=slant_range_index_0,
-    )
-
-    logger.info("compute gamma areas 2/4")
-    w_01 = abs(
-        (azimuth_index_1 - azimuth_index) * (slant_range_index_0 - slant_range_index)
-    )
-    tot_area_01 = sum_weights(
-        dem_coords["gamma_area"] * w_01,
-        azimuth_index=azimuth_index_0,
-        slant_range_index=slant_range_index_1,
-    )
-
-    logger.info("compute gamma areas 3/4")
-    w_10 = abs(
-        (azimuth_index_0 - azimuth_index) * (slant_range_index_1 - slant_range_index)
-    )
-    tot_area_10 = sum_weights(
-        dem_coords["gamma_area"] * w_10,
-        azimuth_index=azimuth_index_1,
-        slant_range_index=slant_range_index_0,
-    )
-
-    logger.info("compute gamma areas 4/4")
-    w_11 = abs(
-        (azimuth_index_0 - azimuth_index) * (slant_range_index_0 - slant_range_index)
-    )
-    tot_area_11 = sum_weights(
-        dem_coords["gamma_area"] * w_11,
-        azimuth_index=azimuth_index_1,
-        slant_range_index=slant_range_index_1,
+    logger.info("compute gamma areas")
+    tot_area = sum_weights_bilinear(
+        dem_coords["gamma_area"],
+        azimuth_index=azimuth_index,
+        slant_range_index=slant_range_index,
     )
 
-    tot_area = tot_area_00 + tot_area_01 + tot_area_10 + tot_area_11
-
     normalized_area = tot_area / (azimuth_spacing_m * slant_range_spacing_m)
-    return normalized_area.drop_vars(["azimuth_index"])
+    return normalized_area
 
 
 def gamma_weights_nearest(
@@ -145,11 +572,11 @@ def gamma_weights_nearest(
     # compute dem image coordinates
     azimuth_index = np.round(
         (dem_coords.azimuth_time - azimuth_time0) / ONE_SECOND / azimuth_time_interval_s
-    ).astype(int)
+    )
 
     slant_range_index = np.round(
         (dem_coords.slant_range_time - slant_range_time0) / slant_range_time_interval_s
-    ).astype(int)
+    )
 
     logger.info("compute gamma areas 1/1")
 
@@ -160,4 +587,4 @@ def gamma_weights_nearest(
     )
 
     normalized_area = tot_area / (azimuth_spacing_m * slant_range_spacing_m)
-    return normalized_area.drop_vars(["slant_range_index", "azimuth_index"])
+    return normalized_area
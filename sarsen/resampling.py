@@ -0,0 +1,438 @@
+from collections.abc import Sequence
+from typing import Any
+
+import dask.array
+import numpy as np
+import numpy.typing as npt
+import xarray as xr
+from rasterio import warp
+from scipy import ndimage
+
+RESAMPLING_METHODS = ["nearest", "linear", "cubic"]
+
+
+def coordinate_offsets(
+    values: npt.NDArray[Any], origin: Any
+) -> npt.NDArray[np.float64]:
+    """Return the offsets of ``values`` from ``origin`` as floats, NaT gives NaN."""
+    offsets = np.asarray(values - origin).astype("float64")
+    if np.asarray(values).dtype.kind == "M":
+        offsets[np.isnat(values)] = np.nan
+    return offsets
+
+
+def regular_grid(coordinate: npt.NDArray[Any]) -> tuple[Any, float] | None:
+    """Return the origin and the step of a regularly spaced coordinate, or None."""
+    if coordinate.size < 2:
+        return None
+    origin = coordinate[0]
+    offsets = coordinate_offsets(coordinate, origin)
+    step = offsets[-1] / (coordinate.size - 1)
+    if step == 0 or not np.allclose(np.diff(offsets), step, rtol=1e-6, atol=0):
+        return None
+    return origin, float(step)
+
+
+def coordinate_to_index(
+    values: npt.NDArray[Any],
+    coordinate: npt.NDArray[Any],
+    grid: tuple[Any, float] | None = None,
+) -> npt.NDArray[np.float64]:
+    """Convert coordinate values to fractional indices along a monotonic coordinate.
+
+    If the ``(origin, step)`` of a regular ``grid`` is given the index is computed in
+    closed form, otherwise it is interpolated on the coordinate. Missing values give NaN.
+    """
+    if grid is not None:
+        origin, step = grid
+        return coordinate_offsets(values, origin) / step
+
+    if coordinate.size == 0:
+        return np.full(np.shape(values), np.nan)
+    origin = coordinate[0]
+    offsets = coordinate_offsets(coordinate, origin)
+    index = np.arange(coordinate.size, dtype="float64")
+    if offsets[-1] < offsets[0]:
+        offsets, index = offsets[::-1], index[::-1]
+    values_offsets = coordinate_offsets(values, origin)
+    return np.interp(values_offsets, offsets, index, left=np.nan, right=np.nan)
+
+
+def gather(
+    data: npt.NDArray[Any],
+    row: npt.NDArray[np.float64],
+    col: npt.NDArray[np.float64],
+    method: str = "nearest",
+) -> npt.NDArray[Any]:
+    """Resample the 2-D ``data`` at the fractional indices ``row`` and ``col``.
+
+    Like ``xarray.DataArray.interp`` the points outside the ``data`` grid are NaN and with
+    the ``"nearest"`` method ties are resolved towards the lower index.
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"{method=}. Must be one of: {RESAMPLING_METHODS}")
+    dtype = np.result_type(data.dtype, np.float32)
+    out = np.full(row.shape, np.nan, dtype=dtype)
+    with np.errstate(invalid="ignore"):
+        valid = (row >= 0) & (row <= data.shape[0] - 1)
+        valid &= (col >= 0) & (col <= data.shape[1] - 1)
+    if not np.any(valid):
+        return out
+    row = row[valid]
+    col = col[valid]
+
+    if method == "nearest":
+        out[valid] = data[
+            np.ceil(row - 0.5).astype(int), np.ceil(col - 0.5).astype(int)
+        ]
+    elif method == "linear":
+        # the last grid line is interpolated with weight one from the previous cell
+        row0 = np.minimum(np.floor(row).astype(int), max(data.shape[0] - 2, 0))
+        col0 = np.minimum(np.floor(col).astype(int), max(data.shape[1] - 2, 0))
+        row1 = np.minimum(row0 + 1, data.shape[0] - 1)
+        col1 = np.minimum(col0 + 1, data.shape[1] - 1)
+        row_weight = row - row0
+        col_weight = col - col0
+        out[valid] = (
+            data[row0, col0] * (1 - row_weight) * (1 - col_weight)
+            + data[row0, col1] * (1 - row_weight) * col_weight
+            + data[row1, col0] * row_weight * (1 - col_weight)
+            + data[row1, col1] * row_weight * col_weight
+        )
+    else:
+        out[valid] = ndimage.map_coordinates(
+            data.astype(dtype), [row, col], order=3, mode="nearest"
+        )
+    return out
+
+
+def index_window(
+    indices: Sequence[npt.NDArray[np.float64]], shape: Sequence[int], halo: int = 8
+) -> tuple[slice, ...] | None:
+    """Return the window of a grid of ``shape`` spanned by the valid fractional ``indices``.
+
+    The window is enlarged by ``halo`` pixels, enough for the cubic kernel to be unaffected
+    by the window edges, and it is None if no index falls inside the grid.
+    """
+    with np.errstate(invalid="ignore"):
+        valid = np.ones(np.shape(indices[0]), dtype=bool)
+        for index, size in zip(indices, shape):
+            valid &= (index >= 0) & (index <= size - 1)
+    if not np.any(valid):
+        return None
+    window = []
+    for index, size in zip(indices, shape):
+        start = max(int(np.floor(index[valid].min())) - halo, 0)
+        stop = min(int(np.ceil(index[valid].max())) + halo + 1, size)
+        window.append(slice(start, stop))
+    return tuple(window)
+
+
+def sar_window(
+    coords: dict[str, npt.NDArray[Any]],
+    indexers: dict[str, npt.NDArray[Any]],
+    halo: int = 8,
+) -> dict[str, slice] | None:
+    """Return the window of the SAR image with ``coords`` needed to resample at ``indexers``."""
+    indices = [
+        coordinate_to_index(indexers[dim], coord, regular_grid(coord))
+        for dim, coord in coords.items()
+    ]
+    shape = [coord.size for coord in coords.values()]
+    window = index_window(indices, shape, halo=halo)
+    if window is None:
+        return None
+    return dict(zip(coords, window))
+
+
+def gather_window(
+    data: xr.DataArray,
+    row: npt.NDArray[np.float64],
+    col: npt.NDArray[np.float64],
+    method: str = "nearest",
+) -> npt.NDArray[Any]:
+    """Resample ``data`` reading only the window of its grid spanned by the indices."""
+    window = index_window([row, col], data.shape)
+    if window is None:
+        return gather(data.values[:0, :0], row, col, method)
+    data_window = data[window].values
+    # the edges of the data grid are kept as edges of the window
+    return gather(data_window, row - window[0].start, col - window[1].start, method)
+
+
+def gather_blocks(
+    row: npt.NDArray[np.float64],
+    col: npt.NDArray[np.float64],
+    blocks: list[list[npt.NDArray[Any]]],
+    image_chunks: tuple[tuple[int, ...], tuple[int, ...]],
+    method: str = "nearest",
+) -> npt.NDArray[Any]:
+    """Resample the image split in ``blocks`` copying only the window spanned by the indices."""
+    bounds = [np.cumsum((0,) + c) for c in image_chunks]
+    window = index_window([row, col], [int(b[-1]) for b in bounds])
+    if window is None:
+        return gather(blocks[0][0][:0, :0], row, col, method)
+    pieces: list[list[npt.NDArray[Any]]] = []
+    for i in range(len(image_chunks[0])):
+        if bounds[0][i] >= window[0].stop or bounds[0][i + 1] <= window[0].start:
+            continue
+        rows = slice(
+            max(window[0].start - bounds[0][i], 0),
+            min(window[0].stop, bounds[0][i + 1]) - bounds[0][i],
+        )
+        pieces.append([])
+        for j in range(len(image_chunks[1])):
+            if bounds[1][j] >= window[1].stop or bounds[1][j + 1] <= window[1].start:
+                continue
+            cols = slice(
+                max(window[1].start - bounds[1][j], 0),
+                min(window[1].stop, bounds[1][j + 1]) - bounds[1][j],
+            )
+            pieces[-1].append(blocks[i][j][rows, cols])
+    data_window = np.block(pieces)
+    return gather(data_window, row - window[0].start, col - window[1].start, method)
+
+
+def interp_sar_index(
+    data: xr.DataArray,
+    indexers: dict[str, xr.DataArray],
+    method: str = "nearest",
+) -> xr.DataArray:
+    """Resample the 2-D SAR ``data`` at the coordinates of ``indexers``, one per dimension.
+
+    The indexers are converted to fractional row and column indices, in closed form for
+    regularly spaced coordinates, and the values are gathered by index. With NumPy indexers
+    only the window of ``data`` spanned by the indices is read. With dask indexers the image
+    is an input of the graph, every block of the output gets the image blocks without
+    concatenating them and copies only the window spanned by its own indices.
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"{method=}. Must be one of: {RESAMPLING_METHODS}")
+    if set(indexers) != set(data.dims):
+        raise ValueError(f"{list(indexers)=}. Must be the dims of data: {data.dims}")
+
+    row_indexer, col_indexer = xr.broadcast(*(indexers[str(d)] for d in data.dims))
+    indices: list[xr.DataArray] = []
+    for dim, indexer in zip(data.dims, (row_indexer, col_indexer)):
+        coordinate = data.coords[dim].values
+        index = xr.apply_ufunc(
+            coordinate_to_index,
+            indexer,
+            kwargs={"coordinate": coordinate, "grid": regular_grid(coordinate)},
+            dask="parallelized",
+            output_dtypes=["float64"],
+        )
+        indices.append(index)
+    row, col = indices
+
+    dtype = np.result_type(data.dtype, np.float32)
+    if isinstance(row.data, dask.array.Array):
+        image = data.data
+        if not isinstance(image, dask.array.Array):
+            image = dask.array.from_array(image, chunks=-1)  # type: ignore
+        # every output block gets the list of the blocks of the image, not concatenated,
+        # and copies only the window spanned by its indices
+        index = tuple(f"index_{n}" for n in range(row.ndim))
+        values = dask.array.blockwise(  # type: ignore
+            gather_blocks,
+            index,
+            row.data,
+            index,
+            col.data,
+            index,
+            image,
+            ("image_row", "image_col"),
+            concatenate=False,
+            dtype=dtype,
+            image_chunks=image.chunks,
+            method=method,
+        )
+    else:
+        values = gather_window(data, row.values, col.values, method)
+
+    interpolated = row.copy(data=values).rename(data.name)
+    return interpolated.assign_attrs(data.attrs)
+
+
+def regrid_block(
+    data: npt.NDArray[Any], row: npt.NDArray[np.float64], col: npt.NDArray[np.float64]
+) -> npt.NDArray[Any]:
+    """Bilinearly interpolate the 2-D ``data`` on the grid of the 1-D ``row`` and ``col``."""
+    rows, cols = np.meshgrid(row, col, indexing="ij")
+    if data.dtype.kind != "M":
+        return gather(data, rows, cols, "linear")
+    # datetimes are interpolated as offsets from a local origin to keep the precision
+    valid = ~np.isnat(data)
+    if not np.any(valid):
+        return np.full(rows.shape, np.datetime64("NaT", "ns"), dtype=data.dtype)
+    origin = data[valid][0]
+    offsets = gather(coordinate_offsets(data, origin), rows, cols, "linear")
+    out = np.full(rows.shape, np.datetime64("NaT", "ns"), dtype=data.dtype)
+    finite = np.isfinite(offsets)
+    out[finite] = origin + np.round(offsets[finite]).astype("timedelta64[ns]")
+    return out
+
+
+def regrid_index(
+    target: npt.NDArray[Any], source: npt.NDArray[Any]
+) -> npt.NDArray[np.float64]:
+    """Return the fractional indices of the ``target`` pixel centres on the ``source`` axis.
+
+    Pixels within half a pixel outside of the first and the last source pixel centres are
+    clamped to them, so that the edges of the source grid are interpolated.
+    """
+    index = coordinate_to_index(target, source, regular_grid(source))
+    with np.errstate(invalid="ignore"):
+        inside = (index >= -0.5) & (index <= source.size - 0.5)
+    return np.where(inside, np.clip(index, 0, source.size - 1), np.nan)
+
+
+def regrid_linear(obj: Any, target: xr.DataArray) -> Any:
+    """Bilinearly interpolate ``obj`` on the ``("y", "x")`` grid of ``target``.
+
+    The two grids must share the CRS. Every chunk of ``target`` is interpolated from the
+    window of ``obj`` around it, so every output block depends only on the few blocks
+    of ``obj`` it overlaps. Points outside of ``obj`` are missing values.
+    """
+    if isinstance(obj, xr.Dataset):
+        return obj.map(regrid_linear, target=target, keep_attrs=True)
+    obj = obj.transpose("y", "x")
+    row = regrid_index(target.y.values, obj.y.values)
+    col = regrid_index(target.x.values, obj.x.values)
+    dtype = (
+        obj.dtype if obj.dtype.kind == "M" else np.result_type(obj.dtype, np.float32)
+    )
+
+    if not isinstance(obj.data, dask.array.Array):
+        data = regrid_block(obj.values, row, col)
+    else:
+        fill_value = np.datetime64("NaT", "ns") if obj.dtype.kind == "M" else np.nan
+        chunks = target.chunks or tuple((size,) for size in target.shape)
+        blocks: list[list[Any]] = []
+        for rows in np.split(row, np.cumsum(chunks[0])[:-1]):
+            blocks.append([])
+            for cols in np.split(col, np.cumsum(chunks[1])[:-1]):
+                window = []
+                for index, size in [(rows, obj.shape[0]), (cols, obj.shape[1])]:
+                    valid = index[np.isfinite(index)]
+                    if valid.size:
+                        start = int(np.floor(valid.min()))
+                        stop = min(int(np.ceil(valid.max())) + 1, size)
+                        window.append(slice(start, stop))
+                if len(window) < 2:
+                    block = dask.array.full(  # type: ignore
+                        (rows.size, cols.size), fill_value, dtype=dtype
+                    )
+                else:
+                    block = dask.array.map_blocks(  # type: ignore
+                        regrid_block,
+                        obj.data[tuple(window)].rechunk(-1),
+                        row=rows - window[0].start,
+                        col=cols - window[1].start,
+                        chunks=((rows.size,), (cols.size,)),
+                        dtype=dtype,
+                    )
+                blocks[-1].append(block)
+        data = dask.array.block(blocks)  # type: ignore
+
+    coords = {"y": target.y, "x": target.x}
+    return xr.DataArray(data, coords=coords, name=obj.name, attrs=obj.attrs)
+
+
+def reproject_index(
+    y: npt.NDArray[np.float64],
+    x: npt.NDArray[np.float64],
+    target_crs: Any,
+    source_crs: Any,
+    source_y: npt.NDArray[np.float64],
+    source_x: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Return the fractional indices on the source grid of the ``(y, x)`` target points."""
+    source_points_x, source_points_y = warp.transform(
+        target_crs, source_crs, np.ravel(x), np.ravel(y)
+    )
+    row = coordinate_to_index(
+        np.reshape(source_points_y, np.shape(y)), source_y, regular_grid(source_y)
+    )
+    col = coordinate_to_index(
+        np.reshape(source_points_x, np.shape(x)), source_x, regular_grid(source_x)
+    )
+    return row, col
+
+
+def reproject_block(
+    data: npt.NDArray[Any],
+    y: npt.NDArray[np.float64],
+    x: npt.NDArray[np.float64],
+    target_crs: Any,
+    source_crs: Any,
+    source_y: npt.NDArray[np.float64],
+    source_x: npt.NDArray[np.float64],
+) -> npt.NDArray[Any]:
+    """Bilinearly interpolate the source ``data`` on the grid of the target 1-D ``y`` and ``x``."""
+    yy, xx = np.meshgrid(y, x, indexing="ij")
+    row, col = reproject_index(yy, xx, target_crs, source_crs, source_y, source_x)
+    return gather(data, row, col, "linear")
+
+
+def reproject_linear(obj: xr.DataArray, target: xr.DataArray) -> xr.DataArray:
+    """Bilinearly interpolate ``obj`` on the ``("y", "x")`` grid of ``target`` in another CRS.
+
+    As in `regrid_linear` every chunk of ``target`` is interpolated from the window of
+    ``obj`` around it. The window is computed from the transformed boundary of the chunk,
+    the transform of all the points of the chunk is deferred to the computation.
+    """
+    obj = obj.transpose("y", "x")
+    kwargs = {
+        "target_crs": target.rio.crs,
+        "source_crs": obj.rio.crs,
+        "source_y": obj.y.values,
+        "source_x": obj.x.values,
+    }
+    dtype = np.result_type(obj.dtype, np.float32)
+
+    if not isinstance(obj.data, dask.array.Array):
+        data = reproject_block(obj.values, target.y.values, target.x.values, **kwargs)
+    else:
+        chunks = target.chunks or tuple((size,) for size in target.shape)
+        blocks: list[list[Any]] = []
+        for y in np.split(target.y.values, np.cumsum(chunks[0])[:-1]):
+            blocks.append([])
+            for x in np.split(target.x.values, np.cumsum(chunks[1])[:-1]):
+                # for transforms without folds the boundary of a chunk spans its points
+                row, col = reproject_index(
+                    np.concatenate([np.tile(y, 2), np.repeat([y[0], y[-1]], x.size)]),
+                    np.concatenate([np.repeat([x[0], x[-1]], y.size), np.tile(x, 2)]),
+                    **kwargs,
+                )
+                window = []
+                for index, size in [(row, obj.shape[0]), (col, obj.shape[1])]:
+                    index = index[np.isfinite(index)]
+                    if index.size and index.max() >= 0 and index.min() <= size - 1:
+                        start = max(int(np.floor(index.min())), 0)
+                        stop = min(int(np.ceil(index.max())) + 1, size)
+                        window.append(slice(start, stop))
+                if len(window) < 2:
+                    block = dask.array.full(  # type: ignore
+                        (y.size, x.size), np.nan, dtype=dtype
+                    )
+                else:
+                    block = dask.array.map_blocks(  # type: ignore
+                        reproject_block,
+                        obj.data[tuple(window)].rechunk(-1),
+                        y=y,
+                        x=x,
+                        **kwargs
+                        | {
+                            "source_y": obj.y.values[window[0]],
+                            "source_x": obj.x.values[window[1]],
+                        },
+                        chunks=((y.size,), (x.size,)),
+                        dtype=dtype,
+                    )
+                blocks[-1].append(block)
+        data = dask.array.block(blocks)  # type: ignore
+
+    coords = {"y": target.y, "x": target.x}
+    reprojected = xr.DataArray(data, coords=coords, name=obj.name, attrs=obj.attrs)
+    return reprojected.rio.write_crs(kwargs["target_crs"])  # type: ignore
@@ -1,10 +1,12 @@
+import functools
 import logging
-from typing import Any
+from typing import Any, Callable
 
+import dask.array
 import numpy as np
 import numpy.typing as npt
 import xarray as xr
-from rasterio import warp
+from rasterio import crs, warp
 
 LOGGER = logging.getLogger(__name__)
 
@@ -12,6 +14,15 @@ LOGGER = logging.getLogger(__name__)
 # https://en.wikipedia.org/wiki/Earth-centered,_Earth-fixed_coordinate_system
 # https://spatialreference.org/ref/epsg/wgs-84-2/
 ECEF_CRS = "EPSG:4978"
+ECEF_EPSG = 4978
+
+# WGS84 ellipsoid and the CRSs that can be transformed to ECEF in closed form
+WGS84_A = 6_378_137.0  # m
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_GEOGRAPHIC_EPSG = (4326, 4979)
+UTM_SCALE_FACTOR = 0.9996
+UTM_FALSE_EASTING = 500_000.0  # m
 
 
 def open_dem_raster(
@@ -26,6 +37,35 @@ def open_dem_raster(
     return dem_raster
 
 
+def make_target_raster(
+    target_crs: Any,
+    transform: Any,
+    shape: tuple[int, int],
+    chunks: int | None = None,
+) -> xr.DataArray:
+    """Return a raster of zeros on the grid of ``transform`` and ``shape`` in ``target_crs``.
+
+    The ``transform`` is a north-up affine transform, e.g. a ``rasterio`` Affine, and like
+    in `open_dem_raster` the ``y`` coordinate is increasing.
+    """
+    a, b, c, d, e, f = tuple(transform)[:6]
+    if b != 0 or d != 0:
+        raise ValueError(f"{transform=}. Must be a north-up transform without rotation")
+    x = c + (np.arange(shape[1]) + 0.5) * a
+    y = f + (np.arange(shape[0]) + 0.5) * e
+    if chunks is None:
+        data: Any = np.zeros(shape)
+    else:
+        data = dask.array.zeros(shape, chunks=chunks)
+    target_raster = xr.DataArray(data, coords={"y": y, "x": x}, dims=("y", "x"))
+    if e < 0:
+        target_raster = target_raster.isel(y=slice(None, None, -1))
+        if chunks is not None:
+            target_raster = target_raster.chunk(chunks)
+    target_raster.rio.write_crs(target_crs, inplace=True)
+    return target_raster
+
+
 def make_nd_dataarray(das: list[xr.DataArray], dim: str = "axis") -> xr.DataArray:
     da_nd = xr.concat(das, dim=dim, coords="minimal")
     dim_attrs = {"long_name": "cartesian axis index", "units": 1}
@@ -48,6 +88,130 @@ def convert_to_dem_3d(
     return dem_3d.rename("dem_3d")
 
 
+def geodetic_to_ecef(
+    lon: npt.NDArray[np.float64],
+    lat: npt.NDArray[np.float64],
+    height: npt.NDArray[np.float64],
+    out: npt.NDArray[np.float64],
+) -> None:
+    """Convert WGS84 longitude, latitude and ellipsoidal height to ECEF into ``out[:3]``."""
+    lon_rad = np.deg2rad(lon)
+    lat_rad = np.deg2rad(lat)
+    sin_lat = np.sin(lat_rad)
+    cos_lat = np.cos(lat_rad)
+    # prime vertical radius of curvature
+    radius = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat**2)
+    np.multiply((radius + height) * cos_lat, np.cos(lon_rad), out=out[0])
+    np.multiply((radius + height) * cos_lat, np.sin(lon_rad), out=out[1])
+    np.multiply(radius * (1.0 - WGS84_E2) + height, sin_lat, out=out[2])
+
+
+def utm_to_geodetic(
+    easting: npt.NDArray[np.float64],
+    northing: npt.NDArray[np.float64],
+    zone: int,
+    south: bool = False,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Convert WGS84 UTM coordinates to longitude and latitude in degrees.
+
+    Use the Krüger series to the third order, accurate to about a millimetre
+    within 3000 km from the central meridian.
+    """
+    n = WGS84_F / (2.0 - WGS84_F)
+    rectifying_radius = WGS84_A / (1.0 + n) * (1.0 + n**2 / 4.0 + n**4 / 64.0)
+    beta = [
+        n / 2.0 - 2.0 / 3.0 * n**2 + 37.0 / 96.0 * n**3,
+        n**2 / 48.0 + n**3 / 15.0,
+        17.0 / 480.0 * n**3,
+    ]
+    delta = [
+        2.0 * n - 2.0 / 3.0 * n**2 - 2.0 * n**3,
+        7.0 / 3.0 * n**2 - 8.0 / 5.0 * n**3,
+        56.0 / 15.0 * n**3,
+    ]
+    false_northing = 10_000_000.0 if south else 0.0
+    xi = (northing - false_northing) / (UTM_SCALE_FACTOR * rectifying_radius)
+    eta = (easting - UTM_FALSE_EASTING) / (UTM_SCALE_FACTOR * rectifying_radius)
+    xi, eta = np.broadcast_arrays(xi, eta)
+    xi_prime = xi.copy()
+    eta_prime = eta.copy()
+    for j, beta_j in enumerate(beta, start=1):
+        xi_prime -= beta_j * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+        eta_prime -= beta_j * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+    # conformal latitude
+    chi = np.arcsin(np.sin(xi_prime) / np.cosh(eta_prime))
+    lat_rad = chi.copy()
+    for j, delta_j in enumerate(delta, start=1):
+        lat_rad += delta_j * np.sin(2 * j * chi)
+    central_meridian = zone * 6.0 - 183.0
+    lon = central_meridian + np.rad2deg(
+        np.arctan2(np.sinh(eta_prime), np.cos(xi_prime))
+    )
+    return lon, np.rad2deg(lat_rad)
+
+
+def utm_to_ecef(
+    easting: npt.NDArray[np.float64],
+    northing: npt.NDArray[np.float64],
+    height: npt.NDArray[np.float64],
+    out: npt.NDArray[np.float64],
+    zone: int,
+    south: bool = False,
+) -> None:
+    lon, lat = utm_to_geodetic(easting, northing, zone, south)
+    geodetic_to_ecef(lon, lat, height, out)
+
+
+def analytic_transform(source_crs: Any, target_crs: Any) -> Callable[..., None] | None:
+    """Return the closed-form transformation between the CRSs, if there is one.
+
+    Only WGS84 geographic and UTM sources without a vertical datum and ECEF target are
+    supported, e.g. a geoid height needs PROJ and its grids.
+    """
+    if crs.CRS.from_user_input(target_crs).to_epsg() != ECEF_EPSG:
+        return None
+    source_epsg = crs.CRS.from_user_input(source_crs).to_epsg()
+    if source_epsg in WGS84_GEOGRAPHIC_EPSG:
+        return geodetic_to_ecef
+    if source_epsg is not None and source_epsg // 100 in (326, 327):
+        zone = source_epsg % 100
+        if 1 <= zone <= 60:
+            return functools.partial(
+                utm_to_ecef, zone=zone, south=source_epsg // 100 == 327
+            )
+    return None
+
+
+def transform_xyz(
+    x: npt.NDArray[np.float64],
+    y: npt.NDArray[np.float64],
+    z: npt.NDArray[np.float64],
+    out: npt.NDArray[np.float64],
+    source_crs: Any,
+    target_crs: Any = ECEF_CRS,
+) -> None:
+    """Transform the broadcastable ``x``, ``y`` and ``z`` coordinates into ``out[:3]``."""
+    transform = analytic_transform(source_crs, target_crs)
+    if transform is not None:
+        transform(x, y, z, out)
+        return
+
+    x, y, z = np.broadcast_arrays(x, y, z)
+    try:
+        x_crs, y_crs, z_crs = warp.transform(
+            source_crs, target_crs, x.flat, y.flat, z.flat
+        )
+    except Exception:
+        # HACK: the very first call to warp.transform sometimes fails
+        LOGGER.warn("rasterio.warp.transform failed, retrying...")
+        x_crs, y_crs, z_crs = warp.transform(
+            source_crs, target_crs, x.flat, y.flat, z.flat
+        )
+    out[0] = np.reshape(x_crs, x.shape)
+    out[1] = np.reshape(y_crs, y.shape)
+    out[2] = np.reshape(z_crs, z.shape)
+
+
 def transform_dem_3d(
     dem_3d: xr.DataArray,
     source_crs: str | None = None,
@@ -56,77 +220,100 @@ def transform_dem_3d(
 ) -> xr.DataArray:
     if source_crs is None:
         source_crs = dem_3d.rio.crs
-    try:
-        x, y, z = warp.transform(
-            source_crs,
-            target_crs,
-            dem_3d.sel({dim: 0}).values.flat,
-            dem_3d.sel({dim: 1}).values.flat,
-            dem_3d.sel({dim: 2}).values.flat,
-        )
-    except Exception:
-        # HACK: the very first call to warp.transform sometimes fails
-        LOGGER.warn("rasterio.warp.transform failed, retrying...")
-        x, y, z = warp.transform(
-            source_crs,
-            target_crs,
-            dem_3d.sel({dim: 0}).values.flat,
-            dem_3d.sel({dim: 1}).values.flat,
-            dem_3d.sel({dim: 2}).values.flat,
-        )
-    dem_3d_crs: xr.DataArray = xr.zeros_like(dem_3d)
-    shape = dem_3d_crs.loc[{dim: 0}].shape
-    dem_3d_crs.loc[{dim: 0}] = np.reshape(x, shape)
-    dem_3d_crs.loc[{dim: 1}] = np.reshape(y, shape)
-    dem_3d_crs.loc[{dim: 2}] = np.reshape(z, shape)
-    return dem_3d_crs
+    axis = dem_3d.dims.index(dim)
+    x, y, z = np.moveaxis(dem_3d.values, axis, 0)
+    data = np.empty(dem_3d.shape, dtype=dem_3d.dtype)
+    transform_xyz(x, y, z, np.moveaxis(data, axis, 0), source_crs, target_crs)
+    return dem_3d.copy(data=data)
 
 
 def convert_to_dem_ecef(
-    dem_raster: xr.DataArray, x: str = "x", y: str = "y", **kwargs: Any
+    dem_raster: xr.DataArray,
+    x: str = "x",
+    y: str = "y",
+    source_crs: str | None = None,
+    target_crs: str = ECEF_CRS,
+    dim: str = "axis",
+    dtype: str = "float64",
 ) -> xr.DataArray:
-    dem_3d = convert_to_dem_3d(dem_raster, x=x, y=y)
-    return transform_dem_3d(dem_3d, **kwargs)
+    """Convert the DEM to a 3D cube of ECEF coordinates, or of ``target_crs`` coordinates.
 
+    Equivalent to `convert_to_dem_3d` followed by `transform_dem_3d`, but the coordinates
+    are taken from the 1-D coordinate vectors, broadcast without copies, and only the
+    output cube is allocated.
+    """
+    if source_crs is None:
+        source_crs = dem_raster.rio.crs
+    x_shape = [1] * dem_raster.ndim
+    x_shape[dem_raster.dims.index(x)] = -1
+    y_shape = [1] * dem_raster.ndim
+    y_shape[dem_raster.dims.index(y)] = -1
+    x_values = dem_raster.coords[x].values.astype(dtype).reshape(x_shape)
+    y_values = dem_raster.coords[y].values.astype(dtype).reshape(y_shape)
+    data = np.empty((3,) + dem_raster.shape, dtype=dtype)
+    transform_xyz(x_values, y_values, dem_raster.values, data, source_crs, target_crs)
 
-def compute_dem_oriented_area(dem_ecef: xr.DataArray) -> xr.DataArray:
-    x_corners: npt.ArrayLike = np.concatenate(
-        [
-            [dem_ecef.x[0] + (dem_ecef.x[0] - dem_ecef.x[1]) / 2],
-            ((dem_ecef.x.shift(x=-1) + dem_ecef.x) / 2)[:-1].data,
-            [dem_ecef.x[-1] + (dem_ecef.x[-1] - dem_ecef.x[-2]) / 2],
-        ]
-    )
-    y_corners: npt.ArrayLike = np.concatenate(
-        [
-            [dem_ecef.y[0] + (dem_ecef.y[0] - dem_ecef.y[1]) / 2],
-            ((dem_ecef.y.shift(y=-1) + dem_ecef.y) / 2)[:-1].data,
-            [dem_ecef.y[-1] + (dem_ecef.y[-1] - dem_ecef.y[-2]) / 2],
-        ]
-    )
-    dem_ecef_corners = dem_ecef.interp(
-        {"x": x_corners, "y": y_corners},
-        method="linear",
-        kwargs={"fill_value": "extrapolate"},
+    dim_attrs = {"long_name": "cartesian axis index", "units": 1}
+    coords = {dim: (dim, range(3), dim_attrs)} | dict(dem_raster.coords)
+    dem_ecef = xr.DataArray(
+        data,
+        dims=(dim,) + dem_raster.dims,
+        coords=coords,
+        attrs=dem_raster.attrs,
+        name="dem_3d",
     )
+    return dem_ecef
 
-    dx = dem_ecef_corners.diff("x", 1)
-    dy = dem_ecef_corners.diff("y", 1)
 
-    dx1 = dx.isel(y=slice(1, None)).assign_coords(dem_ecef.coords)
-    dy1 = dy.isel(x=slice(1, None)).assign_coords(dem_ecef.coords)
-    dx2 = dx.isel(y=slice(None, -1)).assign_coords(dem_ecef.coords)
-    dy2 = dy.isel(x=slice(None, -1)).assign_coords(dem_ecef.coords)
+def pixel_corners(
+    values: npt.NDArray[np.float64], axis: int
+) -> npt.NDArray[np.float64]:
+    """Interpolate ``values`` at the pixel corners along ``axis``.
 
-    cross_1 = xr.cross(dx1, dy1, dim="axis") / 2
-    sign_1 = np.sign(
-        xr.dot(cross_1, dem_ecef, dim="axis")
-    )  # ensure direction out of DEM
+    Inner corners are the mean of the two adjacent pixels, the outer corners are linearly
+    extrapolated.
+    """
+    values = np.moveaxis(values, axis, -1)
+    corners = np.empty(values.shape[:-1] + (values.shape[-1] + 1,), dtype=values.dtype)
+    np.add(values[..., :-1], values[..., 1:], out=corners[..., 1:-1])
+    corners[..., 1:-1] *= 0.5
+    corners[..., 0] = 1.5 * values[..., 0] - 0.5 * values[..., 1]
+    corners[..., -1] = 1.5 * values[..., -1] - 0.5 * values[..., -2]
+    return np.moveaxis(corners, -1, axis)
 
-    cross_2 = xr.cross(dx2, dy2, dim="axis") / 2
-    sign_2 = np.sign(
-        xr.dot(cross_2, dem_ecef, dim="axis")
-    )  # ensure direction out of DEM
-    dem_oriented_area: xr.DataArray = cross_1 * sign_1 + cross_2 * sign_2
 
-    return dem_oriented_area.rename("dem_oriented_area")
+def compute_dem_oriented_area(
+    dem_ecef: xr.DataArray, halo: int = 0, dim: str = "axis"
+) -> xr.DataArray:
+    """Compute the area vector of every DEM pixel, oriented out of the DEM.
+
+    The pixel is split in two triangles by its diagonal, the vertices are the pixel corners.
+    If ``dem_ecef`` includes ``halo`` pixels of the neighbouring chunks on every side, they
+    are used to compute the corners of the edge pixels and they are trimmed from the output.
+    """
+    dem_ecef = dem_ecef.transpose(dim, "y", "x")
+    dem = dem_ecef.values
+    corners = pixel_corners(pixel_corners(dem, 2), 1)
+
+    dx = np.diff(corners, axis=2)
+    dy = np.diff(corners, axis=1)
+
+    dem_oriented_area = np.zeros_like(dem)
+    for dx_i, dy_i in [(dx[:, 1:], dy[:, :, 1:]), (dx[:, :-1], dy[:, :, :-1])]:
+        cross = np.cross(dx_i, dy_i, axis=0) / 2
+        # ensure direction out of DEM
+        sign = np.sign(np.einsum("i...,i...->...", cross, dem))
+        dem_oriented_area += cross * sign
+
+    interior = {
+        "y": slice(halo, dem.shape[1] - halo),
+        "x": slice(halo, dem.shape[2] - halo),
+    }
+    dem_ecef = dem_ecef.isel(interior)
+    dem_oriented_area = dem_oriented_area[:, interior["y"], interior["x"]]
+    return xr.DataArray(
+        dem_oriented_area,
+        dims=dem_ecef.dims,
+        coords=dem_ecef.coords,
+        name="dem_oriented_area",
+    )
@@ -6,7 +6,7 @@ import numpy as np
 import xarray as xr
 import xarray_sentinel
 
-from . import datamodel, orbit
+from . import datamodel, orbit, resampling
 
 try:
     import dask  # noqa: F401
@@ -16,6 +16,8 @@ except ModuleNotFoundError:
     DEFAULT_MEASUREMENT_CHUNKS = None
 
 SPEED_OF_LIGHT = 299_792_458.0  # m / s
+# slant range time samples of the ground range LUT, enough for a mm error on IW GRD
+GROUND_RANGE_LUT_SIZE = 4096
 
 
 def open_dataset_autodetect(
@@ -123,6 +125,23 @@ class Sentinel1SarProduct(
                 ds = xarray_sentinel.mosaic_slc_iw(ds)
         return ds
 
+    @property
+    def is_mosaic(self) -> bool:
+        attrs = self.lazy_measurement.attrs
+        return (
+            attrs["product_type"] == "SLC"
+            and attrs["mode"] == "IW"
+            and self.burst_id is None
+        )
+
+    @functools.cached_property
+    def lazy_measurement(self) -> xr.Dataset:
+        # without dask the backend reads only the selected window of the GeoTIFF
+        ds, self.kwargs = open_dataset_autodetect(
+            self.product_urlpath, group=self.measurement_group, **self.kwargs
+        )
+        return ds
+
     @functools.cached_property
     def orbit(self) -> xr.Dataset:
         ds, self.kwargs = open_dataset_autodetect(
@@ -196,7 +215,7 @@ class Sentinel1SarProduct(
 
     @functools.cached_property
     def product_type(self) -> Any:
-        prod_type = self.measurement.attrs["product_type"]
+        prod_type = self.lazy_measurement.attrs["product_type"]
         assert isinstance(prod_type, str)
         return prod_type
 
@@ -210,12 +229,78 @@ class Sentinel1SarProduct(
             beta_nought = beta_nought.persist()
         return beta_nought.drop_vars(["pixel", "line"])
 
+    @functools.cache
+    def image_coords(self) -> dict[str, Any]:
+        measurement = self.measurement.data_vars["measurement"]
+        return {str(dim): measurement.coords[dim].values for dim in measurement.dims}
+
+    def beta_nought_window(self, window: dict[str, slice]) -> xr.DataArray:
+        if self.is_mosaic:
+            # the bursts are mosaicked lazily only by dask
+            return datamodel.SarProduct.beta_nought_window(self, window)
+        measurement = self.lazy_measurement.data_vars["measurement"].isel(window)
+        beta_nought = xarray_sentinel.calibrate_intensity(
+            measurement, self.calibration.betaNought
+        )
+        return beta_nought.drop_vars(["pixel", "line"]).compute()
+
+    @functools.cache
+    def bursts(
+        self,
+    ) -> list[tuple[datamodel.SarProduct, tuple[np.datetime64, np.datetime64]]]:
+        if not self.is_mosaic:
+            return []
+        lines_per_burst = self.lazy_measurement.attrs["lines_per_burst"]
+        azimuth_time = self.lazy_measurement.azimuth_time.values
+        first_time = azimuth_time[::lines_per_burst]
+        last_time = azimuth_time[lines_per_burst - 1 :: lines_per_burst]
+        # consecutive bursts share the overlap at its middle, away from the burst edges
+        # that are cropped by the mosaic
+        middle = first_time[1:] + (last_time[:-1] - first_time[1:]) / 2
+        starts = [first_time[0], *middle]
+        stops = [*middle, last_time[-1] + np.timedelta64(1, "ns")]
+        return [
+            (
+                attrs.evolve(
+                    self, measurement_group=f"{self.measurement_group}/{burst_index}"
+                ),
+                (start, stop),
+            )
+            for burst_index, (start, stop) in enumerate(zip(starts, stops))
+        ]
+
     def geospatial_bounds(self) -> str:
         return self.product_info()["geospatial_bounds"]  # type: ignore
 
-    def orbit_interpolator(self, **kwargs: Any) -> datamodel.OrbitInterpolator:
+    def geometry_key(self) -> dict[str, Any]:
+        # the geometry over the DEM depends only on the orbit, not on the measurement group
+        attrs = self.lazy_measurement.attrs
+        return {
+            "family_name": attrs["family_name"],
+            "relative_orbit_number": attrs["relative_orbit_number"],
+        }
+
+    @functools.cache
+    def with_polarisation(self, polarisation: str) -> "Sentinel1SarProduct":
+        if self.measurement_group is None:
+            raise ValueError("measurement_group must be set to change the polarisation")
+        # measurement groups are "{swath}/{polarisation}" or "{swath}/{polarisation}/{burst}"
+        parts = self.measurement_group.split("/")
+        parts[1] = polarisation.upper()
+        return attrs.evolve(self, measurement_group="/".join(parts))
+
+    def orbit_interpolator(
+        self, method: str = "polyfit", **kwargs: Any
+    ) -> datamodel.OrbitInterpolator:
         state_vectors = self.state_vectors()
-        return orbit.OrbitPolyfitInterpolator.from_position(state_vectors, **kwargs)
+        if method == "polyfit":
+            return orbit.OrbitPolyfitInterpolator.from_position(state_vectors, **kwargs)
+        elif method == "hermite":
+            return orbit.OrbitHermiteInterpolator.from_position_velocity(
+                state_vectors, self.orbit.data_vars["velocity"], **kwargs
+            )
+        else:
+            raise ValueError(f"{method=}. Must be one of: 'polyfit', 'hermite'")
 
     def state_vectors(self) -> xr.DataArray:
         return self.orbit.data_vars["position"]
@@ -231,11 +316,49 @@ class Sentinel1SarProduct(
         )
         return ground_range
 
+    @functools.cached_property
+    def ground_range_lut(self) -> xr.DataArray:
+        """Ground range on the azimuth times of the srgr records and a dense slant range time grid."""
+        coordinate_conversion = self.coordinate_conversion
+        assert coordinate_conversion is not None
+        image_ground_range = self.image_coords()["ground_range"][[0, -1]]
+        x = xr.DataArray(image_ground_range, dims="edge") - coordinate_conversion.gr0
+        slant_range = (
+            coordinate_conversion.grsrCoefficients * x**coordinate_conversion.degree
+        ).sum("degree")
+        start, stop = (
+            2.0 / SPEED_OF_LIGHT * np.array([slant_range.min(), slant_range.max()])
+        )
+        margin = 0.01 * (stop - start)
+        slant_range_time = np.linspace(
+            start - margin, stop + margin, GROUND_RANGE_LUT_SIZE
+        )
+        ground_range = xarray_sentinel.slant_range_time_to_ground_range(
+            coordinate_conversion.azimuth_time,
+            xr.DataArray(
+                slant_range_time, coords={"slant_range_time": slant_range_time}
+            ),
+            coordinate_conversion=coordinate_conversion,
+        )
+        return ground_range.transpose("azimuth_time", "slant_range_time").compute()
+
+    def ground_range_lookup(
+        self, azimuth_time: xr.DataArray, slant_range_time: xr.DataArray
+    ) -> xr.DataArray:
+        # linear interpolation in azimuth matches the interpolation of the srgr records
+        return resampling.interp_sar_index(
+            self.ground_range_lut,
+            {"azimuth_time": azimuth_time, "slant_range_time": slant_range_time},
+            method="linear",
+        )
+
     def grid_parameters(
         self,
         grouping_area_factor: tuple[float, float] = (3.0, 3.0),
     ) -> dict[str, Any]:
-        return azimuth_slant_range_grid(self.measurement.attrs, grouping_area_factor)
+        return azimuth_slant_range_grid(
+            self.lazy_measurement.attrs, grouping_area_factor
+        )
 
     def complex_amplitude(self) -> xr.DataArray:
         measurement = self.measurement.data_vars["measurement"]
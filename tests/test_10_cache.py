@@ -0,0 +1,88 @@
+import os
+
+import py
+import xarray as xr
+from scipy import sparse
+
+from sarsen import cache
+
+
+def test_geometry_cache_key(dem_raster: xr.DataArray) -> None:
+    geometry_key = {"relative_orbit_number": 22}
+
+    res = cache.geometry_cache_key(geometry_key, dem_raster)
+
+    assert res == cache.geometry_cache_key(geometry_key, dem_raster)
+    assert res != cache.geometry_cache_key({"relative_orbit_number": 23}, dem_raster)
+    assert res != cache.geometry_cache_key(
+        geometry_key, dem_raster.isel(x=slice(1, None))
+    )
+    assert res != cache.geometry_cache_key(geometry_key, dem_raster, "gamma_nearest")
+
+
+def test_geometry_cache(tmpdir: py.path.local, dem_raster: xr.DataArray) -> None:
+    urlpath = cache.geometry_cache_urlpath(str(tmpdir), "key")
+
+    assert cache.open_geometry_cache(urlpath) is None
+
+    acquisition = xr.Dataset({"slant_range_time": dem_raster.drop_vars("spatial_ref")})
+    res = cache.save_geometry_cache(acquisition.chunk(100), urlpath)
+
+    assert res.slant_range_time.chunks is not None
+    assert res.slant_range_time.equals(acquisition.slant_range_time)
+    assert isinstance(cache.open_geometry_cache(urlpath), xr.Dataset)
+
+    # an unreadable store is recomputed and replaced
+    urlpath = cache.geometry_cache_urlpath(str(tmpdir), "broken")
+    os.makedirs(urlpath)
+
+    assert cache.open_geometry_cache(urlpath) is None
+
+    res = cache.save_geometry_cache(acquisition.chunk(100), urlpath)
+
+    assert res.slant_range_time.equals(acquisition.slant_range_time)
+    # no temporary store is left behind
+    assert len(tmpdir.listdir()) == 2
+
+
+def test_gamma_projection_key(dem_raster: xr.DataArray) -> None:
+    geometry_key = {"relative_orbit_number": 22}
+    grid_parameters = {"azimuth_time_interval_s": 0.002}
+
+    res = cache.gamma_projection_key(
+        geometry_key, dem_raster, "bilinear", grid_parameters
+    )
+
+    assert res == cache.gamma_projection_key(
+        geometry_key, dem_raster.chunk(100), "bilinear", grid_parameters
+    )
+    assert res != cache.gamma_projection_key(
+        geometry_key, dem_raster, "nearest", grid_parameters
+    )
+    assert res != cache.gamma_projection_key(
+        geometry_key, dem_raster, "bilinear", {"azimuth_time_interval_s": 0.006}
+    )
+    assert res != cache.gamma_projection_key(
+        geometry_key, dem_raster.isel(x=slice(1, None)), "bilinear", grid_parameters
+    )
+
+
+def test_gamma_projection(tmpdir: py.path.local) -> None:
+    urlpath = str(tmpdir.join("gamma-projection.npz"))
+    projection = sparse.random(20, 30, density=0.1, format="csr", random_state=42)
+
+    assert cache.open_gamma_projection(urlpath, "key") is None
+
+    cache.save_gamma_projection(projection, urlpath, "key")
+    res = cache.open_gamma_projection(urlpath, "key")
+
+    assert res is not None
+    assert (res != projection).nnz == 0
+    # the file is readable as a plain scipy.sparse matrix
+    assert (sparse.load_npz(urlpath) != projection).nnz == 0
+    assert cache.open_gamma_projection(urlpath, "other-key") is None
+
+    # a matrix saved without a key is ignored
+    sparse.save_npz(urlpath, projection)
+
+    assert cache.open_gamma_projection(urlpath, "key") is None
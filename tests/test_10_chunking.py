@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 import xarray as xr
 
 from sarsen import chunking
@@ -73,3 +74,90 @@ def test_map_overlap() -> None:
 
     res = chunking.map_overlap(function, obj=ds, chunks=10, bound=2)
     assert res.equals(ds.data_vars["data"])
+
+
+def test_sync_map_overlap() -> None:
+    da = xr.DataArray(
+        np.arange(20 * 30.0).reshape((20, 30)) ** 2,
+        coords={"x": np.arange(0, 20), "y": np.arange(0, 30)},
+    )
+
+    def function(x: xr.DataArray) -> xr.DataArray:
+        return x.rolling(x=3, y=3, center=True, min_periods=1).sum()
+
+    expected = function(da)
+
+    res = chunking.sync_map_overlap(function, obj=da, chunks=7, bound=2, max_workers=3)
+
+    xr.testing.assert_allclose(res, expected)
+
+    def failing_function(x: xr.DataArray) -> xr.DataArray:
+        raise ValueError("failing chunk")
+
+    with pytest.raises(ValueError, match="failing chunk"):
+        chunking.sync_map_overlap(failing_function, obj=da, chunks=7, bound=2)
+
+
+def test_map_scatter_gather() -> None:
+    ds = (
+        xr.DataArray(
+            np.arange(20 * 30.0).reshape((20, 30)),
+            coords={"x": np.arange(0, 20), "y": np.arange(0, 30)},
+        )
+        .chunk(7)
+        .to_dataset(name="data")
+    )
+
+    def scatter(block: xr.Dataset) -> float:
+        return float(block.data_vars["data"].sum())
+
+    def merge(*partials: float) -> float:
+        return sum(partials)
+
+    def gather(block: xr.Dataset, accumulator: float) -> xr.DataArray:
+        return block.data_vars["data"] / accumulator
+
+    expected = ds.data_vars["data"] / ds.data_vars["data"].sum()
+
+    res = chunking.map_scatter_gather(
+        scatter, merge, gather, obj=ds, template=ds.data_vars["data"], split_every=2
+    )
+
+    assert res.chunks == ds.data_vars["data"].chunks
+    xr.testing.assert_allclose(res.compute(), expected)
+
+    res = chunking.map_scatter_gather(
+        scatter, merge, gather, obj=ds.compute(), template=ds.data_vars["data"]
+    )
+
+    xr.testing.assert_allclose(res, expected)
+
+
+def test_memory_limit_chunks() -> None:
+    res = chunking.memory_limit_chunks(
+        2**20 * 100, (10_000, 10_000), bytes_per_pixel=100.0, workers=4
+    )
+
+    # 4 chunks of 512 x 512 pixels of 100 bytes fit in 100 MiB
+    assert res == 512
+
+    res = chunking.memory_limit_chunks(
+        2**20 * 100, (10_000, 10_000), bytes_per_pixel=100.0, bound=16, workers=4
+    )
+
+    assert res == 480
+
+    # every worker gets a chunk
+    res = chunking.memory_limit_chunks(
+        2**30, (1000, 1000), bytes_per_pixel=100.0, workers=4
+    )
+
+    assert res == 496
+
+    with pytest.raises(ValueError):
+        chunking.memory_limit_chunks(
+            2**20 * 100,
+            (10_000, 10_000),
+            bytes_per_pixel=100.0,
+            global_bytes_per_pixel=2.0,
+        )
@@ -89,3 +89,79 @@ def test_OrbitPolyfitInterpolator_values(orbit_ds: xr.Dataset) -> None:
     )
 
     assert np.allclose(acceleration, 8.18, rtol=0.001)
+
+
+def test_OrbitPolyfitInterpolator_state_from_orbit_time(orbit_ds: xr.Dataset) -> None:
+    position = orbit_ds.data_vars["position"]
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(position, deg=4)
+    orbit_time = xr.DataArray(
+        np.linspace(-20.0, 20.0, 12).reshape(3, 4), dims=("y", "x")
+    )
+
+    res = orbit_interpolator.state_from_orbit_time(orbit_time)
+
+    assert [r.name for r in res] == ["position", "velocity", "acceleration"]
+    expected = orbit_interpolator.position_from_orbit_time(orbit_time)
+    assert res[0].dims == expected.dims
+    assert np.allclose(res[0], expected, rtol=0, atol=1e-6)
+    expected = orbit_interpolator.velocity_from_orbit_time(orbit_time)
+    assert np.allclose(res[1], expected, rtol=0, atol=1e-9)
+    expected = orbit_interpolator.acceleration_from_orbit_time(orbit_time)
+    assert np.allclose(res[2], expected, rtol=0, atol=1e-12)
+
+    res = orbit_interpolator.state_from_orbit_time(orbit_time, derivatives=1)
+
+    assert len(res) == 2
+
+    res = orbit_interpolator.state_from_orbit_time(orbit_time, derivatives=0)
+
+    assert len(res) == 1
+    assert res[0].name == "position"
+
+
+def test_OrbitHermiteInterpolator(orbit_ds: xr.Dataset) -> None:
+    position = orbit_ds.data_vars["position"]
+    velocity = orbit_ds.data_vars["velocity"]
+    orbit_interpolator = orbit.OrbitHermiteInterpolator.from_position_velocity(
+        position, velocity
+    )
+
+    assert orbit_interpolator.step == 10.0
+
+    res = orbit_interpolator.position(position.azimuth_time)
+
+    assert res.dims == ("azimuth_time", "axis")
+    assert np.allclose(res, position, rtol=0, atol=1e-6)
+
+    res = orbit_interpolator.velocity(position.azimuth_time)
+
+    assert res.dims == ("azimuth_time", "axis")
+    assert np.allclose(res, velocity, rtol=0, atol=1e-6)
+
+    # compare with polyfit in the middle of the segments
+    polyfit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(
+        position, deg=4, epoch=orbit_interpolator.epoch
+    )
+    orbit_time = xr.DataArray(np.arange(-24.0, 25.0, 2.0), dims="azimuth_time")
+
+    state = orbit_interpolator.state_from_orbit_time(orbit_time)
+    expected_state = polyfit_interpolator.state_from_orbit_time(orbit_time)
+
+    assert state[0].dims == expected_state[0].dims
+    assert np.allclose(state[0], expected_state[0], rtol=0, atol=0.01)
+    assert np.allclose(state[1], expected_state[1], rtol=0, atol=0.02)
+    assert np.allclose(state[2], expected_state[2], rtol=0, atol=0.01)
+
+
+def test_OrbitHermiteInterpolator_uneven(orbit_ds: xr.Dataset) -> None:
+    position = orbit_ds.data_vars["position"].drop_isel(azimuth_time=2)
+    velocity = orbit_ds.data_vars["velocity"].drop_isel(azimuth_time=2)
+    orbit_interpolator = orbit.OrbitHermiteInterpolator.from_position_velocity(
+        position, velocity
+    )
+
+    assert orbit_interpolator.step is None
+
+    res = orbit_interpolator.position(position.azimuth_time)
+
+    assert np.allclose(res, position, rtol=0, atol=1e-6)
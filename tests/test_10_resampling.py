@@ -0,0 +1,199 @@
+from typing import Literal
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+import rioxarray
+import xarray as xr
+from rasterio import transform as rio_transform
+from rasterio import warp
+
+from sarsen import resampling, scene
+
+
+@pytest.fixture
+def sar_image() -> xr.DataArray:
+    rng = np.random.default_rng(42)
+    azimuth_time = np.datetime64("2022-01-01T00:00:00", "ns") + np.arange(
+        0, 40_000_000, 2_000_000
+    ).astype("timedelta64[ns]")
+    ground_range = np.arange(30) * 10.0
+    return xr.DataArray(
+        rng.random((20, 30)),
+        coords={"azimuth_time": azimuth_time, "ground_range": ground_range},
+        attrs={"units": "m2 m-2"},
+    )
+
+
+def test_coordinate_to_index() -> None:
+    coordinate = np.array([0.0, 1.0, 3.0, 6.0])
+    values = np.array([-1.0, 0.0, 2.0, 6.0, np.nan])
+
+    res = resampling.coordinate_to_index(values, coordinate)
+
+    np.testing.assert_allclose(res, [np.nan, 0.0, 1.5, 3.0, np.nan])
+
+    coordinate = np.array(["2022-01-01", "2022-01-03"], dtype="datetime64[ns]")
+    values = np.array(["2022-01-02", "NaT"], dtype="datetime64[ns]")
+    grid = resampling.regular_grid(coordinate)
+
+    res = resampling.coordinate_to_index(values, coordinate, grid)
+
+    assert grid is not None
+    np.testing.assert_allclose(res, [0.5, np.nan])
+
+
+@pytest.mark.parametrize("method", ["nearest", "linear"])
+def test_interp_sar_index(
+    sar_image: xr.DataArray, method: Literal["nearest", "linear"]
+) -> None:
+    rng = np.random.default_rng(0)
+    # points slightly outside the image are NaN as in xarray interp
+    azimuth_time = sar_image.azimuth_time[0].values + (
+        rng.uniform(-1, 20, (8, 9)) * 2_000_000
+    ).astype("timedelta64[ns]")
+    azimuth_time = xr.DataArray(azimuth_time, dims=("y", "x"))
+    ground_range = xr.DataArray(rng.uniform(-5, 300, (8, 9)), dims=("y", "x"))
+    expected = sar_image.interp(
+        azimuth_time=azimuth_time, ground_range=ground_range, method=method
+    )
+
+    res = resampling.interp_sar_index(
+        sar_image,
+        {"azimuth_time": azimuth_time, "ground_range": ground_range},
+        method,
+    )
+
+    assert res.dims == ("y", "x")
+    assert res.attrs == sar_image.attrs
+    np.testing.assert_allclose(res.values, expected.values)
+
+    sar_image_dask = sar_image.chunk(7)
+
+    res = resampling.interp_sar_index(
+        sar_image_dask,
+        {
+            "azimuth_time": azimuth_time.chunk(4),
+            "ground_range": ground_range.chunk(4),
+        },
+        method,
+    )
+
+    # the image is an input of the graph, not bound to the tasks
+    image_keys = set(sar_image_dask.data.__dask_graph__())
+    assert image_keys <= set(res.data.__dask_graph__())
+    np.testing.assert_allclose(res.values, expected.values)
+
+    res = resampling.interp_sar_index(
+        sar_image,
+        {
+            "azimuth_time": azimuth_time.stack(point=("y", "x")).chunk(10),
+            "ground_range": ground_range.stack(point=("y", "x")).chunk(10),
+        },
+        method,
+    )
+
+    assert res.chunks == ((10,) * 7 + (2,),)
+    np.testing.assert_allclose(res.values, expected.values.ravel())
+
+
+def test_sar_window(sar_image: xr.DataArray) -> None:
+    coords = {str(dim): sar_image.coords[dim].values for dim in sar_image.dims}
+    indexers = {
+        "azimuth_time": sar_image.azimuth_time.values[[3, 5]],
+        "ground_range": np.array([-100.0, 150.0]),
+    }
+
+    res = resampling.sar_window(coords, indexers, halo=1)
+
+    assert res == {"azimuth_time": slice(4, 7), "ground_range": slice(14, 17)}
+
+    indexers["ground_range"] = np.array([-100.0, 1000.0])
+
+    assert resampling.sar_window(coords, indexers) is None
+
+
+def test_gather() -> None:
+    data = np.arange(12.0).reshape(3, 4)
+
+    res = resampling.gather(data, np.array([1.0, 1.5, 2.0]), np.array([1.0, 2.0, 3.0]))
+
+    np.testing.assert_allclose(res, [5.0, 6.0, 11.0])
+
+    res = resampling.gather(
+        data, np.array([1.0, 2.0, 2.5]), np.array([1.0, 3.0, 3.0]), "cubic"
+    )
+
+    np.testing.assert_allclose(res, [5.0, 11.0, np.nan])
+
+    with pytest.raises(ValueError):
+        resampling.gather(data, np.array([1.0]), np.array([1.0]), "spline")
+
+
+def test_regrid_linear() -> None:
+    y = np.arange(10.0) * 30
+    x = np.arange(12.0) * 30
+    yy, xx = np.meshgrid(y, x, indexing="ij")
+    azimuth_time = np.datetime64("2022-01-01", "ns") + (yy * 1e6).astype(
+        "timedelta64[ns]"
+    )
+    obj = xr.Dataset(
+        {
+            "slant_range_time": (("y", "x"), 2 * yy + xx),
+            "azimuth_time": (("y", "x"), azimuth_time),
+        },
+        coords={"y": y, "x": x},
+    )
+    # a finer grid extending half a source pixel and more outside of the source
+    target = xr.DataArray(
+        np.zeros((30, 40)),
+        coords={"y": np.arange(30) * 10.0 - 15, "x": np.arange(40) * 10.0 - 15},
+    )
+
+    res = resampling.regrid_linear(obj, target)
+
+    expected = 2 * np.clip(target.y, 0, 270) + np.clip(target.x, 0, 330)
+    expected = expected.where((target.y <= 285) & (target.x <= 345))
+    xr.testing.assert_allclose(res.slant_range_time, expected.transpose("y", "x"))
+    assert res.azimuth_time.dtype == obj.azimuth_time.dtype
+    assert res.azimuth_time.isnull().sum() == res.slant_range_time.isnull().sum()
+
+    res_dask = resampling.regrid_linear(obj.chunk(4), target.chunk(7))
+
+    assert res_dask.slant_range_time.chunks == ((7, 7, 7, 7, 2), (7,) * 5 + (5,))
+    xr.testing.assert_allclose(res_dask.compute(), res)
+
+
+def test_reproject_linear() -> None:
+    assert rioxarray.__version__
+    # a field linear in the UTM coordinates is exactly interpolated by the bilinear kernel
+    y = 4_500_000.0 + np.arange(50) * 100
+    x = 400_000.0 + np.arange(60) * 100
+    obj = xr.DataArray(
+        np.add.outer(2 * (y - y[0]), x - x[0]), coords={"y": y, "x": x}, name="dem"
+    ).rio.write_crs("EPSG:32633")
+    # a geographic grid partly outside of the source
+    target = scene.make_target_raster(
+        "EPSG:4326", rio_transform.from_origin(13.78, 40.69, 1e-3, 1e-3), (60, 80)
+    )
+
+    res = resampling.reproject_linear(obj, target)
+
+    yy, xx = xr.broadcast(target.y, target.x)
+    source_x, source_y = warp.transform(
+        "EPSG:4326", "EPSG:32633", xx.values.ravel(), yy.values.ravel()
+    )
+    expected = 2 * (np.reshape(source_y, yy.shape) - y[0])
+    expected += np.reshape(source_x, xx.shape) - x[0]
+    inside = (source_y >= y[0]) & (source_y <= y[-1])
+    inside &= (source_x >= x[0]) & (source_x <= x[-1])
+    assert res.rio.crs == target.rio.crs
+    assert res.name == "dem"
+    assert 0 < inside.sum() < inside.size
+    npt.assert_allclose(res.values.ravel()[inside], expected.ravel()[inside])
+    assert res.isnull().values.ravel()[~inside].all()
+
+    res_dask = resampling.reproject_linear(obj.chunk(16), target.chunk(16))
+
+    assert res_dask.chunks == ((16, 16, 16, 12), (16,) * 5)
+    xr.testing.assert_allclose(res_dask.compute(), res)
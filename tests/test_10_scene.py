@@ -1,6 +1,7 @@
 import numpy as np
 import pytest
 import xarray as xr
+from rasterio import warp
 
 from sarsen import scene
 
@@ -35,6 +36,70 @@ def test_transform_dem_3d(dem_raster: xr.DataArray) -> None:
     )
 
 
+def test_transform_dem_3d_analytic(dem_raster: xr.DataArray) -> None:
+    dem_3d = scene.convert_to_dem_3d(dem_raster).transpose("y", "axis", "x")
+    # same horizontal datum as EPSG:4326 and no vertical datum
+    proj_crs = "+proj=longlat +ellps=WGS84 +towgs84=0,0,0 +no_defs"
+    assert scene.analytic_transform(proj_crs, scene.ECEF_CRS) is None
+
+    res = scene.transform_dem_3d(dem_3d, "EPSG:4326")
+    expected = scene.transform_dem_3d(dem_3d, proj_crs)
+
+    assert res.dims == ("y", "axis", "x")
+    assert np.allclose(res, expected, rtol=0, atol=0.001)
+
+
+@pytest.mark.parametrize("epsg,lon0,lat0", [(32633, 12.5, 42.0), (32733, 15.0, -33.0)])
+def test_utm_to_ecef(epsg: int, lon0: float, lat0: float) -> None:
+    lon = lon0 + np.linspace(-3.0, 3.0, 7)
+    lat = lat0 + np.linspace(-3.0, 3.0, 7)
+    height = np.linspace(0.0, 3000.0, 7)
+    easting, northing = warp.transform("EPSG:4326", f"EPSG:{epsg}", lon, lat)
+    expected = warp.transform("EPSG:4326", scene.ECEF_CRS, lon, lat, height)
+    transform = scene.analytic_transform(f"EPSG:{epsg}", scene.ECEF_CRS)
+    assert transform is not None
+    res = np.empty((3, 7))
+
+    transform(np.array(easting), np.array(northing), height, res)
+
+    assert np.allclose(res, expected, rtol=0, atol=0.001)
+
+
+def test_analytic_transform() -> None:
+    assert scene.analytic_transform("EPSG:4326", "EPSG:4978") is not None
+    assert scene.analytic_transform("EPSG:4326", "EPSG:4979") is None
+    # vertical datums and other projections use PROJ
+    assert scene.analytic_transform("EPSG:9707", "EPSG:4978") is None
+    assert scene.analytic_transform("EPSG:3857", "EPSG:4978") is None
+
+
+@pytest.mark.parametrize("source_crs", ["EPSG:4326", "EPSG:9707"])
+def test_convert_to_dem_ecef(dem_raster: xr.DataArray, source_crs: str) -> None:
+    dem_3d = scene.convert_to_dem_3d(dem_raster)
+    expected = scene.transform_dem_3d(dem_3d, source_crs)
+
+    res = scene.convert_to_dem_ecef(dem_raster, source_crs=source_crs)
+
+    xr.testing.assert_identical(res, expected)
+
+    res = scene.convert_to_dem_ecef(dem_raster.T, source_crs=source_crs)
+
+    assert res.dims == ("axis", "x", "y")
+    xr.testing.assert_identical(res.transpose(*expected.dims), expected)
+
+
+def test_pixel_corners() -> None:
+    values = np.array([[0.0, 1.0, 3.0], [2.0, 3.0, 5.0]])
+
+    res = scene.pixel_corners(values, axis=1)
+
+    assert np.allclose(res, [[-0.5, 0.5, 2.0, 4.0], [1.5, 2.5, 4.0, 6.0]])
+
+    res = scene.pixel_corners(values, axis=0)
+
+    assert np.allclose(res, [[-1.0, 0.0, 2.0], [1.0, 2.0, 4.0], [3.0, 4.0, 6.0]])
+
+
 def test_compute_dem_oriented_area(dem_raster: xr.DataArray) -> None:
     dem_3d = scene.convert_to_dem_3d(dem_raster)
 
@@ -42,3 +107,27 @@ def test_compute_dem_oriented_area(dem_raster: xr.DataArray) -> None:
 
     assert set(res.dims) == {"axis", "y", "x"}
     assert res.name == "dem_oriented_area"
+
+
+def test_compute_dem_oriented_area_halo(dem_ecef: xr.DataArray) -> None:
+    expected = scene.compute_dem_oriented_area(dem_ecef)
+
+    res = scene.compute_dem_oriented_area(dem_ecef.isel(x=slice(100, 200)), halo=1)
+
+    assert res.sizes == {"axis": 3, "y": 358, "x": 98}
+    xr.testing.assert_allclose(res, expected.isel(y=slice(1, -1), x=slice(101, 199)))
+
+
+def test_make_target_raster() -> None:
+    transform = (10.0, 0.0, 1000.0, 0.0, -20.0, 2000.0)
+
+    res = scene.make_target_raster("EPSG:32633", transform, (4, 3), chunks=2)
+
+    assert res.shape == (4, 3)
+    assert res.chunks == ((2, 2), (2, 1))
+    assert res.rio.crs == "EPSG:32633"
+    np.testing.assert_allclose(res.x, [1005.0, 1015.0, 1025.0])
+    np.testing.assert_allclose(res.y, [1930.0, 1950.0, 1970.0, 1990.0])
+
+    with pytest.raises(ValueError):
+        scene.make_target_raster("EPSG:32633", (10.0, 1.0, 0, 0, -10.0, 0), (4, 3))
@@ -1,7 +1,9 @@
+import tracemalloc
 from typing import Tuple
 
 import numpy as np
 import numpy.typing as npt
+import pytest
 import xarray as xr
 
 from sarsen import geocoding, orbit
@@ -60,3 +62,190 @@ def test_backward_geocode(dem_ecef: xr.DataArray, orbit_ds: xr.Dataset) -> None:
     res = geocoding.backward_geocode(dem_ecef, orbit_interpolator, method="newton")
 
     assert isinstance(res, xr.Dataset)
+
+
+def test_newton_raphson_method_active_set() -> None:
+    def ufunc(
+        t: npt.NDArray[np.float64], index: npt.NDArray[np.intp]
+    ) -> Tuple[npt.NDArray[np.float64], Tuple[npt.NDArray[np.float64]]]:
+        retval = t**2 - target[index]
+        return retval, (t,)
+
+    def ufunc_prime(
+        t: npt.NDArray[np.float64],
+        index: npt.NDArray[np.intp],
+        payload: Tuple[npt.NDArray[np.float64], ...],
+    ) -> npt.NDArray[np.float64]:
+        return 2 * payload[0]
+
+    target = np.array([1.0, 4.0, 100.0, np.nan])
+
+    res, _, iterations, (payload,) = geocoding.newton_raphson_method_active_set(
+        ufunc, ufunc_prime, np.ones(4), diff_ufunc=1e-6
+    )
+
+    assert np.allclose(res[:3], [1.0, 2.0, 10.0])
+    assert np.all(payload[:3] == res[:3])
+    assert iterations[0] == 0
+    assert iterations[3] == 0
+    assert np.isnan(res[3])
+    assert 0 < iterations[1] < iterations[2]
+
+
+def test_backward_geocode_active_set(
+    dem_ecef: xr.DataArray, orbit_ds: xr.Dataset
+) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+
+    # both solvers stop on the orbit time step, at the default `diff_t` of 1e-6 s
+    zero_doppler_distance = 1e-6
+
+    for method in ["newton", "secant"]:
+        expected = geocoding.backward_geocode(
+            dem_ecef,
+            orbit_interpolator,
+            method=method,
+            zero_doppler_distance=zero_doppler_distance,
+        )
+
+        res = geocoding.backward_geocode(
+            dem_ecef,
+            orbit_interpolator,
+            method=method,
+            zero_doppler_distance=zero_doppler_distance,
+            active_set=True,
+        )
+
+        assert isinstance(res, xr.Dataset)
+        assert res.iterations.dims == ("y", "x")
+        assert res.dem_distance.dims == expected.dem_distance.dims
+        assert np.allclose(
+            (res.azimuth_time - expected.azimuth_time) / np.timedelta64(1, "s"),
+            0,
+            atol=1e-6,
+        )
+        # 1e-6 s of orbit time is less than 1 cm along the orbit
+        assert np.allclose(res.dem_distance, expected.dem_distance, atol=1e-2)
+
+    with pytest.raises(TypeError):
+        geocoding.backward_geocode(
+            dem_ecef,
+            orbit_interpolator,
+            zero_doppler_distance=zero_doppler_distance,
+            maxiter=1,
+            active_set=True,
+        )
+
+
+def test_backward_geocode_active_set_nodata(
+    dem_ecef: xr.DataArray, orbit_ds: xr.Dataset
+) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+    hole = dem_ecef.y.isin(dem_ecef.y[100:110]) & dem_ecef.x.isin(dem_ecef.x[100:110])
+    dem_ecef = dem_ecef.where(~hole)
+
+    for method in ["newton", "secant"]:
+        for seed_step in [None, (16, 16)]:
+            expected = geocoding.backward_geocode(
+                dem_ecef, orbit_interpolator, method=method, seed_step=seed_step
+            )
+
+            res = geocoding.backward_geocode(
+                dem_ecef,
+                orbit_interpolator,
+                method=method,
+                seed_step=seed_step,
+                active_set=True,
+            )
+
+            assert res.azimuth_time.where(hole).isnull().all()
+            assert (res.azimuth_time.isnull() == expected.azimuth_time.isnull()).all()
+            assert np.allclose(
+                (res.azimuth_time - expected.azimuth_time).fillna(np.timedelta64(0))
+                / np.timedelta64(1, "s"),
+                0,
+                atol=1e-6,
+            )
+
+
+def test_backward_geocode_kernel(dem_ecef: xr.DataArray, orbit_ds: xr.Dataset) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+
+    for method in ["newton", "secant"]:
+        expected = geocoding.backward_geocode(
+            dem_ecef, orbit_interpolator, method=method
+        )
+
+        res = geocoding.backward_geocode(
+            dem_ecef, orbit_interpolator, method=method, kernel=True
+        )
+
+        assert isinstance(res, xr.Dataset)
+        assert res.dem_distance.dims == expected.dem_distance.dims
+        assert np.allclose(
+            (res.azimuth_time - expected.azimuth_time) / np.timedelta64(1, "s"),
+            0,
+            atol=1e-6,
+        )
+        assert np.allclose(res.dem_distance, expected.dem_distance)
+        assert np.allclose(res.satellite_velocity, expected.satellite_velocity)
+        assert np.allclose(
+            res.slant_range, (expected.dem_distance**2).sum("axis") ** 0.5
+        )
+
+
+def test_backward_geocode_kernel_peak_memory(
+    dem_ecef: xr.DataArray, orbit_ds: xr.Dataset
+) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+    dem_ecef = dem_ecef.compute()
+
+    for method in ["newton", "secant"]:
+        peaks = []
+        for kernel in [False, True]:
+            # a first run allocates the caches outside of the measurement
+            geocoding.backward_geocode(
+                dem_ecef, orbit_interpolator, method=method, kernel=kernel
+            )
+            tracemalloc.start()
+            try:
+                geocoding.backward_geocode(
+                    dem_ecef, orbit_interpolator, method=method, kernel=kernel
+                )
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        # measured 2.3x for newton and 2.6x for secant on the Rome DEM
+        assert peaks[1] < peaks[0] / 2
+
+
+def test_seed_pyramid_steps(dem_ecef: xr.DataArray) -> None:
+    res = geocoding.seed_pyramid_steps(dem_ecef)
+
+    assert res == [64, 8, 1]
+
+    res = geocoding.seed_pyramid_steps(dem_ecef.isel(x=slice(100), y=slice(100)))
+
+    assert res == [16, 2, 1]
+
+    # the Rome DEM is too rough for a 1 metre interpolation error
+    res = geocoding.seed_pyramid_steps(dem_ecef, max_height_error=1.0)
+
+    assert res == [1]
+
+
+def test_backward_geocode_seed_step_auto(
+    dem_ecef: xr.DataArray, orbit_ds: xr.Dataset
+) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+
+    expected = geocoding.backward_geocode(dem_ecef, orbit_interpolator)
+
+    res = geocoding.backward_geocode(dem_ecef, orbit_interpolator, seed_step="auto")
+
+    assert np.allclose(
+        (res.azimuth_time - expected.azimuth_time) / np.timedelta64(1, "s"),
+        0,
+        atol=1e-3,
+    )
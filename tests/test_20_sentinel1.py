@@ -4,7 +4,7 @@ import numpy as np
 import pytest
 import xarray as xr
 
-from sarsen import sentinel1
+from sarsen import orbit, sentinel1
 
 DATA_FOLDER = pathlib.Path(__file__).parent / "data"
 
@@ -40,6 +40,74 @@ def test_Sentinel1SarProduct(data_path: str, group: str) -> None:
     assert res.product_type in {"SLC", "GRD"}
     assert isinstance(res.beta_nought(), xr.DataArray)
     assert isinstance(res.state_vectors(), xr.DataArray)
+    assert isinstance(
+        res.orbit_interpolator(method="hermite"), orbit.OrbitHermiteInterpolator
+    )
+
+
+def test_Sentinel1SarProduct_with_polarisation() -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[2]), GROUPS[2])
+
+    res = product.with_polarisation("vh")
+
+    assert res.measurement_group == "IW1/VH/2"
+    assert res.product_urlpath == product.product_urlpath
+
+    with pytest.raises(ValueError):
+        sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0])).with_polarisation("VH")
+
+
+@pytest.mark.parametrize("data_path,group", list(zip(DATA_PATHS, GROUPS)))
+def test_Sentinel1SarProduct_beta_nought_window(data_path: str, group: str) -> None:
+    product = sentinel1.Sentinel1SarProduct(data_path, group)
+    coords = product.image_coords()
+    window = {dim: slice(100, 140) for dim in coords}
+    expected = product.beta_nought().isel(window)
+
+    res = product.beta_nought_window(window)
+
+    assert res.shape == (40, 40)
+    assert list(res.coords) == list(coords)
+    assert res.attrs["units"] == "m2 m-2"
+    xr.testing.assert_allclose(res, expected.compute())
+
+
+def test_Sentinel1SarProduct_bursts() -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[1]), GROUPS[1])
+
+    res = product.bursts()
+
+    assert len(res) == 9
+    burst = res[2][0]
+    assert isinstance(burst, sentinel1.Sentinel1SarProduct)
+    assert burst.measurement_group == "IW1/VV/2"
+    for (_, (_, stop)), (burst, (start, _)) in zip(res[:-1], res[1:]):
+        # consecutive bursts own contiguous intervals, inside their own azimuth times
+        assert stop == start
+        azimuth_time = burst.image_coords()["azimuth_time"]
+        assert azimuth_time[0] < start < azimuth_time[-1]
+
+    assert sentinel1.Sentinel1SarProduct(str(DATA_PATHS[2]), GROUPS[2]).bursts() == []
+    assert sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0]).bursts() == []
+
+
+def test_Sentinel1SarProduct_ground_range_lookup() -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+    azimuth_time_values = product.image_coords()["azimuth_time"][::1000]
+    slant_range_time_values = np.linspace(0.0054, 0.0064, 11)
+    azimuth_time, slant_range_time = xr.broadcast(
+        xr.DataArray(azimuth_time_values, dims="y"),
+        xr.DataArray(slant_range_time_values, dims="x"),
+    )
+    expected = product.slant_range_time_to_ground_range(azimuth_time, slant_range_time)
+
+    res = product.ground_range_lookup(azimuth_time, slant_range_time)
+
+    assert res.dims == ("y", "x")
+    np.testing.assert_allclose(res.values, expected.values, atol=0.01)
+    assert np.isnan(
+        product.ground_range_lookup(azimuth_time, slant_range_time * 2)
+    ).all()
 
 
 def test_product_info() -> None:
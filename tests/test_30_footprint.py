@@ -0,0 +1,98 @@
+import pathlib
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from sarsen import footprint, sentinel1
+
+DATA_FOLDER = pathlib.Path(__file__).parent / "data"
+
+GRD_PATH = (
+    DATA_FOLDER
+    / "S1B_IW_GRDH_1SDV_20211223T051122_20211223T051147_030148_039993_5371.SAFE"
+)
+SLC_PATH = (
+    DATA_FOLDER
+    / "S1A_IW_SLC__1SDV_20220104T170557_20220104T170624_041314_04E951_F1F1.SAFE"
+)
+
+
+def test_wkt_bbox() -> None:
+    res = footprint.wkt_bbox("POLYGON((1 2, 3 -1, 4 5, 1 2))")
+
+    assert res == (1.0, -1.0, 4.0, 5.0)
+
+    res = footprint.wkt_bbox("MULTIPOLYGON (((1 2, 3 4, 1 4, 1 2)), ((0 9, 1 8, 2 9)))")
+
+    assert res == (0.0, 2.0, 3.0, 9.0)
+
+    # a footprint crossing the antimeridian
+    res = footprint.wkt_bbox("POLYGON((179 1, -179 1, -179.5 3, 178 3, 179 1))")
+
+    assert res == (178.0, 1.0, 181.0, 3.0)
+
+    with pytest.raises(ValueError):
+        footprint.wkt_bbox("POINT(1 2)")
+
+
+def test_wrap_longitude() -> None:
+    res = footprint.wrap_longitude(np.array([-179.0, 179.0, -10.0, 10.0]), 180.0)
+
+    np.testing.assert_allclose(res, [181.0, 179.0, 350.0, 10.0])
+
+    res = footprint.wrap_longitude(np.array([-179.0, 179.0, 190.0]), 0.0)
+
+    np.testing.assert_allclose(res, [-179.0, 179.0, -170.0])
+
+
+def test_chunk_corners_index() -> None:
+    res = footprint.chunk_corners_index((4, 4, 2))
+
+    assert np.all(res == [[0, 3], [4, 7], [8, 9]])
+
+
+@pytest.mark.parametrize(
+    "data_path,group,expected",
+    [
+        (GRD_PATH, "IW/VV", footprint.INSIDE),
+        (SLC_PATH, "IW1/VV/2", footprint.OUTSIDE),
+    ],
+)
+def test_classify_chunks(
+    dem_raster: xr.DataArray, data_path: pathlib.Path, group: str, expected: int
+) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(data_path), group)
+
+    res = footprint.classify_chunks(dem_raster.chunk(120), product)
+
+    assert res.shape == (3, 3)
+    assert np.all(res == expected)
+
+
+def test_cull_chunks(dem_raster: xr.DataArray) -> None:
+    dem_raster = dem_raster.chunk(120)
+    chunk_classes = np.full((3, 3), footprint.INSIDE, dtype=np.int8)
+    chunk_classes[0, 1] = footprint.OUTSIDE
+    chunk_classes[2, 2] = footprint.PARTIAL
+    obj = xr.Dataset(
+        {"dem": dem_raster, "time": dem_raster.astype("datetime64[ns]")},
+        attrs={"title": "test"},
+    )
+
+    res = footprint.cull_chunks(obj, chunk_classes)
+
+    assert res.attrs == obj.attrs
+    assert res.dem.chunks == dem_raster.chunks
+    assert np.all(np.isnan(res.dem[:120, 120:240]))
+    assert np.all(np.isnat(res.time[:120, 120:240].values))
+    xr.testing.assert_equal(res.dem[120:], dem_raster[120:])
+
+    res_dataarray = footprint.cull_chunks(dem_raster, None)
+
+    assert res_dataarray is dem_raster
+
+    # a different chunking is left unchanged
+    res_dataarray = footprint.cull_chunks(dem_raster.chunk(180), chunk_classes)
+
+    xr.testing.assert_equal(res_dataarray, dem_raster)
@@ -1,6 +1,186 @@
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pytest
 import xarray as xr
 
-from sarsen import radiometry
+from sarsen import chunking, radiometry
+
+ONE_MILLISECOND = np.timedelta64(10**6, "ns")
+AZIMUTH_TIME0 = np.datetime64("2022-01-01T00:00:00", "ns")
+
+
+@pytest.fixture
+def grid_parameters() -> dict[str, Any]:
+    return {
+        "slant_range_time0": 0.0,
+        "azimuth_time0": AZIMUTH_TIME0,
+        "slant_range_time_interval_s": 1.0,
+        "azimuth_time_interval_s": 1.0,
+        "slant_range_spacing_m": 2.0,
+    }
+
+
+def make_dem_coords(
+    azimuth: npt.ArrayLike,
+    slant_range: npt.ArrayLike,
+    gamma_area: npt.ArrayLike | None = None,
+) -> xr.Dataset:
+    """Return the SAR coordinates of DEM pixels, given in seconds and SAR pixels."""
+    milliseconds = np.round(np.asarray(azimuth) * 1000).astype(int)
+    azimuth_time = AZIMUTH_TIME0 + milliseconds * ONE_MILLISECOND
+    dem_coords = xr.Dataset(
+        {
+            "azimuth_time": (("y", "x"), azimuth_time),
+            "slant_range_time": (("y", "x"), np.asarray(slant_range, dtype=float)),
+        }
+    )
+    if gamma_area is not None:
+        dem_coords["gamma_area"] = (("y", "x"), np.asarray(gamma_area, dtype=float))
+    return dem_coords
+
+
+@pytest.mark.parametrize("method", ["bincount", "flox"])
+def test_sum_weights(method: str) -> None:
+    initial_weights = xr.DataArray([1.0, 2.0, 4.0, 8.0, 16.0], dims="x")
+    azimuth_index = xr.DataArray([3.0, 3.0, 4.0, np.nan, 4.0], dims="x")
+    slant_range_index = xr.DataArray([7.0, 7.0, 7.0, 7.0, 9.0], dims="x")
+    expected = [3.0, 3.0, 4.0, 0.0, 16.0]
+
+    res = radiometry.sum_weights(
+        initial_weights, azimuth_index, slant_range_index, method=method
+    )
+
+    assert np.allclose(res, expected)
+
+    res = radiometry.sum_weights(
+        initial_weights.chunk(2),
+        azimuth_index.chunk(2),
+        slant_range_index.chunk(2),
+        method=method,
+    )
+
+    assert np.allclose(res, expected)
+
+    with pytest.raises(ValueError):
+        radiometry.sum_weights(
+            initial_weights, azimuth_index, slant_range_index, method="dummy"
+        )
+
+
+def test_sum_weights_multilook() -> None:
+    initial_weights = xr.DataArray(np.arange(1.0, 17.0).reshape(4, 4), dims=("y", "x"))
+    azimuth_index = xr.DataArray(np.arange(4.0), dims="y").broadcast_like(
+        initial_weights
+    )
+    slant_range_index = xr.DataArray(np.arange(4.0), dims="x").broadcast_like(
+        initial_weights
+    )
+
+    res = radiometry.sum_weights(
+        initial_weights, azimuth_index, slant_range_index, multilook=(3, 3)
+    )
+    expected = radiometry.sum_weights(
+        initial_weights,
+        azimuth_index,
+        slant_range_index,
+        multilook=(3, 3),
+        method="flox",
+    )
+
+    assert np.allclose(res[1, 1], initial_weights[:3, :3].mean())
+    xr.testing.assert_allclose(res, expected)
+
+
+def test_sum_weights_bilinear() -> None:
+    initial_weights = xr.DataArray([1.0, 2.0, 4.0, 8.0, np.nan], dims="x")
+    azimuth_index = xr.DataArray([0.5, 0.2, 1.5, np.nan, 0.4], dims="x")
+    slant_range_index = xr.DataArray([0.5, 0.7, 0.5, 0.5, 0.1], dims="x")
+
+    res = radiometry.sum_weights_bilinear(
+        initial_weights, azimuth_index, slant_range_index
+    )
+
+    # the weights of the pixels in the same SAR cell sum up to their total
+    assert np.allclose(res, [3.0, 3.0, 4.0, 0.0, 3.0])
+
+
+@pytest.mark.parametrize(
+    "method,gamma_weights",
+    [
+        ("bilinear", radiometry.gamma_weights_bilinear),
+        ("nearest", radiometry.gamma_weights_nearest),
+    ],
+)
+def test_gamma_projection_matrix(
+    method: str, gamma_weights: Any, grid_parameters: dict[str, Any]
+) -> None:
+    dem_coords = make_dem_coords(
+        [[0.0, 0.3], [1.2, 1.3]], [[0.5, 0.7], [1.25, np.nan]], [[1, 2], [4, 8]]
+    )
+    expected = gamma_weights(dem_coords, **grid_parameters)
+
+    projection = radiometry.gamma_projection_matrix(
+        dem_coords, method=method, **grid_parameters
+    )
+
+    assert projection.shape[1] == 4
+    res = radiometry.apply_gamma_projection(projection, dem_coords.gamma_area)
+    xr.testing.assert_allclose(res, expected)
+
+    with pytest.raises(ValueError):
+        radiometry.apply_gamma_projection(projection, dem_coords.gamma_area[:1])
+
+
+@pytest.mark.parametrize(
+    "method,gamma_weights",
+    [
+        ("bilinear", radiometry.gamma_weights_bilinear),
+        ("nearest", radiometry.gamma_weights_nearest),
+    ],
+)
+def test_gather_sar_grid_sum(
+    method: str, gamma_weights: Any, grid_parameters: dict[str, Any]
+) -> None:
+    rng = np.random.default_rng(0)
+    # pixels of far apart chunks share SAR cells, a displacement larger than any overlap
+    azimuth = np.arange(20)[:, None] % 4 + rng.random((20, 20))
+    slant_range = np.arange(20)[None, :] % 4 + rng.random((20, 20))
+    slant_range[3, 5] = np.nan
+    dem_coords = make_dem_coords(azimuth, slant_range, rng.random((20, 20)))
+    expected = gamma_weights(dem_coords, **grid_parameters)
+
+    res = chunking.map_scatter_gather(
+        radiometry.gamma_area_sar_grid_sum,
+        radiometry.merge_sar_grid_sums,
+        radiometry.gather_sar_grid_sum,
+        obj=dem_coords.chunk(5),
+        template=dem_coords.gamma_area,
+        kwargs=grid_parameters | {"method": method},
+    )
+
+    xr.testing.assert_allclose(res.compute(), expected)
+
+    with pytest.raises(ValueError):
+        radiometry.gamma_area_sar_grid_sum(
+            dem_coords, method="dummy", **grid_parameters
+        )
+
+
+def test_estimate_overlap_bound(grid_parameters: dict[str, Any]) -> None:
+    y, x = np.indices((40, 40)).astype(float)
+
+    res = radiometry.estimate_overlap_bound(make_dem_coords(y, x), **grid_parameters)
+
+    assert 0 < res <= 4
+
+    # layover folds the DEM pixels at x and 39 - x on the same SAR cells
+    res = radiometry.estimate_overlap_bound(
+        make_dem_coords(y, np.abs(x - 19.5)), **grid_parameters
+    )
+
+    assert res >= 39
 
 
 def test_compute_gamma_area(dem_ecef: xr.DataArray) -> None:
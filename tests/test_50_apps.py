@@ -1,11 +1,16 @@
+import logging
 import os
 import pathlib
+from typing import Iterator
+from unittest import mock
 
+import numpy as np
 import py
 import pytest
+import rioxarray
 import xarray as xr
 
-from sarsen import apps, sentinel1
+from sarsen import apps, geocoding, orbit, sentinel1
 
 DATA_FOLDER = pathlib.Path(__file__).parent / "data"
 
@@ -25,6 +30,37 @@ DATA_PATH_GROUPS = list(zip(DATA_PATHS, GROUPS))
 DEM_RASTER = DATA_FOLDER / "Rome-30m-DEM.tif"
 
 
+def open_raster(path: py.path.local) -> xr.DataArray:
+    raster = rioxarray.open_rasterio(str(path))
+    assert isinstance(raster, xr.DataArray)
+    return raster
+
+
+@pytest.fixture
+def nonzero_measurement() -> Iterator[None]:
+    """Add a smooth pattern, a function of the position in the SAR image, to the beta nought.
+
+    The measurements of the test products are all zeros, so without the pattern the
+    terrain-corrected outputs would be zero wherever the simulation is right or wrong.
+    """
+    beta_nought_window = sentinel1.Sentinel1SarProduct.beta_nought_window
+
+    def patterned_window(
+        self: sentinel1.Sentinel1SarProduct, window: dict[str, slice]
+    ) -> xr.DataArray:
+        beta_nought = beta_nought_window(self, window)
+        row, col = (
+            np.arange(beta_nought.sizes[dim]) + (window[str(dim)].start or 0)
+            for dim in beta_nought.dims
+        )
+        return beta_nought + 1.0 + 0.5 * np.sin(np.add.outer(row / 50, col / 70))
+
+    with mock.patch.object(
+        sentinel1.Sentinel1SarProduct, "beta_nought_window", patterned_window
+    ):
+        yield
+
+
 @pytest.mark.parametrize("data_path,group", DATA_PATH_GROUPS)
 @pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
 def test_terrain_correction_gtc(
@@ -162,3 +198,431 @@ def test_terrain_correction_rtc_dask(
 
     assert isinstance(res, xr.DataArray)
     assert "gamma" in res.attrs["long_name"]
+
+
+@pytest.mark.usefixtures("nonzero_measurement")
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_radiometry_method(tmpdir: py.path.local) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=str(tmpdir.join("RTC.tif")),
+        simulated_urlpath=str(tmpdir.join("STC.tif")),
+        chunks=256,
+    )
+    expected = {
+        name: open_raster(tmpdir.join(f"{name}.tif")) for name in ["STC", "RTC"]
+    }
+
+    assert (expected["STC"] > 0).any()
+    assert (expected["RTC"] > 0).any()
+
+    runs: list[tuple[str, str, int | str]] = [
+        ("accumulator", "accumulator", 128),
+        ("auto", "overlap", "auto"),
+    ]
+    for method, radiometry_method, radiometry_bound in runs:
+        apps.terrain_correction(
+            product,
+            str(DEM_RASTER),
+            correct_radiometry="gamma_bilinear",
+            output_urlpath=str(tmpdir.join(f"RTC-{method}.tif")),
+            simulated_urlpath=str(tmpdir.join(f"STC-{method}.tif")),
+            chunks=256,
+            radiometry_method=radiometry_method,
+            radiometry_bound=radiometry_bound,
+        )
+
+        for name in ["STC", "RTC"]:
+            res = open_raster(tmpdir.join(f"{name}-{method}.tif"))
+
+            np.testing.assert_allclose(res, expected[name], rtol=1e-5)
+
+    with pytest.raises(ValueError):
+        apps.terrain_correction(
+            product,
+            str(DEM_RASTER),
+            correct_radiometry="gamma_bilinear",
+            radiometry_method="dummy",
+        )
+
+
+@pytest.mark.parametrize("active_set,kernel", [(True, False), (False, True)])
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_geocoding_solver(
+    tmpdir: py.path.local, active_set: bool, kernel: bool
+) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=None,
+        simulated_urlpath=str(tmpdir.join("STC.tif")),
+        chunks=256,
+    )
+    expected = open_raster(tmpdir.join("STC.tif"))
+
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=None,
+        simulated_urlpath=str(tmpdir.join("STC-solver.tif")),
+        chunks=256,
+        active_set=active_set,
+        kernel=kernel,
+    )
+    res = open_raster(tmpdir.join("STC-solver.tif"))
+
+    assert (expected > 0).any()
+    np.testing.assert_allclose(res, expected, rtol=1e-3)
+
+    with pytest.raises(ValueError):
+        apps.terrain_correction(
+            product,
+            str(DEM_RASTER),
+            output_urlpath=str(tmpdir.join("GTC.tif")),
+            active_set=True,
+            kernel=True,
+        )
+
+
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_memory_limit(tmpdir: py.path.local) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+    bytes_per_pixel = apps.estimate_bytes_per_pixel("GRD", "gamma_bilinear")
+
+    res = apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=str(tmpdir.join("RTC.tif")),
+        memory_limit=bytes_per_pixel * 360 * 360,
+    )
+
+    assert isinstance(res, xr.DataArray)
+    assert res.chunks is not None
+    assert all(c % 16 == 0 and c < 360 for c in res.chunks[0][:-1])
+
+    with pytest.raises(ValueError):
+        apps.terrain_correction(
+            product,
+            str(DEM_RASTER),
+            correct_radiometry="gamma_bilinear",
+            output_urlpath=str(tmpdir.join("RTC-small.tif")),
+            memory_limit="1MB",
+        )
+
+
+@pytest.mark.parametrize(
+    "target_grid",
+    [
+        # a third of the DEM pixel size on the central part of the DEM
+        (
+            "EPSG:9707",
+            (1 / 10800, 0.0, 12.47, 0.0, -1 / 10800, 42.03),
+            (432, 432),
+        ),
+        ("EPSG:32633", (10.0, 0.0, 290000.0, 0.0, -10.0, 4657000.0), (320, 288)),
+    ],
+)
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_target_grid(
+    tmpdir: py.path.local, target_grid: tuple[str, tuple[float, ...], tuple[int, int]]
+) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+
+    res = apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=str(tmpdir.join("RTC.tif")),
+        simulated_urlpath=str(tmpdir.join("STC.tif")),
+        chunks=256,
+        target_grid=target_grid,
+    )
+
+    assert res.shape == target_grid[2]
+    assert res.rio.crs == target_grid[0]
+    # the output y coordinate is increasing like the DEM one
+    a, _, c, _, e, f = target_grid[1]
+    expected_bounds = (c, f + e * res.shape[0], c + a * res.shape[1], f)
+    np.testing.assert_allclose(res.rio.bounds(), expected_bounds)
+    simulated = open_raster(tmpdir.join("STC.tif"))
+    assert simulated.shape[1:] == target_grid[2]
+    # the simulation covers the whole target grid
+    assert simulated.notnull().all()
+
+
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_simulated(tmpdir: py.path.local) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+
+    with mock.patch(
+        "sarsen.geocoding.backward_geocode", wraps=geocoding.backward_geocode
+    ) as backward_geocode:
+        res = apps.terrain_correction(
+            product,
+            str(DEM_RASTER),
+            correct_radiometry="gamma_bilinear",
+            output_urlpath=str(tmpdir.join("RTC.tif")),
+            simulated_urlpath=str(tmpdir.join("STC.tif")),
+            chunks=256,
+        )
+
+    assert isinstance(res, xr.DataArray)
+    assert tmpdir.join("RTC.tif").check()
+    assert tmpdir.join("STC.tif").check()
+    # the geometry is computed once for both outputs
+    geocoded_pixels = sum(c.args[0].size // 3 for c in backward_geocode.call_args_list)
+    assert geocoded_pixels < 2 * res.size
+
+
+def test_correct_cached_acquisition(
+    dem_ecef: xr.DataArray, orbit_ds: xr.Dataset
+) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+    cached = apps.simulate_acquisition(
+        dem_ecef,
+        orbit_interpolator,
+        include_variables={"azimuth_time", "slant_range_time"},
+    )
+
+    # a repeat pass 12 days later on a slightly displaced orbit
+    position = orbit_ds.position + 50.0
+    position = position.assign_coords(
+        azimuth_time=position.azimuth_time + np.timedelta64(12, "D")
+    )
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(position)
+    expected = apps.simulate_acquisition(
+        dem_ecef,
+        orbit_interpolator,
+        include_variables={"azimuth_time", "slant_range_time"},
+    )
+
+    res = apps.correct_cached_acquisition(cached, dem_ecef, orbit_interpolator)
+
+    assert res is not None
+    azimuth_error = (res.azimuth_time - expected.azimuth_time) / np.timedelta64(1, "s")
+    assert abs(azimuth_error).max() < 1e-4
+    slant_range_error = (res.slant_range_time - expected.slant_range_time) * 3e8 / 2
+    assert abs(slant_range_error).max() < 0.1
+
+    # the height dependent error of an orbit displaced by kilometres is not corrected
+    position = position + xr.DataArray([1000.0, -3000.0, 2000.0], dims="axis")
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(position)
+
+    res = apps.correct_cached_acquisition(
+        cached, dem_ecef, orbit_interpolator, max_residual=0.05
+    )
+
+    assert res is None
+
+
+def test_geocode_chunk_bursts() -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[1]), GROUPS[1])
+    bursts = product.bursts()
+    # azimuth times across the overlap of the bursts 1 and 2, beyond the mosaic cropping
+    azimuth_time = bursts[1][1][1] + np.arange(-200_000_000, 200_000_001, 50_000_000)
+    acquisition = xr.Dataset(
+        {
+            "azimuth_time": xr.DataArray(azimuth_time, dims="y").broadcast_like(
+                xr.DataArray(np.zeros(3), dims="x")
+            ),
+            "slant_range_time": xr.DataArray(
+                np.linspace(0.0054, 0.0056, 3), dims="x"
+            ).broadcast_like(xr.DataArray(azimuth_time, dims="y")),
+        }
+    ).transpose("y", "x")
+    beta_nought_window = sentinel1.Sentinel1SarProduct.beta_nought_window
+
+    def burst_index_window(
+        self: sentinel1.Sentinel1SarProduct, window: dict[str, slice]
+    ) -> xr.DataArray:
+        return beta_nought_window(self, window) + (self.burst_id or 0)
+
+    with mock.patch.object(
+        sentinel1.Sentinel1SarProduct, "beta_nought_window", burst_index_window
+    ):
+        res = apps.geocode_chunk(acquisition, product)
+
+    # every pixel is geocoded from the burst owning its azimuth time
+    expected = np.where(acquisition.azimuth_time < bursts[1][1][1], 1.0, 2.0)
+    np.testing.assert_array_equal(res.values, expected)
+    assert res.dims == ("y", "x")
+
+
+@pytest.mark.parametrize("tolerance", [0.1, 0.0])
+def test_simulate_acquisition_sparse(
+    dem_ecef: xr.DataArray,
+    orbit_ds: xr.Dataset,
+    tolerance: float,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    orbit_interpolator = orbit.OrbitPolyfitInterpolator.from_position(orbit_ds.position)
+    expected = apps.map_simulate_acquisition(
+        dem_ecef.chunk(180), orbit_interpolator, correct_radiometry="gamma_nearest"
+    ).compute()
+    # Sentinel-1 IW pixel intervals
+    azimuth_time_interval_s = 2e-3
+    slant_range_time_interval_s = 1e-8
+
+    with caplog.at_level(logging.INFO):
+        res = apps.map_simulate_acquisition(
+            dem_ecef.chunk(180),
+            orbit_interpolator,
+            correct_radiometry="gamma_nearest",
+            geometry_step=16,
+            tolerance=tolerance,
+            azimuth_time_interval_s=azimuth_time_interval_s,
+            slant_range_time_interval_s=slant_range_time_interval_s,
+        ).compute()
+
+    assert set(res.data_vars) == set(expected.data_vars)
+    azimuth_error = (res.azimuth_time - expected.azimuth_time) / np.timedelta64(1, "s")
+    azimuth_error = azimuth_error / azimuth_time_interval_s
+    assert abs(azimuth_error).max() < 0.1
+    slant_range_error = res.slant_range_time - expected.slant_range_time
+    slant_range_error = slant_range_error / slant_range_time_interval_s
+    assert abs(slant_range_error).max() < 0.1
+    np.testing.assert_allclose(res.gamma_area, expected.gamma_area, rtol=1e-5)
+    # with a zero tolerance all the cells are solved exactly
+    assert ("refined" in caplog.text) == (tolerance == 0.0)
+
+
+@pytest.mark.usefixtures("nonzero_measurement")
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_geometry_cache(tmpdir: py.path.local) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_nearest",
+        output_urlpath=str(tmpdir.join("RTC.tif")),
+        simulated_urlpath=str(tmpdir.join("STC.tif")),
+        geometry_cache_dir=str(tmpdir),
+    )
+
+    assert len(tmpdir.listdir(lambda p: p.ext == ".zarr")) == 1
+
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_nearest",
+        output_urlpath=str(tmpdir.join("RTC-cached.tif")),
+        simulated_urlpath=str(tmpdir.join("STC-cached.tif")),
+        geometry_cache_dir=str(tmpdir),
+    )
+
+    for name in ["STC", "RTC"]:
+        expected = open_raster(tmpdir.join(f"{name}.tif"))
+        res = open_raster(tmpdir.join(f"{name}-cached.tif"))
+
+        assert (expected > 0).any()
+        np.testing.assert_allclose(res, expected, rtol=1e-6)
+
+
+@pytest.mark.usefixtures("nonzero_measurement")
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_gamma_projection(tmpdir: py.path.local) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(DATA_PATHS[0]), GROUPS[0])
+    gamma_projection_urlpath = str(tmpdir.join("gamma-projection.npz"))
+
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=str(tmpdir.join("RTC.tif")),
+        simulated_urlpath=str(tmpdir.join("STC.tif")),
+    )
+    expected = open_raster(tmpdir.join("STC.tif"))
+    expected_rtc = open_raster(tmpdir.join("RTC.tif"))
+
+    assert (expected > 0).any()
+    assert (expected_rtc > 0).any()
+
+    for name in ["projection", "projection-loaded"]:
+        with mock.patch(
+            "sarsen.apps.simulate_acquisition", wraps=apps.simulate_acquisition
+        ) as simulate_acquisition:
+            apps.terrain_correction(
+                product,
+                str(DEM_RASTER),
+                correct_radiometry="gamma_bilinear",
+                output_urlpath=str(tmpdir.join(f"RTC-{name}.tif")),
+                simulated_urlpath=str(tmpdir.join(f"STC-{name}.tif")),
+                gamma_projection_urlpath=gamma_projection_urlpath,
+            )
+        res = open_raster(tmpdir.join(f"STC-{name}.tif"))
+
+        assert tmpdir.join("gamma-projection.npz").check()
+        # the geometry computed to build the matrix is reused by the geocoding
+        assert simulate_acquisition.call_count == 1
+        np.testing.assert_allclose(res, expected, rtol=1e-5)
+        res = open_raster(tmpdir.join(f"RTC-{name}.tif"))
+
+        np.testing.assert_allclose(res, expected_rtc, rtol=1e-5)
+
+    # the matrix of the bilinear weights is not reused for the nearest ones
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_nearest",
+        output_urlpath=None,
+        simulated_urlpath=str(tmpdir.join("STC-nearest.tif")),
+    )
+    expected = open_raster(tmpdir.join("STC-nearest.tif"))
+    apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_nearest",
+        output_urlpath=None,
+        simulated_urlpath=str(tmpdir.join("STC-nearest-projection.tif")),
+        gamma_projection_urlpath=gamma_projection_urlpath,
+    )
+    res = open_raster(tmpdir.join("STC-nearest-projection.tif"))
+
+    np.testing.assert_allclose(res, expected, rtol=1e-5)
+
+
+@pytest.mark.parametrize("data_path,group", [DATA_PATH_GROUPS[0], DATA_PATH_GROUPS[2]])
+@pytest.mark.usefixtures("nonzero_measurement")
+@pytest.mark.skipif(os.getenv("GITHUB_ACTIONS") == "true", reason="too much memory")
+def test_terrain_correction_polarisations(
+    tmpdir: py.path.local,
+    data_path: pathlib.Path,
+    group: str,
+) -> None:
+    product = sentinel1.Sentinel1SarProduct(str(data_path), group)
+
+    expected = apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=str(tmpdir.join("RTC.tif")),
+    ).compute()
+
+    # the test products contain only the VV measurements
+    res = apps.terrain_correction(
+        product,
+        str(DEM_RASTER),
+        correct_radiometry="gamma_bilinear",
+        output_urlpath=str(tmpdir.join("RTC-polarisations.zarr")),
+        polarisations=["vv"],
+    ).compute()
+
+    assert res.dims == ("polarisation", "y", "x")
+    assert list(res.polarisation.values) == ["VV"]
+    if group == "IW/VV":
+        assert (expected > 0).any()
+    assert np.allclose(res.sel(polarisation="VV"), expected, equal_nan=True)
+
+    saved = xr.open_zarr(str(tmpdir.join("RTC-polarisations.zarr")))
+    assert list(saved.data_vars) == ["VV"]
+    assert np.allclose(saved.VV, expected, equal_nan=True)
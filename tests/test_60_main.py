@@ -11,3 +11,15 @@ def test_main() -> None:
 
     res = runner.invoke(__main__.app, ["rtc", "--help"])
     assert res.exit_code == 0
+
+
+def test_parse_seed_step() -> None:
+    assert __main__.parse_seed_step(None) is None
+    assert __main__.parse_seed_step("auto") == "auto"
+    assert __main__.parse_seed_step("32") == (32, 32)
+
+
+def test_parse_polarisations() -> None:
+    assert __main__.parse_polarisations(None) == []
+    assert __main__.parse_polarisations("vv") == ["VV"]
+    assert __main__.parse_polarisations("VV, vh") == ["VV", "VH"]